@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Concurrent Command Probes
+=========================
+Run independent external commands (bcftools header, sample, contig and
+format checks) at the same time with asyncio, without a shell, under a
+concurrency limit.
+
+Each probe streams its stdout into a consumer instead of piping through
+wc/cut/sort/uniq, so even whole-file scans use constant memory, and each
+probe's wall time is recorded for reports.
+"""
+
+import os
+import time
+
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+DEFAULT_CONCURRENCY = min(4, _available_cpus())
+READ_SIZE = 256 * 1024
+
+
+class TextOutput:
+    """Collects stdout as text (small outputs: headers, sample lists)"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+
+    def result(self):
+        return b''.join(self._chunks).decode(errors='replace')
+
+
+class FirstColumnCounts:
+    """Counts lines by their first tab-separated column, in first-seen order"""
+
+    def __init__(self):
+        self.counts = {}
+        self._carry = b''
+
+    def feed(self, chunk):
+        chunk = self._carry + chunk
+        cut = chunk.rfind(b'\n') + 1
+        self._carry = chunk[cut:]
+        counts = self.counts
+        for line in chunk[:cut].splitlines():
+            key = line.split(b'\t', 1)[0]
+            counts[key] = counts.get(key, 0) + 1
+
+    def result(self):
+        if self._carry:
+            self.feed(b'\n')
+        return {key.decode(): count for key, count in self.counts.items()}
+
+
+class HeadLines:
+    """Keeps the first n lines; stops the command once it has them"""
+
+    def __init__(self, n):
+        self.n = n
+        self.lines = []
+        self._carry = b''
+
+    def feed(self, chunk):
+        lines = (self._carry + chunk).split(b'\n')
+        self._carry = lines.pop()
+        self.lines.extend(line.decode(errors='replace') for line in lines[:self.n - len(self.lines)])
+        return len(self.lines) < self.n
+
+    def result(self):
+        if self._carry and len(self.lines) < self.n:
+            self.lines.append(self._carry.decode(errors='replace'))
+        return self.lines
+
+
+class Probe:
+    """One command to run, with the consumer of its stdout"""
+
+    def __init__(self, name, argv, consumer=None):
+        self.name = name
+        self.argv = [str(arg) for arg in argv]
+        self.consumer = consumer if consumer is not None else TextOutput()
+        self.returncode = None
+        self.output = None
+        self.stderr = ''
+        self.seconds = None
+        self.stopped = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0 or self.stopped
+
+    def summary(self):
+        status = 'ok' if self.ok else f"failed ({self.returncode})"
+        return {'probe': self.name, 'seconds': round(self.seconds or 0.0, 3), 'status': status}
+
+
+async def _run_probe(probe, semaphore, timeout):
+    import asyncio
+
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *probe.argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            probe.returncode, probe.stderr = 127, str(e)
+            probe.seconds = time.perf_counter() - start
+            return probe
+
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            await asyncio.wait_for(_consume(process, probe), timeout)
+        except asyncio.TimeoutError:
+            _kill(process)
+            probe.stderr = f"timed out after {timeout}s"
+        probe.returncode = await process.wait()
+        stderr = await stderr_task
+        if not probe.stderr:
+            probe.stderr = stderr.decode(errors='replace').strip()
+        probe.output = probe.consumer.result()
+        probe.seconds = time.perf_counter() - start
+    return probe
+
+
+async def _consume(process, probe):
+    while True:
+        chunk = await process.stdout.read(READ_SIZE)
+        if not chunk:
+            return
+        if probe.consumer.feed(chunk) is False:
+            # The consumer has what it needs; stop the command early
+            probe.stopped = True
+            _kill(process)
+            return
+
+
+def _kill(process):
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _run_all(probes, concurrency, timeout):
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    return await asyncio.gather(*(_run_probe(probe, semaphore, timeout) for probe in probes))
+
+
+def run_probes(probes, concurrency=DEFAULT_CONCURRENCY, timeout=None):
+    """Run probes concurrently; returns them by name with output and timing filled in"""
+    # asyncio is imported on first use, not with the module: it is the
+    # largest import of the tools that probe
+    import asyncio
+
+    asyncio.run(_run_all(probes, concurrency, timeout))
+    return {probe.name: probe for probe in probes}
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+"""
+Batch Liftover Worker
+=====================
+Lift, sort, rename, compress and index many samples in one long-lived task.
+
+The chain index is loaded once, through CrossMap's Python API or by the
+streaming Python engine (--engine python), and reused for every sample in the
+batch. The downstream steps run the same bcftools/tabix/contig_header.py
+commands, with the same file names, as the per-sample SORT_VCF,
+FIX_CONTIG_HEADER and INDEX_VCF processes, so each sample's outputs match
+a non-batched run.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import shutil
+import subprocess
+import sys
+
+from collisions import COLLISION_POLICIES, CollisionDetector
+from contig_header import CONTIG_MODES, ContigHeader, fix_stream
+from lift_vcf import LOG_FORMAT, MULTIALLELIC_MODES, VcfLifter, log_result
+from profiling import profile_main
+from rename_contigs import ContigRenamer
+from site_filter import add_filter_arguments, filter_records, site_filter_from_args
+from stage_trace import StageTrace
+from vcf_index import extract_records, read_regions, source_regions
+
+
+def load_crossmap(chain_file):
+    """Load the chain index through CrossMap's API; None if unavailable"""
+    try:
+        from cmmodule.utils import read_chain_file
+        from cmmodule.mapvcf import crossmap_vcf_file
+    except ImportError:
+        return None
+
+    print(f"Loading chain file once for the whole batch: {chain_file}")
+    mapping, _, _ = read_chain_file(chain_file)
+    return mapping, crossmap_vcf_file
+
+
+def read_manifest(manifest_file):
+    """Read sample_id,vcf_path rows from the batch manifest"""
+    with open(manifest_file) as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not all(c in reader.fieldnames for c in ('sample_id', 'vcf_path')):
+            sys.exit("ERROR: Batch manifest must contain columns: ['sample_id', 'vcf_path']")
+        return [(row['sample_id'].strip(), row['vcf_path'].strip()) for row in reader]
+
+
+def run_command(cmd, cwd):
+    """Run a command in the sample's work directory, raising on failure"""
+    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed: {result.stderr.strip()}")
+    return result
+
+
+_chain_indexes = {}
+
+
+def load_chain_index(chain_file):
+    """The chain's ChainIndex, loaded once per batch (region extraction for CrossMap)"""
+    if chain_file not in _chain_indexes:
+        from chain_utils import ChainIndex
+        _chain_indexes[chain_file] = ChainIndex.from_file(chain_file)
+    return _chain_indexes[chain_file]
+
+
+def load_python_engine(chain_file, target_fasta, normalize, multiallelics, chr_mapping=None,
+                       contig_header='all', site_filter=None):
+    """Load the chain index and reference once for the streaming Python engine"""
+    from chain_utils import ChainIndex
+    from fasta import FastaReference
+    from rename_contigs import read_chr_mapping
+
+    print(f"Loading chain file once for the whole batch: {chain_file}")
+    return VcfLifter(ChainIndex.from_file(chain_file), FastaReference(target_fasta),
+                     normalize=normalize, multiallelics=multiallelics,
+                     chr_mapping=read_chr_mapping(chr_mapping) if chr_mapping else None,
+                     contig_header=contig_header, site_filter=site_filter)
+
+
+def lift_sample(lifter, chain_file, vcf, target_fasta, out_vcf, log_file, regions=None, jobs=1,
+                checkpoint_dir=None, site_filter=None):
+    """Lift one VCF, writing the engine's log to log_file. With regions (target
+    coordinates), only the records that can land in them are read; with
+    checkpoint_dir, the python engine resumes an interrupted lift. site_filter
+    is applied by the python engine as it reads, and before CrossMap otherwise."""
+    if isinstance(lifter, VcfLifter):
+        handler = logging.FileHandler(log_file, mode='w')
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger = logging.getLogger(f"lift_vcf.{os.path.basename(out_vcf)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            result = lifter.lift_file(vcf, out_vcf, chain_file=chain_file, reference_file=target_fasta,
+                                      regions=regions, jobs=jobs, checkpoint_dir=checkpoint_dir)
+            log_result(result, logger)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        return
+
+    if regions is not None:
+        # CrossMap streams whole files: hand it only the records in the
+        # source intervals that lift into the regions
+        region_vcf = os.path.join(os.path.dirname(out_vcf), 'regions.vcf')
+        extract_records(vcf, source_regions(load_chain_index(chain_file), regions), region_vcf, site_filter)
+        vcf = region_vcf
+    elif site_filter is not None:
+        filtered_vcf = os.path.join(os.path.dirname(out_vcf), 'filtered.vcf')
+        filter_records(vcf, site_filter, filtered_vcf)
+        vcf = filtered_vcf
+
+    if lifter is None:
+        with open(log_file, 'w') as log:
+            result = subprocess.run(['CrossMap', 'vcf', chain_file, vcf, target_fasta, out_vcf], stderr=log)
+        if result.returncode != 0:
+            raise RuntimeError(f"CrossMap failed, see {log_file}")
+        return
+
+    mapping, crossmap_vcf_file = lifter
+    handler = logging.FileHandler(log_file, mode='w')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    # CrossMap reports its counts through the root logger at INFO
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+    try:
+        crossmap_vcf_file(mapping=mapping, infile=vcf, outfile=out_vcf, liftoverfile=chain_file,
+                          refgenome=target_fasta, noCompAllele=False, compress=False, cstyle='a')
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+        handler.close()
+
+
+def process_sample(sample_id, vcf, args, lifter, contig_header, work_root, trace_file):
+    """Run every liftover step for one sample and move its outputs into place"""
+    work_dir = os.path.join(work_root, sample_id)
+    os.makedirs(os.path.join(work_dir, 'tmp_sort'), exist_ok=True)
+    trace = StageTrace('batch_liftover', trace_file, sample_id=sample_id)
+
+    crossmap_vcf = f"{sample_id}.crossmap.vcf"
+    crossmap_log = f"{sample_id}.crossmap.log"
+    final_vcf = f"{sample_id}.{args.target_build}.vcf.gz"
+    collision_report = f"{sample_id}.{args.target_build}.collisions.json"
+
+    with trace.stage('lift'):
+        lift_sample(lifter, args.chain, os.path.abspath(vcf), args.target_fasta,
+                    os.path.join(work_dir, crossmap_vcf), os.path.join(work_dir, crossmap_log),
+                    regions=args.regions, jobs=args.jobs,
+                    checkpoint_dir=os.path.join(args.checkpoint_dir, sample_id) if args.checkpoint_dir else None,
+                    site_filter=args.site_filter)
+        unmap = os.path.join(work_dir, f"{crossmap_vcf}.unmap")
+        if os.path.exists(unmap):
+            os.rename(unmap, os.path.join(work_dir, f"{sample_id}.crossmap.unmap"))
+
+    with trace.stage('sort'):
+        sort_memory = ['-m', args.sort_memory] if args.sort_memory else []
+        run_command(['bcftools', 'sort', crossmap_vcf, *sort_memory, '-T', 'tmp_sort', '-Ob',
+                     '-o', f"{sample_id}.sorted.bcf"], work_dir)
+    current = f"{sample_id}.sorted.bcf"
+
+    with trace.stage('compress') as stage:
+        # ##contig lines are rebuilt from the target .fai as the VCF is
+        # compressed, and CrossMap output is renamed in the same pass (the
+        # Python engine renames contigs while lifting)
+        collisions = CollisionDetector(args.collisions) if args.collisions != 'off' else None
+        renamer = None
+        if args.chr_mapping and not isinstance(lifter, VcfLifter):
+            renamer = ContigRenamer.from_file(args.chr_mapping)
+        view = subprocess.Popen(['bcftools', 'view', current], cwd=work_dir, stdout=subprocess.PIPE)
+        try:
+            fix_stream(view.stdout, os.path.join(work_dir, final_vcf), contig_header, args.contig_header,
+                       tmp_dir=work_dir, collisions=collisions, renamer=renamer)
+        finally:
+            view.stdout.close()
+        if view.wait() != 0:
+            raise RuntimeError(f"bcftools view {current} failed")
+        if renamer is not None:
+            stage.extra['renamed'] = renamer.renamed
+        if collisions is not None:
+            stage.extra['colliding_sites'] = collisions.sites
+            collisions.write_report(os.path.join(work_dir, collision_report))
+
+    with trace.stage('index'):
+        run_command(['tabix', '-f', '-p', 'vcf', final_vcf], work_dir)
+
+    outputs = [final_vcf, f"{final_vcf}.tbi", crossmap_log, f"{sample_id}.crossmap.unmap", collision_report]
+    if args.keep_intermediate:
+        outputs.append(crossmap_vcf)
+    for name in outputs:
+        source = os.path.join(work_dir, name)
+        if os.path.exists(source):
+            shutil.move(source, os.path.join(args.output_dir, name))
+
+    if not args.keep_intermediate:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lift over a batch of VCF files in one worker')
+    parser.add_argument('--manifest', required=True, help='CSV with sample_id,vcf_path columns')
+    parser.add_argument('--chain', required=True, help='Chain file')
+    parser.add_argument('--target-fasta', required=True, help='Target reference FASTA')
+    parser.add_argument('--target-build', default='hg38', help='Target build used in output names')
+    parser.add_argument('--chr-mapping', help='Chromosome mapping file for renaming')
+    parser.add_argument('--engine', choices=('crossmap', 'python'), default='crossmap',
+                        help='Liftover engine (default: crossmap)')
+    parser.add_argument('--normalize', action='store_true', help='Normalize lifted variants (python engine)')
+    parser.add_argument('--multiallelics', choices=MULTIALLELIC_MODES, default='none',
+                        help='Split or join multiallelic records (python engine)')
+    parser.add_argument('--contig-header', choices=CONTIG_MODES, default='all',
+                        help='Declare all target contigs from the .fai, or only those in the data')
+    parser.add_argument('--collisions', choices=('off',) + COLLISION_POLICIES, default='off',
+                        help='Report, flag, keep the first of, drop or fail on records lifted to the same site')
+    parser.add_argument('--regions', help="Lift only records landing in these target regions (BED or 'chr1:1-1000')")
+    parser.add_argument('--jobs', type=int, default=1, help='Parallel region groups per sample (python engine)')
+    parser.add_argument('--checkpoint-dir',
+                        help='Checkpoint each sample lift under DIR/SAMPLE_ID so a rerun resumes it (python engine)')
+    parser.add_argument('--sort-memory', help="bcftools sort buffer, e.g. '768M' (default: bcftools' own)")
+    parser.add_argument('--output-dir', default='.', help='Directory for final outputs')
+    parser.add_argument('--keep-intermediate', action='store_true', help='Keep per-sample work directories')
+    parser.add_argument('--trace', help='Append per-sample, per-stage trace (JSON lines) to this file')
+    add_filter_arguments(parser)
+
+    args = parser.parse_args()
+
+    for tool in ('bcftools', 'tabix'):
+        if shutil.which(tool) is None:
+            sys.exit(f"ERROR: {tool} is required for batch liftover but was not found on PATH")
+
+    args.chain = os.path.abspath(args.chain)
+    args.target_fasta = os.path.abspath(args.target_fasta)
+    if args.chr_mapping:
+        args.chr_mapping = os.path.abspath(args.chr_mapping)
+    args.output_dir = os.path.abspath(args.output_dir)
+    trace_file = os.path.abspath(args.trace) if args.trace else None
+    args.regions = read_regions(args.regions) if args.regions else None
+    args.checkpoint_dir = os.path.abspath(args.checkpoint_dir) if args.checkpoint_dir else None
+    try:
+        args.site_filter = site_filter_from_args(args)
+    except OSError as e:
+        sys.exit(f"ERROR: Cannot read the whitelist: {e}")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    samples = read_manifest(args.manifest)
+    print(f"Batch contains {len(samples)} samples")
+
+    if args.engine == 'python':
+        lifter = load_python_engine(args.chain, args.target_fasta, args.normalize, args.multiallelics,
+                                    args.chr_mapping, args.contig_header, args.site_filter)
+    else:
+        lifter = load_crossmap(args.chain)
+        if lifter is None:
+            print("WARNING: CrossMap Python API not available, running the CrossMap CLI per sample")
+
+    contig_header = ContigHeader.from_fasta(args.target_fasta)
+    work_root = os.path.abspath('batch_work')
+    for i, (sample_id, vcf) in enumerate(samples, 1):
+        print(f"[{i}/{len(samples)}] Lifting sample: {sample_id}")
+        try:
+            process_sample(sample_id, vcf, args, lifter, contig_header, work_root, trace_file)
+        except Exception as e:
+            print(f"ERROR: Batch liftover failed for sample {sample_id}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    shutil.rmtree(work_root, ignore_errors=True)
+    print(f"Batch liftover completed for {len(samples)} samples")
+
+
+if __name__ == "__main__":
+    profile_main('batch_liftover', main)
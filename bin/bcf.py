@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+
+"""
+BCF Reading and Writing
+=======================
+A pure-Python codec for BCF2.2, the binary form of VCF that bcftools uses
+for intermediates (temp.bcf, *.sorted.bcf), so the Python tools can work on
+.bcf files directly instead of converting them to text and back.
+
+Records are read as typed values: CHROM is a contig index, POS an integer,
+INFO and FORMAT columns typed arrays decoded only when asked for. A record
+read from one file can be written to another with a new contig, position
+or alleles while its INFO and sample bytes are copied unchanged. Text VCF
+records can also be encoded, using the header's declared types.
+
+Usage:
+    bcf.py stats  sample.sorted.bcf            # records, samples, per-contig counts
+    bcf.py view   sample.sorted.bcf -o out.vcf.gz
+    bcf.py view   sample.vcf.gz -o out.bcf
+"""
+
+import argparse
+import gzip
+import json
+import re
+import struct
+import sys
+from array import array
+
+from bgzf import BgzfWriter
+from stage_trace import StageTrace
+
+BCF_MAGIC = b'BCF\x02\x02'
+
+# Typed value codes
+BT_NULL, BT_INT8, BT_INT16, BT_INT32, BT_FLOAT, BT_CHAR = 0, 1, 2, 3, 5, 7
+TYPE_SIZES = {BT_NULL: 0, BT_INT8: 1, BT_INT16: 2, BT_INT32: 4, BT_FLOAT: 4, BT_CHAR: 1}
+TYPE_CODES = {BT_INT8: 'b', BT_INT16: 'h', BT_INT32: 'i', BT_FLOAT: 'f'}
+INT_MISSING = {BT_INT8: -128, BT_INT16: -32768, BT_INT32: -2147483648}
+INT_END = {BT_INT8: -127, BT_INT16: -32767, BT_INT32: -2147483647}
+INT_RANGES = ((BT_INT8, -120, 127), (BT_INT16, -32760, 32767), (BT_INT32, -2147483640, 2147483647))
+FLOAT_MISSING = b'\x01\x00\x80\x7f'
+FLOAT_END = b'\x02\x00\x80\x7f'
+FLOAT_MISSING_BITS = 0x7F800001
+FLOAT_END_BITS = 0x7F800002
+
+_STRUCTURED = re.compile(r'^##(INFO|FORMAT|FILTER|contig)=<ID=([^,>]+)(.*)>\s*$')
+_SHARED = struct.Struct('<iiifII')
+_SWAP = sys.byteorder != 'little'
+
+
+def is_bcf(path):
+    return str(path).endswith('.bcf')
+
+
+def _attribute(rest, key):
+    match = re.search(r'[,<]' + key + r'=([^,>]+)', rest)
+    return match.group(1) if match else None
+
+
+class BcfHeader:
+    """VCF header text with the BCF contig and string dictionaries"""
+
+    def __init__(self, text):
+        lines = text.rstrip('\x00\n').split('\n')
+        self.meta = [line + '\n' for line in lines if line.startswith('##')]
+        self.column_line = next((line + '\n' for line in lines if line.startswith('#CHROM')), '')
+        self.samples = self.column_line.rstrip('\n').split('\t')[9:]
+
+        self.contigs = []
+        self.strings = ['PASS']
+        self.info = {}
+        self.format = {}
+        for line in self.meta:
+            match = _STRUCTURED.match(line)
+            if not match:
+                continue
+            kind, key, rest = match.groups()
+            idx = _attribute(rest, 'IDX')
+            if kind == 'contig':
+                self._place(self.contigs, key, idx)
+                continue
+            if kind == 'INFO':
+                self.info[key] = (_attribute(rest, 'Number'), _attribute(rest, 'Type'))
+            elif kind == 'FORMAT':
+                self.format[key] = (_attribute(rest, 'Number'), _attribute(rest, 'Type'))
+            if key not in self.strings or idx is not None:
+                self._place(self.strings, key, idx)
+        self.contig_ids = {name: i for i, name in enumerate(self.contigs) if name is not None}
+        self.string_ids = {name: i for i, name in enumerate(self.strings) if name is not None}
+
+    @staticmethod
+    def _place(table, key, idx):
+        if idx is None:
+            if key not in table:
+                table.append(key)
+            return
+        idx = int(idx)
+        if key in table and table.index(key) != idx:
+            table[table.index(key)] = None
+        table.extend([None] * (idx + 1 - len(table)))
+        table[idx] = key
+
+    @property
+    def text(self):
+        return ''.join(self.meta) + self.column_line
+
+    def contig_id(self, name):
+        contig_id = self.contig_ids.get(name)
+        if contig_id is None:
+            raise KeyError(f"contig {name} is not declared in the BCF header")
+        return contig_id
+
+    def string_id(self, key):
+        string_id = self.string_ids.get(key)
+        if string_id is None:
+            raise KeyError(f"{key} is not declared in the BCF header")
+        return string_id
+
+
+# ---------------------------------------------------------------------------
+# Typed values
+
+def _read_descriptor(buf, offset):
+    """(type, count, offset of the values) of the typed value at offset"""
+    descriptor = buf[offset]
+    value_type, count = descriptor & 0x0f, descriptor >> 4
+    offset += 1
+    if count == 15:
+        count, offset = _read_int(buf, offset)
+    return value_type, count, offset
+
+
+def _read_int(buf, offset):
+    """A single typed integer (dictionary keys, long counts)"""
+    value_type = buf[offset] & 0x0f
+    code = TYPE_CODES[value_type]
+    return struct.unpack_from('<' + code, buf, offset + 1)[0], offset + 1 + TYPE_SIZES[value_type]
+
+
+def _skip_typed(buf, offset):
+    value_type, count, offset = _read_descriptor(buf, offset)
+    return offset + count * TYPE_SIZES[value_type]
+
+
+def typed_array(buf, value_type, offset, count):
+    """Values as an array (ints/floats) or bytes (chars), without conversion"""
+    size = TYPE_SIZES[value_type]
+    data = buf[offset:offset + count * size]
+    if value_type == BT_CHAR:
+        return bytes(data)
+    if value_type == BT_NULL:
+        return array('b')
+    values = array(TYPE_CODES[value_type])
+    values.frombytes(data)
+    if _SWAP:
+        values.byteswap()
+    return values
+
+
+def _values(buf, value_type, offset, count):
+    """Python values of one vector, stopping at the end-of-vector marker"""
+    if value_type == BT_CHAR:
+        return bytes(buf[offset:offset + count]).split(b'\x00', 1)[0].decode()
+    if value_type == BT_FLOAT:
+        result = []
+        for i in range(count):
+            bits = struct.unpack_from('<I', buf, offset + 4 * i)[0]
+            if bits == FLOAT_END_BITS:
+                break
+            result.append(None if bits == FLOAT_MISSING_BITS else struct.unpack_from('<f', buf, offset + 4 * i)[0])
+        return result
+    if value_type == BT_NULL:
+        return []
+    missing, end = INT_MISSING[value_type], INT_END[value_type]
+    result = []
+    for value in typed_array(buf, value_type, offset, count):
+        if value == end:
+            break
+        result.append(None if value == missing else value)
+    return result
+
+
+def _encode_descriptor(value_type, count):
+    if count < 15:
+        return bytes(((count << 4) | value_type,))
+    return bytes(((15 << 4) | value_type,)) + encode_int(count)
+
+
+def _int_type(values):
+    present = [v for v in values if v is not None]
+    low, high = (min(present), max(present)) if present else (0, 0)
+    for value_type, type_low, type_high in INT_RANGES:
+        if type_low <= low and high <= type_high:
+            return value_type
+    raise ValueError(f"integer out of BCF range: {low}..{high}")
+
+
+def encode_int(value):
+    """A single typed integer"""
+    value_type = _int_type([value])
+    return bytes((0x10 | value_type,)) + struct.pack('<' + TYPE_CODES[value_type], value)
+
+
+def _pack_ints(values, value_type, width=None):
+    """Pack ints (None = missing) padded to width with end-of-vector markers"""
+    code = TYPE_CODES[value_type]
+    missing, end = INT_MISSING[value_type], INT_END[value_type]
+    row = [missing if v is None else v for v in values]
+    if width is not None:
+        row += [end] * (width - len(values))
+    return struct.pack(f'<{len(row)}{code}', *row)
+
+
+def _pack_floats(values, width=None):
+    parts = [FLOAT_MISSING if v is None else struct.pack('<f', v) for v in values]
+    if width is not None:
+        parts += [FLOAT_END] * (width - len(values))
+    return b''.join(parts)
+
+
+def encode_ints(values):
+    if not values:
+        return _encode_descriptor(BT_NULL, 0)
+    value_type = _int_type(values)
+    return _encode_descriptor(value_type, len(values)) + _pack_ints(values, value_type)
+
+
+def encode_floats(values):
+    return _encode_descriptor(BT_FLOAT, len(values)) + _pack_floats(values)
+
+
+def encode_string(text):
+    data = text.encode()
+    return _encode_descriptor(BT_CHAR, len(data)) + data
+
+
+def _parse_numbers(text, kind):
+    convert = float if kind == 'Float' else int
+    return [None if v in ('.', '') else convert(v) for v in text.split(',')]
+
+
+def _format_number(value):
+    if value is None:
+        return '.'
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+# ---------------------------------------------------------------------------
+# Records
+
+class BcfRecord:
+    """One BCF record: typed site fields, raw INFO and sample bytes.
+
+    The ID, alleles and FILTER are decoded on first access; INFO and FORMAT
+    values only through info(), format_values() and genotypes().
+    """
+
+    __slots__ = ('header', 'chrom', 'pos', 'rlen', 'qual', 'n_info', 'n_allele', 'n_sample', 'n_fmt',
+                 'shared', 'indiv', '_id', '_alleles', '_filter_offset', '_info_offset')
+
+    def __init__(self, header, shared, indiv):
+        self.header = header
+        self.shared = shared
+        self.indiv = indiv
+        chrom, pos, rlen, qual, allele_info, fmt_sample = _SHARED.unpack_from(shared, 0)
+        self.chrom, self.pos, self.rlen = chrom, pos, rlen
+        self.qual = None if struct.unpack_from('<I', shared, 12)[0] == FLOAT_MISSING_BITS else qual
+        self.n_allele, self.n_info = allele_info >> 16, allele_info & 0xffff
+        self.n_fmt, self.n_sample = fmt_sample >> 24, fmt_sample & 0xffffff
+        self._id = None
+
+    @property
+    def contig(self):
+        return self.header.contigs[self.chrom]
+
+    def _decode_site(self):
+        buf = self.shared
+        value_type, count, offset = _read_descriptor(buf, _SHARED.size)
+        self._id = _values(buf, value_type, offset, count) or '.'
+        offset += count
+        alleles = []
+        for _ in range(self.n_allele):
+            value_type, count, offset = _read_descriptor(buf, offset)
+            alleles.append(bytes(buf[offset:offset + count]).decode())
+            offset += count
+        self._alleles = alleles
+        self._filter_offset = offset
+        self._info_offset = _skip_typed(buf, offset)
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._decode_site()
+        return self._id
+
+    @property
+    def alleles(self):
+        if self._id is None:
+            self._decode_site()
+        return self._alleles
+
+    @property
+    def filters(self):
+        if self._id is None:
+            self._decode_site()
+        value_type, count, offset = _read_descriptor(self.shared, self._filter_offset)
+        return [self.header.strings[i] for i in _values(self.shared, value_type, offset, count)]
+
+    def info(self):
+        """INFO as {key: value}: True for flags, a str, or a list of numbers"""
+        if self._id is None:
+            self._decode_site()
+        buf, offset, result = self.shared, self._info_offset, {}
+        for _ in range(self.n_info):
+            key, offset = _read_int(buf, offset)
+            value_type, count, offset = _read_descriptor(buf, offset)
+            name = self.header.strings[key]
+            result[name] = True if value_type == BT_NULL else _values(buf, value_type, offset, count)
+            offset += count * TYPE_SIZES[value_type]
+        return result
+
+    def format_fields(self):
+        """[(key, type, values per sample, offset)] of the FORMAT columns"""
+        buf, offset, fields = self.indiv, 0, []
+        for _ in range(self.n_fmt):
+            key, offset = _read_int(buf, offset)
+            value_type, count, offset = _read_descriptor(buf, offset)
+            fields.append((self.header.strings[key], value_type, count, offset))
+            offset += count * TYPE_SIZES[value_type] * self.n_sample
+        return fields
+
+    def format_values(self, key):
+        """A FORMAT column as one typed array of n_sample x per-sample values
+        (bytes for strings), with its per-sample width; None if absent"""
+        for name, value_type, count, offset in self.format_fields():
+            if name == key:
+                return typed_array(self.indiv, value_type, offset, count * self.n_sample), count
+        return None
+
+    def genotypes(self):
+        """GT as an int8/16/32 array of (allele + 1) << 1 | phased, ploidy wide"""
+        return self.format_values('GT')
+
+    def site_text(self):
+        """CHROM..ALT as text fields"""
+        alleles = self.alleles
+        return [self.contig, str(self.pos + 1), self.id, alleles[0], ','.join(alleles[1:]) or '.']
+
+    def tail_text(self):
+        """QUAL onwards (QUAL, FILTER, INFO, FORMAT and samples) as VCF text"""
+        filters = self.filters
+        columns = ['.' if self.qual is None else _format_number(self.qual),
+                   ';'.join(filters) if filters else ('.' if self.filter_missing() else 'PASS')]
+        info = self.info()
+        columns.append(';'.join(key if value is True else f"{key}={_format_info(value)}"
+                                for key, value in info.items()) or '.')
+        if self.n_fmt:
+            fields = self.format_fields()
+            columns.append(':'.join(field[0] for field in fields))
+            for sample in range(self.n_sample):
+                columns.append(':'.join(self._format_cell(field, sample) for field in fields))
+        return '\t'.join(columns)
+
+    def filter_missing(self):
+        value_type, count, _ = _read_descriptor(self.shared, self._filter_offset)
+        return count == 0
+
+    def _format_cell(self, field, sample):
+        key, value_type, count, offset = field
+        offset += sample * count * TYPE_SIZES[value_type]
+        if key == 'GT' and value_type != BT_CHAR:
+            return _format_genotype(typed_array(self.indiv, value_type, offset, count), INT_END[value_type])
+        values = _values(self.indiv, value_type, offset, count)
+        if value_type == BT_CHAR:
+            return values or '.'
+        return ','.join(_format_number(v) for v in values) or '.'
+
+    def to_text(self):
+        """The record as a VCF line, without the newline"""
+        return '\t'.join(self.site_text()) + '\t' + self.tail_text()
+
+    def replace(self, header=None, contig=None, pos=None, id=None, alleles=None):
+        """A copy for another header and/or with a new site; INFO and sample
+        bytes are copied unchanged (keys are renumbered only when the two
+        headers' dictionaries differ)"""
+        header = header or self.header
+        if self._id is None:
+            self._decode_site()
+        contig_id = header.contig_id(contig if contig is not None else self.contig)
+        pos = self.pos if pos is None else pos
+        id = self.id if id is None else id
+        alleles = self.alleles if alleles is None else alleles
+
+        filter_info = bytes(self.shared[self._filter_offset:])
+        indiv = self.indiv
+        if header is not self.header and header.strings != self.header.strings:
+            filter_info = self._remap_filter_info(header)
+            indiv = self._remap_format(header)
+
+        rlen = self.rlen if alleles[0] == self.alleles[0] and pos == self.pos else len(alleles[0])
+        qual = FLOAT_MISSING if self.qual is None else self.shared[12:16]
+        site = (struct.pack('<iii', contig_id, pos, rlen) + bytes(qual)
+                + struct.pack('<II', (len(alleles) << 16) | self.n_info, (self.n_fmt << 24) | self.n_sample)
+                + (encode_string('' if id == '.' else id))
+                + b''.join(encode_string(allele) for allele in alleles))
+        return BcfRecord(header, site + filter_info, indiv)
+
+    def _remap_filter_info(self, header):
+        buf = self.shared
+        value_type, count, offset = _read_descriptor(buf, self._filter_offset)
+        filters = [header.string_id(self.header.strings[i]) for i in _values(buf, value_type, offset, count)]
+        parts = [encode_ints(filters)]
+        offset = self._info_offset
+        for _ in range(self.n_info):
+            key, offset = _read_int(buf, offset)
+            end = _skip_typed(buf, offset)
+            parts.append(encode_int(header.string_id(self.header.strings[key])))
+            parts.append(bytes(buf[offset:end]))
+            offset = end
+        return b''.join(parts)
+
+    def _remap_format(self, header):
+        parts = []
+        for key, value_type, count, offset in self.format_fields():
+            start = offset - len(_encode_descriptor(value_type, count))
+            end = offset + count * TYPE_SIZES[value_type] * self.n_sample
+            parts.append(encode_int(header.string_id(key)))
+            parts.append(bytes(self.indiv[start:end]))
+        return b''.join(parts)
+
+
+def _format_info(value):
+    if isinstance(value, str):
+        return value
+    return ','.join(_format_number(v) for v in value) or '.'
+
+
+def _format_genotype(values, end):
+    alleles = []
+    for i, value in enumerate(values):
+        if value == end:
+            break
+        allele = '.' if value >> 1 == 0 else str((value >> 1) - 1)
+        if i:
+            alleles.append('|' if value & 1 else '/')
+        alleles.append(allele)
+    return ''.join(alleles) or '.'
+
+
+def encode_record(header, fields):
+    """Encode text VCF fields (CHROM, POS, ..., samples) as a BcfRecord"""
+    alleles = [fields[3]] + ([] if fields[4] == '.' else fields[4].split(','))
+    qual = FLOAT_MISSING if fields[5] == '.' else struct.pack('<f', float(fields[5]))
+    filters = [] if fields[6] == '.' else [header.string_id(f) for f in fields[6].split(';')]
+
+    info_parts = []
+    n_info = 0
+    end = None
+    if fields[7] != '.':
+        for item in fields[7].split(';'):
+            key, _, value = item.partition('=')
+            kind = header.info.get(key, (None, 'String'))[1]
+            info_parts.append(encode_int(header.string_id(key)))
+            if kind == 'Flag':
+                info_parts.append(_encode_descriptor(BT_NULL, 0))
+            elif kind in ('Integer', 'Float'):
+                numbers = _parse_numbers(value, kind)
+                info_parts.append(encode_ints(numbers) if kind == 'Integer' else encode_floats(numbers))
+                if key == 'END' and numbers and numbers[0] is not None:
+                    end = numbers[0]
+            else:
+                info_parts.append(encode_string(value))
+            n_info += 1
+
+    pos = int(fields[1]) - 1
+    rlen = end - pos if end is not None else len(alleles[0])
+    format_keys = fields[8].split(':') if len(fields) > 8 and fields[8] != '.' else []
+    samples = [cell.split(':') for cell in fields[9:]]
+    indiv = b''.join(_encode_format(header, key, [cells[k] if k < len(cells) else '.' for cells in samples])
+                     for k, key in enumerate(format_keys))
+
+    site = (struct.pack('<iii', header.contig_id(fields[0]), pos, rlen) + qual
+            + struct.pack('<II', (len(alleles) << 16) | n_info, (len(format_keys) << 24) | len(samples))
+            + encode_string('' if fields[2] == '.' else fields[2])
+            + b''.join(encode_string(allele) for allele in alleles)
+            + encode_ints(filters) + b''.join(info_parts))
+    return BcfRecord(header, site, indiv)
+
+
+def _encode_format(header, key, cells):
+    key_bytes = encode_int(header.string_id(key))
+    kind = header.format.get(key, (None, 'String'))[1]
+    if key == 'GT':
+        rows = [_parse_genotype(cell) for cell in cells]
+        width = max(len(row) for row in rows)
+        value_type = _int_type([v for row in rows for v in row] or [0])
+        return (key_bytes + _encode_descriptor(value_type, width)
+                + b''.join(_pack_ints(row, value_type, width) for row in rows))
+    if kind in ('Integer', 'Float'):
+        rows = [[None] if cell in ('.', '') else _parse_numbers(cell, kind) for cell in cells]
+        width = max(len(row) for row in rows)
+        if kind == 'Float':
+            return (key_bytes + _encode_descriptor(BT_FLOAT, width)
+                    + b''.join(_pack_floats(row, width) for row in rows))
+        value_type = _int_type([v for row in rows for v in row])
+        return (key_bytes + _encode_descriptor(value_type, width)
+                + b''.join(_pack_ints(row, value_type, width) for row in rows))
+    data = [cell.encode() for cell in cells]
+    # One NUL past the longest value, as htslib writes it
+    width = max(len(d) for d in data) + 1
+    return key_bytes + _encode_descriptor(BT_CHAR, width) + b''.join(d.ljust(width, b'\x00') for d in data)
+
+
+def _parse_genotype(cell):
+    if cell in ('.', ''):
+        return [0]
+    alleles = re.split(r'([/|])', cell)
+    separators = alleles[1::2]
+    values = alleles[0::2]
+    # Haploid and all-phased genotypes mark the first allele phased too (htslib)
+    phased = [len(values) == 1 or all(s == '|' for s in separators)] + [s == '|' for s in separators]
+    return [(0 if allele == '.' else (int(allele) + 1) << 1) | flag for allele, flag in zip(values, phased)]
+
+
+# ---------------------------------------------------------------------------
+# Files
+
+class BcfReader:
+    """Iterate the records of a BGZF-compressed BCF file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'rb')
+        magic = self._file.read(5)
+        if magic != BCF_MAGIC:
+            self._file.close()
+            raise ValueError(f"{path}: not a BCF 2.2 file")
+        (l_text,) = struct.unpack('<I', self._file.read(4))
+        self.header = BcfHeader(self._file.read(l_text).decode())
+
+    def __iter__(self):
+        read, header = self._file.read, self.header
+        while True:
+            lengths = read(8)
+            if len(lengths) < 8:
+                return
+            l_shared, l_indiv = struct.unpack('<II', lengths)
+            data = read(l_shared + l_indiv)
+            view = memoryview(data)
+            yield BcfRecord(header, view[:l_shared], view[l_shared:])
+
+    def contig_counts(self):
+        """Records per contig from the CHROM field alone"""
+        counts = {}
+        read = self._file.read
+        while True:
+            lengths = read(8)
+            if len(lengths) < 8:
+                break
+            l_shared, l_indiv = struct.unpack('<II', lengths)
+            chrom = struct.unpack('<i', read(l_shared + l_indiv)[:4])[0]
+            counts[chrom] = counts.get(chrom, 0) + 1
+        return {self.header.contigs[chrom]: count for chrom, count in counts.items()}
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def header_bytes(header):
+    """Magic and header text as they start a BCF file"""
+    text = header.text.encode() + b'\x00'
+    return BCF_MAGIC + struct.pack('<I', len(text)) + text
+
+
+def record_bytes(record):
+    """A record as it is stored in a BCF file"""
+    return b''.join((struct.pack('<II', len(record.shared), len(record.indiv)), record.shared, record.indiv))
+
+
+class BcfWriter:
+    """Write a BGZF-compressed BCF file"""
+
+    def __init__(self, path, header, threads=1, level=6):
+        self.header = header if isinstance(header, BcfHeader) else BcfHeader(header)
+        self._out = BgzfWriter(path, threads=threads, level=level)
+        self._out.write(header_bytes(self.header))
+
+    def write(self, record):
+        """Write a BcfRecord (re-keyed if it comes from another header)"""
+        if record.header is not self.header and record.header.strings != self.header.strings:
+            record = record.replace(header=self.header)
+        self._out.write(record_bytes(record))
+
+    def write_text(self, fields):
+        """Encode and write a record given as text VCF fields"""
+        self.write(encode_record(self.header, fields))
+
+    def write_raw(self, data):
+        """Write already encoded records (see record_bytes)"""
+        self._out.write(data)
+
+    def close(self):
+        self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def bcf_stats(path):
+    """Records, samples and records per contig, read from typed CHROM values"""
+    with BcfReader(path) as reader:
+        contig_counts = reader.contig_counts()
+        return {
+            'variant_count': sum(contig_counts.values()),
+            'sample_count': len(reader.header.samples),
+            'chromosome_counts': contig_counts,
+        }
+
+
+def _cmd_view(args):
+    if is_bcf(args.input):
+        reader = BcfReader(args.input)
+        header, records = reader.header, reader
+    else:
+        reader = gzip.open(args.input, 'rt') if args.input.endswith(('.gz', '.bgz')) else open(args.input)
+        text = []
+        for line in reader:
+            text.append(line)
+            if line.startswith('#CHROM'):
+                break
+        header, records = BcfHeader(''.join(text)), reader
+
+    try:
+        if is_bcf(args.output):
+            with BcfWriter(args.output, header, threads=args.threads) as out:
+                for record in records:
+                    if isinstance(record, BcfRecord):
+                        out.write(record)
+                    elif record.strip():
+                        out.write_text(record.rstrip('\n').split('\t'))
+        else:
+            compressed = args.output.endswith(('.gz', '.bgz'))
+            with (BgzfWriter(args.output, threads=args.threads) if compressed else open(args.output, 'w')) as out:
+                out.write(header.text)
+                for record in records:
+                    out.write(record.to_text() + '\n' if isinstance(record, BcfRecord) else record)
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read and write BCF files without bcftools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stats = subparsers.add_parser('stats', help='Print record, sample and per-contig counts as JSON')
+    stats.add_argument('input', help='Input BCF')
+    stats.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+
+    view = subparsers.add_parser('view', help='Convert between BCF and VCF (format from the output name)')
+    view.add_argument('input', help='Input BCF or VCF')
+    view.add_argument('-o', '--output', required=True, help='Output .bcf, .vcf or .vcf.gz')
+    view.add_argument('--threads', type=int, default=1, help='BGZF compression threads')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'stats':
+            with StageTrace('bcf', args.trace).stage('stats') as stage:
+                stats = bcf_stats(args.input)
+                stage.records = stats['variant_count']
+            print(json.dumps(stats, indent=2))
+        else:
+            _cmd_view(args)
+    except (ValueError, KeyError) as e:
+        sys.exit(f"ERROR: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+
+"""
+Liftover Benchmark Suite
+========================
+Generate synthetic, chain-covered VCF datasets at configurable scale and time
+each pipeline stage (lift, sort, rename, bgzip, index, stats), recording
+records/sec and peak RSS to JSON so runs can be compared over time. The
+parity subcommand checks that outputs still match a baseline set record by
+record (vcf_parity.py), e.g. after a tooling or chain change.
+
+Everything runs locally; no network access is needed. Stages whose tools are
+not installed are reported as skipped rather than failing the benchmark.
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from chain_utils import read_chains, normalize_contig
+from generate_test_data import NUMPY_AVAILABLE, create_large_vcf, create_vcf_header, generate_variant
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+DEFAULT_CHAIN = os.path.join(PROJECT_DIR, 'chains', 'hg19ToHg38.over.chain.gz')
+LIFTOVER_TOOLS = os.path.join(SCRIPT_DIR, 'liftover-tools')
+
+# Subcommands of the small per-sample and per-run tasks, timed by `startup`
+STARTUP_COMMANDS = 'resolve,check-input,validate,stats,lift'
+# Cold start (interpreter, imports and argument parsing) of one subcommand
+STARTUP_TARGET_MS = 100
+
+MIN_SITES, MAX_SITES = 1000, 10000000
+MIN_SAMPLES, MAX_SAMPLES = 1, 5000
+
+
+def contig_sort_key(name):
+    """Natural chromosome order: 1..22, X, Y, M, then everything else"""
+    short = normalize_contig(name)
+    if short.isdigit():
+        return (0, int(short), '')
+    order = {'X': 23, 'Y': 24, 'M': 25, 'MT': 25}
+    if short.upper() in order:
+        return (0, order[short.upper()], '')
+    return (1, 0, name)
+
+
+def parse_scale_list(value, low, high, label):
+    """Parse a comma-separated list of scales and check the allowed range"""
+    scales = []
+    for item in value.split(','):
+        item = item.strip().lower().replace('_', '')
+        if not item:
+            continue
+        multiplier = 1
+        if item.endswith('k'):
+            multiplier, item = 1000, item[:-1]
+        elif item.endswith('m'):
+            multiplier, item = 1000000, item[:-1]
+        try:
+            scale = int(float(item) * multiplier)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid {label} value: {item}")
+        if scale < low or scale > high:
+            raise argparse.ArgumentTypeError(f"{label} must be between {low:,} and {high:,} (got {scale:,})")
+        scales.append(scale)
+    return scales
+
+
+def select_chromosomes(value):
+    """Return a set of normalized chromosome names, or None for all"""
+    if not value or value == 'all':
+        return None
+    return {normalize_contig(c.strip()) for c in value.split(',') if c.strip()}
+
+
+def collect_covered_blocks(chain_file, chromosomes=None):
+    """Collect chain-covered source blocks, source contig sizes and the
+    furthest target coordinate reached on each target contig"""
+    blocks = []
+    source_sizes = {}
+    target_extents = {}
+    for chain in read_chains(chain_file):
+        if chromosomes is not None and normalize_contig(chain.source_name) not in chromosomes:
+            continue
+        source_sizes[chain.source_name] = chain.source_size
+        if chain.target_strand == '-':
+            extent = chain.target_size - chain.target_start
+        else:
+            extent = chain.target_end
+        target_extents[chain.target_name] = max(extent, target_extents.get(chain.target_name, 0))
+        for source_start, source_end, _ in chain.aligned_blocks():
+            blocks.append((chain.source_name, source_start, source_end))
+
+    blocks.sort(key=lambda b: (contig_sort_key(b[0]), b[1]))
+    return blocks, source_sizes, target_extents
+
+
+def sample_positions(blocks, n_sites, rng):
+    """Draw n distinct 1-based positions uniformly over the covered blocks"""
+    offsets = []
+    total = 0
+    for chrom, start, end in blocks:
+        offsets.append(total)
+        total += end - start
+
+    if n_sites > total:
+        sys.exit(f"ERROR: Requested {n_sites:,} sites but chains only cover {total:,} bases")
+
+    positions = set()
+    for offset in sorted(rng.sample(range(total), n_sites)):
+        i = bisect.bisect_right(offsets, offset) - 1
+        chrom, start, _ = blocks[i]
+        positions.add((chrom, start + (offset - offsets[i]) + 1))
+
+    return sorted(positions, key=lambda p: (contig_sort_key(p[0]), p[1]))
+
+
+def sample_positions_vectorized(blocks, n_sites, seed):
+    """NumPy version of sample_positions returning (chrom, positions) groups"""
+    rng = np.random.default_rng(seed)
+    starts = np.array([b[1] for b in blocks], dtype=np.int64)
+    lengths = np.array([b[2] - b[1] for b in blocks], dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    total = int(lengths.sum())
+
+    if n_sites > total:
+        sys.exit(f"ERROR: Requested {n_sites:,} sites but chains only cover {total:,} bases")
+
+    picks = np.sort(rng.choice(total, n_sites, replace=False))
+    block_idx = np.searchsorted(offsets, picks, side='right') - 1
+    positions = starts[block_idx] + (picks - offsets[block_idx]) + 1
+
+    # Blocks are sorted by contig, so each contig is one contiguous run
+    chroms = [b[0] for b in blocks]
+    sites = []
+    run_start = 0
+    for i in range(1, len(block_idx) + 1):
+        if i == len(block_idx) or chroms[block_idx[i]] != chroms[block_idx[run_start]]:
+            sites.append((chroms[block_idx[run_start]], np.unique(positions[run_start:i])))
+            run_start = i
+    return sites
+
+
+def write_dataset(output, positions, n_samples, source_sizes, rng_seed):
+    """Write a gzipped VCF with one synthetic SNV per position (pure-Python fallback)"""
+    random.seed(rng_seed)
+    sample_names = [f"SAMPLE{i:05d}" for i in range(1, n_samples + 1)]
+
+    contigs = {}
+    for chrom, _ in positions:
+        contigs.setdefault(chrom, source_sizes[chrom])
+
+    with gzip.open(output, 'wt') as f:
+        for line in create_vcf_header(sample_names, "hg19", contigs):
+            f.write(line + "\n")
+        for chrom, pos in positions:
+            ref = random.choice("ACGT")
+            alt = random.choice([b for b in "ACGT" if b != ref])
+            af = random.uniform(0.05, 0.95)
+            f.write(generate_variant(chrom, pos, ref, alt, sample_names, af) + "\n")
+
+
+def synthesize_target_fasta(fasta_file, target_extents, rng_seed, line_width=60):
+    """Write a random-sequence FASTA (and .fai) for the reachable target contigs.
+
+    Contigs are truncated at the furthest position any selected chain reaches,
+    and sequence is tiled from a random pool: the content only needs to be
+    plausible, not unique, and drawing every base would dominate set-up time.
+    """
+    rng = random.Random(rng_seed)
+    chunk_lines = 16384
+    chunk_size = line_width * chunk_lines
+    pool = ''.join(rng.choices('ACGT', k=chunk_size))
+    pool += pool
+
+    with open(fasta_file, 'w') as fa, open(f"{fasta_file}.fai", 'w') as fai:
+        offset = 0
+        for contig in sorted(target_extents, key=contig_sort_key):
+            length = target_extents[contig]
+            header = f">{contig}\n"
+            fa.write(header)
+            offset += len(header)
+            fai.write(f"{contig}\t{length}\t{offset}\t{line_width}\t{line_width + 1}\n")
+
+            remaining = length
+            while remaining > 0:
+                n = min(remaining, chunk_size)
+                start = rng.randrange(chunk_size)
+                seq = pool[start:start + n]
+                lines = [seq[i:i + line_width] for i in range(0, n, line_width)]
+                text = '\n'.join(lines) + '\n'
+                fa.write(text)
+                offset += len(text)
+                remaining -= n
+
+
+def peak_rss_mb(usage):
+    """Convert ru_maxrss to MB (kilobytes on Linux, bytes on macOS)"""
+    if sys.platform == 'darwin':
+        return round(usage.ru_maxrss / (1024 * 1024), 2)
+    return round(usage.ru_maxrss / 1024, 2)
+
+
+def run_stage(name, cmd, records, requires=None, stdout_file=None, stderr_file=None):
+    """Run one stage as a child process and record wall time, CPU and peak RSS"""
+    result = {'stage': name, 'command': ' '.join(str(c) for c in cmd), 'records': records}
+
+    if shutil.which(str(cmd[0])) is None:
+        result.update(status='skipped', reason=f"{cmd[0]} not found on PATH")
+        return result
+
+    for path in requires or []:
+        if not os.path.exists(path):
+            result.update(status='skipped', reason=f"missing input from previous stage: {os.path.basename(path)}")
+            return result
+
+    stdout = open(stdout_file, 'w') if stdout_file else subprocess.DEVNULL
+    stderr = open(stderr_file, 'w+') if stderr_file else tempfile.TemporaryFile('w+')
+    try:
+        start = time.perf_counter()
+        proc = subprocess.Popen([str(c) for c in cmd], stdout=stdout, stderr=stderr)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        returncode = os.waitstatus_to_exitcode(status)
+        stderr.seek(0)
+        error_text = stderr.read()
+    finally:
+        if stdout_file:
+            stdout.close()
+        stderr.close()
+
+    result.update(
+        status='ok' if returncode == 0 else 'failed',
+        returncode=returncode,
+        wall_seconds=round(wall, 3),
+        user_seconds=round(usage.ru_utime, 3),
+        sys_seconds=round(usage.ru_stime, 3),
+        peak_rss_mb=peak_rss_mb(usage),
+        records_per_sec=round(records / wall, 1) if wall > 0 else None,
+    )
+    if returncode != 0:
+        result['reason'] = error_text.strip()[-500:]
+    return result
+
+
+def benchmark_dataset(args, n_sites, n_samples, target_fasta, work_dir):
+    """Generate one dataset and run every pipeline stage against it"""
+    dataset_dir = os.path.join(work_dir, f"sites{n_sites}_samples{n_samples}")
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    sample_id = 'bench'
+    input_vcf = os.path.join(dataset_dir, f"{sample_id}.vcf.gz")
+    lifted_vcf = os.path.join(dataset_dir, f"{sample_id}.crossmap.vcf")
+    crossmap_log = os.path.join(dataset_dir, f"{sample_id}.crossmap.log")
+    sorted_bcf = os.path.join(dataset_dir, f"{sample_id}.sorted.bcf")
+    renamed_bcf = os.path.join(dataset_dir, f"{sample_id}.renamed.bcf")
+    final_vcf = os.path.join(dataset_dir, f"{sample_id}.{args.target_build}.vcf.gz")
+    chr_mapping = os.path.join(dataset_dir, 'chr_mapping.txt')
+    sort_tmp = os.path.join(dataset_dir, 'tmp_sort')
+    stats_dir = os.path.join(dataset_dir, 'stats')
+
+    with open(f"{target_fasta}.fai") as fai, open(chr_mapping, 'w') as mapping:
+        for line in fai:
+            contig = line.split('\t')[0]
+            mapping.write(f"{contig}\t{normalize_contig(contig)}\n")
+
+    os.makedirs(sort_tmp, exist_ok=True)
+    stages = [
+        run_stage('generate', [sys.executable, os.path.abspath(__file__), 'generate',
+                               '--chain', args.chain, '--chroms', args.chroms,
+                               '--sites', n_sites, '--samples', n_samples,
+                               '--seed', args.seed, '--output', input_vcf],
+                  n_sites),
+    ]
+    stages.append(run_stage('lift', ['CrossMap', 'vcf', args.chain, input_vcf, target_fasta, lifted_vcf],
+                            n_sites, requires=[input_vcf], stderr_file=crossmap_log))
+    stages.append(run_stage('sort', ['bcftools', 'sort', lifted_vcf, '-T', sort_tmp, '-Ob', '-o', sorted_bcf],
+                            n_sites, requires=[lifted_vcf]))
+    stages.append(run_stage('rename', ['bcftools', 'annotate', '--rename-chrs', chr_mapping,
+                                       sorted_bcf, '-Ob', '-o', renamed_bcf],
+                            n_sites, requires=[sorted_bcf]))
+    stages.append(run_stage('bgzip', ['bcftools', 'view', renamed_bcf, '-Oz', '-o', final_vcf],
+                            n_sites, requires=[renamed_bcf]))
+    stages.append(run_stage('index', ['tabix', '-f', '-p', 'vcf', final_vcf],
+                            n_sites, requires=[final_vcf]))
+    stages.append(run_stage('stats', [sys.executable, os.path.join(SCRIPT_DIR, 'generate_stats.py'),
+                                      '--log-dir', dataset_dir, '--vcf-dir', dataset_dir,
+                                      '--output-dir', stats_dir, '--format', 'json'],
+                            n_sites, requires=[crossmap_log]))
+
+    dataset = {
+        'sites': n_sites,
+        'samples': n_samples,
+        'input_bytes': os.path.getsize(input_vcf) if os.path.exists(input_vcf) else 0,
+        'stages': stages,
+    }
+
+    if not args.keep_files:
+        shutil.rmtree(dataset_dir, ignore_errors=True)
+
+    return dataset
+
+
+def compare_results(current, baseline_file):
+    """Print records/sec changes against a previous benchmark JSON"""
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+
+    previous = {}
+    for dataset in baseline.get('datasets', []):
+        for stage in dataset['stages']:
+            if stage.get('records_per_sec'):
+                previous[(dataset['sites'], dataset['samples'], stage['stage'])] = stage['records_per_sec']
+
+    print(f"\nComparison against {baseline_file}:")
+    print(f"  {'sites':>10} {'samples':>8} {'stage':<9} {'before':>12} {'after':>12} {'change':>8}")
+    for dataset in current['datasets']:
+        for stage in dataset['stages']:
+            key = (dataset['sites'], dataset['samples'], stage['stage'])
+            if key in previous and stage.get('records_per_sec'):
+                before, after = previous[key], stage['records_per_sec']
+                change = (after - before) / before * 100
+                print(f"  {key[0]:>10,} {key[1]:>8,} {key[2]:<9} {before:>12,.1f} {after:>12,.1f} {change:>+7.1f}%")
+
+
+def cmd_startup(args):
+    """Time the cold start of liftover-tools subcommands against a bare interpreter"""
+    def median_stage(name, cmd):
+        runs = [run_stage(name, cmd, 0) for _ in range(args.repeat)]
+        failed = [run for run in runs if run['status'] != 'ok']
+        if failed:
+            return failed[0]
+        runs.sort(key=lambda run: run['wall_seconds'])
+        return runs[len(runs) // 2]
+
+    baseline = median_stage('python', [sys.executable, '-c', 'pass'])
+    if baseline['status'] != 'ok':
+        sys.exit(f"ERROR: Cannot run {sys.executable}: {baseline.get('reason', '')}")
+    baseline_ms = baseline['wall_seconds'] * 1000
+
+    results = {
+        'benchmark': 'liftover-tools startup',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'target_ms': args.target_ms,
+        'interpreter_ms': round(baseline_ms, 1),
+        'commands': [],
+    }
+    print(f"  {'subcommand':<14} {'cold start':>11} {'imports':>9} {'peak RSS':>10}")
+    print(f"  {'(python)':<14} {baseline_ms:>9.1f}ms {'':>9} {baseline['peak_rss_mb']:>8.1f}MB")
+    over_target = []
+    for command in args.commands.split(','):
+        stage = median_stage(command, [sys.executable, LIFTOVER_TOOLS, command, '--help'])
+        if stage['status'] != 'ok':
+            print(f"  {command:<14} {stage['status']}: {stage.get('reason', '')}")
+            over_target.append(command)
+            continue
+        wall_ms = stage['wall_seconds'] * 1000
+        results['commands'].append({'subcommand': command, 'cold_start_ms': round(wall_ms, 1),
+                                    'import_ms': round(wall_ms - baseline_ms, 1),
+                                    'peak_rss_mb': stage['peak_rss_mb']})
+        print(f"  {command:<14} {wall_ms:>9.1f}ms {wall_ms - baseline_ms:>7.1f}ms {stage['peak_rss_mb']:>8.1f}MB")
+        if wall_ms > args.target_ms:
+            over_target.append(command)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Startup results written to: {args.output}")
+    if over_target:
+        sys.exit(f"ERROR: Cold start above {args.target_ms} ms: {', '.join(over_target)}")
+
+
+def cmd_parity(args):
+    """Compare every final VCF/BCF of a run with the same-named file of a baseline run"""
+    def outputs(directory):
+        return {name for name in os.listdir(directory) if name.endswith(('.vcf.gz', '.bcf'))}
+
+    for directory in (args.baseline_dir, args.current_dir):
+        if not os.path.isdir(directory):
+            sys.exit(f"ERROR: Directory not found: {directory}")
+    baseline, current = outputs(args.baseline_dir), outputs(args.current_dir)
+    work_dir = tempfile.mkdtemp(prefix='parity_')
+    results = {
+        'benchmark': 'output parity',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'baseline_dir': args.baseline_dir,
+        'current_dir': args.current_dir,
+        'missing': sorted(baseline - current),
+        'new': sorted(current - baseline),
+        'files': [],
+    }
+    print(f"  {'file':<40} {'records':>12} {'differences':>12} {'rec/s':>14} {'peak RSS':>10}")
+    failed = list(results['missing'])
+    for name in sorted(baseline & current):
+        report_file = os.path.join(work_dir, f"{name}.parity.json")
+        stage = run_stage('parity', [sys.executable, LIFTOVER_TOOLS, 'parity',
+                                     os.path.join(args.baseline_dir, name), os.path.join(args.current_dir, name),
+                                     '--max-diffs', args.max_diffs, '-o', report_file], 0)
+        if not os.path.exists(report_file):
+            print(f"  {name:<40} {stage['status']}: {stage.get('reason', '')}")
+            results['files'].append({'file': name, 'stage': stage})
+            failed.append(name)
+            continue
+        with open(report_file) as f:
+            report = json.load(f)
+        records = report['records_a'] + report['records_b']
+        stage['records'] = records
+        stage['records_per_sec'] = round(records / stage['wall_seconds'], 1) if stage['wall_seconds'] else None
+        differences = report['differing'] + report['only_in_a'] + report['only_in_b']
+        results['files'].append({'file': name, 'stage': stage, 'report': report})
+        print(f"  {name:<40} {records:>12,} {differences:>12,} {stage['records_per_sec'] or 0:>14,.1f} "
+              f"{stage['peak_rss_mb']:>8.1f}MB")
+        if not report['parity']:
+            failed.append(name)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Parity results written to: {args.output}")
+    for name in results['missing']:
+        print(f"  missing from {args.current_dir}: {name}")
+    if failed:
+        sys.exit(f"ERROR: Outputs differ from the baseline: {', '.join(failed)}")
+
+
+def cmd_generate(args):
+    """Write a single synthetic dataset"""
+    blocks, source_sizes, _ = collect_covered_blocks(args.chain, select_chromosomes(args.chroms))
+    if not blocks:
+        sys.exit(f"ERROR: No chain blocks found for chromosomes: {args.chroms}")
+
+    if NUMPY_AVAILABLE:
+        sites = sample_positions_vectorized(blocks, args.sites, args.seed)
+        sample_names = [f"SAMPLE{i:05d}" for i in range(1, args.samples + 1)]
+        contigs = {chrom: source_sizes[chrom] for chrom, _ in sites}
+        total = create_large_vcf(args.output, sites, sample_names, "hg19", contigs,
+                                 seed=args.seed, threads=args.threads)
+    else:
+        positions = sample_positions(blocks, args.sites, random.Random(args.seed))
+        write_dataset(args.output, positions, args.samples, source_sizes, args.seed)
+        total = len(positions)
+    print(f"Wrote {total:,} sites x {args.samples:,} samples to {args.output}")
+
+
+def cmd_run(args):
+    """Run the benchmark matrix and write the results JSON"""
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+
+    target_fasta = args.target_fasta
+    if not target_fasta:
+        _, _, target_extents = collect_covered_blocks(args.chain, select_chromosomes(args.chroms))
+        target_fasta = os.path.join(work_dir, 'synthetic_target.fa')
+        if not os.path.exists(f"{target_fasta}.fai"):
+            print(f"Synthesizing target FASTA for {len(target_extents)} contigs: {target_fasta}")
+            synthesize_target_fasta(target_fasta, target_extents, args.seed)
+    elif not os.path.exists(f"{target_fasta}.fai"):
+        sys.exit(f"ERROR: Target FASTA index not found: {target_fasta}.fai")
+
+    results = {
+        'benchmark': 'chiptimputation-vcf-liftover',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'host': {
+            'hostname': platform.node(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'chain_file': args.chain,
+        'target_fasta': target_fasta,
+        'chromosomes': args.chroms,
+        'seed': args.seed,
+        'datasets': [],
+    }
+
+    for n_sites in args.sites:
+        for n_samples in args.samples:
+            print(f"Benchmarking {n_sites:,} sites x {n_samples:,} samples...")
+            dataset = benchmark_dataset(args, n_sites, n_samples, target_fasta, work_dir)
+            for stage in dataset['stages']:
+                if stage['status'] == 'ok':
+                    print(f"  {stage['stage']:<9} {stage['wall_seconds']:>9.2f}s "
+                          f"{stage['records_per_sec']:>14,.1f} rec/s {stage['peak_rss_mb']:>9.1f} MB")
+                else:
+                    print(f"  {stage['stage']:<9} {stage['status']}: {stage.get('reason', '')}")
+            results['datasets'].append(dataset)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results written to: {args.output}")
+
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark liftover pipeline stages on synthetic data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_dataset_args(sub):
+        sub.add_argument('--chain', default=DEFAULT_CHAIN,
+                         help='Chain file supplying covered source positions')
+        sub.add_argument('--chroms', default='22',
+                         help='Comma-separated source chromosomes to draw sites from, or "all" (default: 22)')
+        sub.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+
+    gen = subparsers.add_parser('generate', help='Write a single synthetic dataset')
+    add_dataset_args(gen)
+    gen.add_argument('--sites', type=int, required=True, help='Number of sites')
+    gen.add_argument('--samples', type=int, required=True, help='Number of samples')
+    gen.add_argument('--output', required=True, help='Output VCF (.vcf.gz)')
+    gen.add_argument('--threads', type=int, default=4, help='BGZF compression threads (default: 4)')
+
+    run = subparsers.add_parser('run', help='Run the benchmark matrix')
+    add_dataset_args(run)
+    run.add_argument('--sites', default='1k,10k,100k',
+                     type=lambda v: parse_scale_list(v, MIN_SITES, MAX_SITES, 'sites'),
+                     help='Comma-separated site counts, 1k-10M (default: 1k,10k,100k)')
+    run.add_argument('--samples', default='1,100',
+                     type=lambda v: parse_scale_list(v, MIN_SAMPLES, MAX_SAMPLES, 'samples'),
+                     help='Comma-separated sample counts, 1-5000 (default: 1,100)')
+    run.add_argument('--target-fasta', help='Indexed target FASTA (default: synthesize one)')
+    run.add_argument('--target-build', default='hg38', help='Target build label for output names')
+    run.add_argument('--work-dir', default='benchmark_work', help='Working directory')
+    run.add_argument('--output', default='benchmark_results.json', help='Results JSON file')
+    run.add_argument('--compare', help='Previous results JSON to compare against')
+    run.add_argument('--keep-files', action='store_true', help='Keep generated datasets and outputs')
+
+    startup = subparsers.add_parser('startup', help='Time the cold start of liftover-tools subcommands')
+    startup.add_argument('--commands', default=STARTUP_COMMANDS,
+                         help=f'Comma-separated subcommands (default: {STARTUP_COMMANDS})')
+    startup.add_argument('--repeat', type=int, default=7, help='Runs per subcommand; the median is kept (default: 7)')
+    startup.add_argument('--target-ms', type=float, default=STARTUP_TARGET_MS,
+                         help=f'Fail when a cold start takes longer (default: {STARTUP_TARGET_MS})')
+    startup.add_argument('--output', default='startup_results.json', help='Results JSON file')
+
+    parity = subparsers.add_parser('parity', help='Compare the final VCFs of a run with those of a baseline run')
+    parity.add_argument('--baseline-dir', required=True, help='Final VCF/BCF files of the baseline run')
+    parity.add_argument('--current-dir', required=True, help='Final VCF/BCF files of the run under test')
+    parity.add_argument('--max-diffs', type=int, default=10, help='Differences listed per file (default: 10)')
+    parity.add_argument('--output', default='parity_results.json', help='Results JSON file')
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        cmd_generate(args)
+    elif args.command == 'startup':
+        cmd_startup(args)
+    elif args.command == 'parity':
+        cmd_parity(args)
+    else:
+        cmd_run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+BGZF Utilities
+==============
+Blocked GNU Zip Format (BGZF) writer and random-access reader shared by the
+pipeline's Python tools.
+Output is readable by bgzip, tabix, bcftools and gzip.
+"""
+
+import struct
+import zlib
+from collections import deque
+
+# Uncompressed bytes per block; matches htslib so blocks always fit in 64 KiB
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_MAX_BLOCK_SIZE = 0x10000
+
+# Empty BGZF block that marks a complete (non-truncated) file
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def compress_block(data, level=6):
+    """Compress up to BGZF_BLOCK_SIZE bytes into a single BGZF block"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    if len(deflated) + 26 > BGZF_MAX_BLOCK_SIZE:
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+
+    header = struct.pack('<4BI2BH2BHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2,
+                         len(deflated) + 25)
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+    return header + deflated + trailer
+
+
+def is_bgzf(path):
+    """True if the file starts with a BGZF block (bgzip, BCF), not plain gzip"""
+    with open(path, 'rb') as handle:
+        header = handle.read(16)
+    return header[:4] == b'\x1f\x8b\x08\x04' and header[12:14] == b'BC'
+
+
+class BgzfWriter:
+    """Write BGZF output, optionally compressing blocks on a thread pool.
+
+    zlib releases the GIL while compressing, so blocks compress in parallel
+    while the caller keeps formatting data. Blocks are always written in order.
+    """
+
+    def __init__(self, filename=None, fileobj=None, level=6, threads=1, eof=True):
+        if fileobj is None:
+            fileobj = open(filename, 'wb')
+            self._owns_file = True
+        else:
+            self._owns_file = False
+        self._file = fileobj
+        self._eof = eof
+        self._level = level
+        self._buffer = bytearray()
+        self._compressed_offset = 0
+        self._threads = max(1, int(threads))
+        self._pool = None
+        if self._threads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(self._threads)
+        self._pending = deque()
+
+    def write(self, data):
+        """Append bytes (or str, encoded as ASCII) to the stream"""
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        view = memoryview(data)
+
+        if self._buffer:
+            take = BGZF_BLOCK_SIZE - len(self._buffer)
+            self._buffer += view[:take]
+            view = view[take:]
+            if len(self._buffer) < BGZF_BLOCK_SIZE:
+                return
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+
+        while len(view) >= BGZF_BLOCK_SIZE:
+            self._emit(bytes(view[:BGZF_BLOCK_SIZE]))
+            view = view[BGZF_BLOCK_SIZE:]
+        self._buffer += view
+
+    def _emit(self, data):
+        if self._pool is None:
+            self._write_block(compress_block(data, self._level))
+            return
+        self._pending.append(self._pool.submit(compress_block, data, self._level))
+        while len(self._pending) > self._threads * 4:
+            self._write_block(self._pending.popleft().result())
+
+    def _write_block(self, block):
+        self._file.write(block)
+        self._compressed_offset += len(block)
+
+    def _drain(self):
+        while self._pending:
+            self._write_block(self._pending.popleft().result())
+
+    def flush(self):
+        """End the current block so the next write starts a new one"""
+        if self._buffer:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+        self._drain()
+        self._file.flush()
+
+    def tell(self):
+        """Return the current BGZF virtual offset"""
+        self._drain()
+        return (self._compressed_offset << 16) | len(self._buffer)
+
+    def close(self):
+        """Flush remaining data, write the EOF marker (unless eof=False) and close"""
+        if self._file is None:
+            return
+        self.flush()
+        if self._eof:
+            self._file.write(BGZF_EOF)
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self._owns_file:
+            self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class BgzfReader:
+    """Random-access reading of a BGZF file by virtual offset.
+
+    Only the blocks that are read are decompressed, so seeking to the chunks
+    an index gives for a region skips the rest of the file.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        self._block_offset = 0
+        self._next_offset = 0
+        self._data = b''
+        self._within = 0
+
+    def _load_block(self, offset):
+        self._file.seek(offset)
+        header = self._file.read(18)
+        if len(header) < 18:
+            self._block_offset = self._next_offset = offset
+            self._data = b''
+            return False
+        if header[:4] != b'\x1f\x8b\x08\x04' or header[12:14] != b'BC':
+            raise ValueError(f"Not a BGZF block at offset {offset}")
+        block_size = struct.unpack_from('<H', header, 16)[0] + 1
+        rest = self._file.read(block_size - 18)
+        self._data = zlib.decompress(rest[:-8], -15)
+        self._block_offset = offset
+        self._next_offset = offset + block_size
+        return True
+
+    def seek(self, virtual_offset):
+        """Move to a virtual offset (compressed block offset << 16 | offset in block)"""
+        block_offset, within = virtual_offset >> 16, virtual_offset & 0xffff
+        if block_offset != self._block_offset or not self._data:
+            self._load_block(block_offset)
+        self._within = within
+
+    def tell(self):
+        """Virtual offset of the next byte; the end of a block is the start of the next"""
+        if self._within >= len(self._data) and self._data:
+            return self._next_offset << 16
+        return (self._block_offset << 16) | self._within
+
+    def _advance(self):
+        """Load the following block (skipping empty ones); False at end of file"""
+        while self._within >= len(self._data):
+            if not self._load_block(self._next_offset):
+                return False
+            self._within = 0
+        return True
+
+    def read(self, size):
+        parts = []
+        while size > 0 and self._advance():
+            chunk = self._data[self._within:self._within + size]
+            self._within += len(chunk)
+            size -= len(chunk)
+            parts.append(chunk)
+        return b''.join(parts)
+
+    def readline(self):
+        parts = []
+        while self._advance():
+            end = self._data.find(b'\n', self._within)
+            if end != -1:
+                parts.append(self._data[self._within:end + 1])
+                self._within = end + 1
+                break
+            parts.append(self._data[self._within:])
+            self._within = len(self._data)
+        return b''.join(parts)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
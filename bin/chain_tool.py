@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+
+"""
+Chain File Tool
+===============
+Derive smaller or combined chain files from the UCSC chains in chains/.
+
+compact: keep only the alignment blocks that overlap a set of sites (a chip
+manifest, site list, BED or VCF), so liftover of that array loads a much
+smaller chain index. Blocks are kept whole and every chain that touches a
+site is kept, so each site lifts exactly as it would through the full chain
+(including multiple hits). A coverage report records how many sites the
+pruned chain maps uniquely, to several places, or not at all.
+
+compose: intersect the blocks of two or more chains (hg17ToHg18 then
+hg18ToHg38) into one direct chain (hg17 to hg38), so old datasets are lifted
+in one pass. Bases aligned by one chain but falling in a gap of the next
+become gaps of the composed chain. Composed chains are cached by the
+checksums of their inputs (--cache-dir) and reused by later runs.
+"""
+
+import argparse
+import copy
+import csv
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from array import array
+from bisect import bisect_right
+
+from chain_utils import Chain, ChainIndex, normalize_contig, open_chain, read_chains
+from profiling import profile_main
+from stage_trace import StageTrace
+
+COMPOSE_VERSION = 1
+CHROM_COLUMNS = ('chrom', '#chrom', 'chr', 'chromosome', 'chrom_name')
+POS_COLUMNS = ('pos', 'position', 'mapinfo', 'bp', 'start')
+
+
+class SiteSet:
+    """Sites by contig as 0-based half-open intervals, merged for overlap queries"""
+
+    def __init__(self):
+        self.names = {}
+        self._starts = {}
+        self._ends = {}
+        self._merged = {}
+        self.count = 0
+
+    def add(self, contig, start, end):
+        key = normalize_contig(contig)
+        if key not in self.names:
+            self.names[key] = contig
+            self._starts[key] = array('q')
+            self._ends[key] = array('q')
+        self._starts[key].append(start)
+        self._ends[key].append(end)
+        self.count += 1
+
+    def merge(self, flank=0):
+        """Build the sorted, merged intervals (padded by flank) used by overlaps()"""
+        for key, starts in self._starts.items():
+            merged_starts, merged_ends = array('q'), array('q')
+            for start, end in sorted(zip(starts, self._ends[key])):
+                start, end = max(0, start - flank), end + flank
+                if merged_ends and start <= merged_ends[-1]:
+                    merged_ends[-1] = max(merged_ends[-1], end)
+                else:
+                    merged_starts.append(start)
+                    merged_ends.append(end)
+            self._merged[key] = (merged_starts, merged_ends)
+
+    def overlaps(self, contig, start, end):
+        merged = self._merged.get(normalize_contig(contig))
+        if merged is None:
+            return False
+        starts, ends = merged
+        i = bisect_right(ends, start)
+        return i < len(starts) and starts[i] < end
+
+    def sites(self):
+        """(contig, start, end) for every site, by contig"""
+        for key, starts in self._starts.items():
+            name = self.names[key]
+            for start, end in zip(starts, self._ends[key]):
+                yield name, start, end
+
+
+def _open_text(path):
+    return gzip.open(path, 'rt') if str(path).endswith(('.gz', '.bgz')) else open(path, 'r')
+
+
+def read_sites(path):
+    """Read sites from a BED, VCF or delimited site list / chip manifest.
+
+    BED is 0-based; VCF sites span their REF allele. Other files need a
+    chromosome and a 1-based position column, found by header name (Chr,
+    MapInfo, ...) or taken as the first two columns.
+    """
+    sites = SiteSet()
+    name = str(path).lower()
+    with _open_text(path) as f:
+        if name.endswith(('.bed', '.bed.gz')):
+            for line in f:
+                if line.startswith(('#', 'track', 'browser')):
+                    continue
+                parts = line.split('\t') if '\t' in line else line.split()
+                if len(parts) >= 3:
+                    sites.add(parts[0], int(parts[1]), int(parts[2]))
+        elif name.endswith(('.vcf', '.vcf.gz', '.vcf.bgz')):
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                parts = line.split('\t', 5)
+                if len(parts) >= 4:
+                    start = int(parts[1]) - 1
+                    sites.add(parts[0], start, start + len(parts[3]))
+        else:
+            _read_site_list(f, sites)
+    sites.merge()
+    return sites
+
+
+def _read_site_list(f, sites):
+    chrom_col, pos_col = 0, 1
+    for row in csv.reader(_split_whitespace(f)):
+        lowered = [c.strip().lower() for c in row]
+        chrom_match = next((lowered.index(c) for c in CHROM_COLUMNS if c in lowered), None)
+        pos_match = next((lowered.index(c) for c in POS_COLUMNS if c in lowered), None)
+        if chrom_match is not None and pos_match is not None:
+            # A header line; manifests may also have sections before it
+            chrom_col, pos_col = chrom_match, pos_match
+            continue
+        try:
+            position = int(row[pos_col])
+        except (IndexError, ValueError):
+            continue
+        if position > 0:
+            sites.add(row[chrom_col].strip(), position - 1, position)
+
+
+def _split_whitespace(f):
+    """Lines as CSV: comma-separated lines as-is, others split on whitespace"""
+    for line in f:
+        yield line if ',' in line else ','.join(line.split())
+
+
+def compact_chains(chain_file, sites):
+    """Yield (chain, kept blocks, total blocks) for chains overlapping the sites"""
+    for chain in read_chains(chain_file):
+        if normalize_contig(chain.source_name) not in sites.names:
+            yield chain, [], len(chain.blocks)
+            continue
+        kept = [block for block in chain.aligned_blocks() if sites.overlaps(chain.source_name, block[0], block[1])]
+        yield chain, kept, len(chain.blocks)
+
+
+def coverage_report(sites, chain_index):
+    """Per-contig counts of sites mapped uniquely, to several places, or not at all"""
+    contigs = {}
+    for contig, start, end in sites.sites():
+        counts = contigs.setdefault(contig, {'sites': 0, 'mapped': 0, 'multiple_hits': 0, 'unmapped': 0})
+        counts['sites'] += 1
+        hits = len(chain_index.map_interval(contig, start, end))
+        if hits == 1:
+            counts['mapped'] += 1
+        elif hits > 1:
+            counts['multiple_hits'] += 1
+        else:
+            counts['unmapped'] += 1
+    totals = {key: sum(c[key] for c in contigs.values()) for key in ('sites', 'mapped', 'multiple_hits', 'unmapped')}
+    totals['coverage_percent'] = round(100.0 * totals['mapped'] / totals['sites'], 2) if totals['sites'] else 0.0
+    return totals, contigs
+
+
+def compose_chains(first, second):
+    """Compose chains mapping A to B (first) with chains mapping B to C
+    (second, a ChainIndex); returns the A to C chains, highest score first.
+
+    Each pair of chains yields one composed chain over the pieces where their
+    blocks overlap on B; its score is the number of aligned bases.
+    """
+    pieces = {}
+    for a_number, a in enumerate(first):
+        a_reverse = a.target_strand == '-'
+        for source_start, source_end, b_start in a.aligned_blocks():
+            size = source_end - source_start
+            # The block on the forward strand of B
+            if a_reverse:
+                y0, y1 = a.target_size - (b_start + size), a.target_size - b_start
+            else:
+                y0, y1 = b_start, b_start + size
+            for block_start, block_end, c_start, b_number in second.overlapping_blocks(a.target_name, y0, y1):
+                b = second.chains[b_number]
+                o0, o1 = max(y0, block_start), min(y1, block_end)
+                x0 = source_start + (y1 - o1 if a_reverse else o0 - y0)
+                z0 = c_start + (o0 - block_start)
+                z1 = z0 + (o1 - o0)
+                if b.target_strand == '-':
+                    z0, z1 = b.target_size - z1, b.target_size - z0
+                if a_reverse != (b.target_strand == '-'):
+                    # Composed chain is on the reverse strand of C
+                    z0 = b.target_size - z1
+                pieces.setdefault((a_number, b_number), []).append((x0, x0 + o1 - o0, z0))
+
+    composed = []
+    for (a_number, b_number), blocks in pieces.items():
+        a, b = first[a_number], second.chains[b_number]
+        template = copy.copy(a)
+        template.target_name = b.target_name
+        template.target_size = b.target_size
+        template.target_strand = '-' if (a.target_strand == '-') != (b.target_strand == '-') else '+'
+        for run in _colinear_runs(sorted(blocks)):
+            composed.append(Chain.from_blocks(template, run, score=sum(e - s for s, e, _ in run)))
+
+    composed.sort(key=lambda chain: -chain.score)
+    for number, chain in enumerate(composed, 1):
+        chain.chain_id = str(number)
+    return composed
+
+
+def _colinear_runs(blocks):
+    """Merge abutting blocks and split where C coordinates run backwards"""
+    runs = [[blocks[0]]]
+    for source_start, source_end, target_start in blocks[1:]:
+        last_start, last_end, last_target = runs[-1][-1]
+        last_target_end = last_target + last_end - last_start
+        if source_start == last_end and target_start == last_target_end:
+            runs[-1][-1] = (last_start, source_end, last_target)
+        elif source_start >= last_end and target_start >= last_target_end:
+            runs[-1].append((source_start, source_end, target_start))
+        else:
+            runs.append([(source_start, source_end, target_start)])
+    return runs
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def composed_name(chain_files):
+    """hg17ToHg18 + hg18ToHg38 -> hg17ToHg38"""
+    first = os.path.basename(chain_files[0]).split('.')[0]
+    last = os.path.basename(chain_files[-1]).split('.')[0]
+    if 'To' in first and 'To' in last:
+        return f"{first.split('To')[0]}To{last.split('To', 1)[1]}"
+    return '_'.join(os.path.basename(c).split('.')[0] for c in chain_files)
+
+
+def cmd_compose(args):
+    trace = StageTrace('chain_tool', args.trace)
+
+    cache_file = None
+    if args.cache_dir:
+        key = hashlib.sha256(f"{COMPOSE_VERSION}:".encode() + ':'.join(
+            file_checksum(c) for c in args.chains).encode()).hexdigest()[:16]
+        cache_file = os.path.join(args.cache_dir, f"{composed_name(args.chains)}.{key}.chain.gz")
+        if os.path.exists(cache_file):
+            shutil.copyfile(cache_file, args.output)
+            print(f"Using cached composed chain: {cache_file}")
+            return
+
+    with trace.stage('read_chains') as stage:
+        chains = list(read_chains(args.chains[0]))
+        stage.records = len(chains)
+    print(f"Read {len(chains)} chains from {args.chains[0]}")
+
+    for chain_file in args.chains[1:]:
+        with trace.stage('compose') as stage:
+            second = ChainIndex.from_file(chain_file)
+            chains = compose_chains(chains, second)
+            stage.records = len(chains)
+        print(f"Composed with {len(second.chains)} chains from {chain_file}: {len(chains)} chains, "
+              f"{sum(int(chain.score) for chain in chains)} aligned bases")
+
+    with trace.stage('write') as stage, open_chain(args.output, 'wt') as out:
+        for chain in chains:
+            out.write(chain.to_text())
+        stage.records = len(chains)
+    print(f"Composed chain: {args.output}")
+
+    if cache_file:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        partial = f"{cache_file}.{os.getpid()}.tmp"
+        shutil.copyfile(args.output, partial)
+        os.replace(partial, cache_file)
+        print(f"Cached composed chain: {cache_file}")
+
+
+def cmd_compact(args):
+    trace = StageTrace('chain_tool', args.trace)
+
+    with trace.stage('read_sites') as stage:
+        sites = read_sites(args.sites)
+        if args.flank:
+            sites.merge(args.flank)
+        stage.records = sites.count
+    if not sites.count:
+        sys.exit(f"ERROR: No sites read from {args.sites}")
+    print(f"Read {sites.count} sites on {len(sites.names)} contigs from {args.sites}")
+
+    chains_total = chains_kept = blocks_total = blocks_kept = 0
+    compacted = []
+    with trace.stage('compact') as stage, open_chain(args.output, 'wt') as out:
+        for chain, kept, total in compact_chains(args.chain, sites):
+            chains_total += 1
+            blocks_total += total
+            if kept:
+                pruned = Chain.from_blocks(chain, kept)
+                out.write(pruned.to_text())
+                compacted.append(pruned)
+                chains_kept += 1
+                blocks_kept += len(kept)
+        stage.records = blocks_total
+    print(f"Kept {blocks_kept} of {blocks_total} blocks from {chains_kept} of {chains_total} chains: {args.output}")
+
+    with trace.stage('coverage') as stage:
+        totals, contigs = coverage_report(sites, ChainIndex(compacted))
+        stage.records = sites.count
+
+    report = {
+        'chain_file': args.chain,
+        'sites_file': args.sites,
+        'output': args.output,
+        'flank': args.flank,
+        'chains': {'total': chains_total, 'kept': chains_kept},
+        'blocks': {'total': blocks_total, 'kept': blocks_kept},
+        'bytes': {'input': os.path.getsize(args.chain), 'output': os.path.getsize(args.output)},
+        'sites': totals,
+        'contigs': contigs,
+    }
+    report_file = args.report or f"{args.output}.coverage.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Sites mapped: {totals['mapped']}/{totals['sites']} ({totals['coverage_percent']}%), "
+          f"multiple hits: {totals['multiple_hits']}, unmapped: {totals['unmapped']}")
+    print(f"Coverage report: {report_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Derive smaller or combined chain files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compact = subparsers.add_parser('compact', help='Keep only the chain blocks overlapping a set of sites')
+    compact.add_argument('chain', help='Chain file (plain or gzipped)')
+    compact.add_argument('sites', help='Sites: BED, VCF, or a site list / chip manifest with chromosome and position')
+    compact.add_argument('-o', '--output', required=True, help='Pruned chain file (.gz to compress)')
+    compact.add_argument('--flank', type=int, default=0,
+                         help='Also keep blocks within this many bases of a site (default: 0)')
+    compact.add_argument('--report', help='Coverage report JSON (default: OUTPUT.coverage.json)')
+    compact.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+
+    compose = subparsers.add_parser('compose', help='Compose chains (A to B, B to C) into one direct chain')
+    compose.add_argument('chains', nargs='+', help='Chain files in lift order, e.g. hg17ToHg18 hg18ToHg38')
+    compose.add_argument('-o', '--output', required=True, help='Composed chain file (.gz to compress)')
+    compose.add_argument('--cache-dir', help='Reuse (and store) composed chains keyed by input checksums')
+    compose.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+
+    args = parser.parse_args()
+
+    inputs = args.chains if args.command == 'compose' else [args.chain, args.sites]
+    for path in inputs:
+        if not os.path.exists(path):
+            sys.exit(f"ERROR: File not found: {path}")
+
+    if args.command == 'compact':
+        cmd_compact(args)
+    else:
+        if len(args.chains) < 2:
+            sys.exit("ERROR: compose needs at least two chain files")
+        cmd_compose(args)
+
+
+if __name__ == "__main__":
+    profile_main('chain_tool', main)
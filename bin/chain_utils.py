@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+"""
+Chain File Utilities
+====================
+Shared helpers for reading UCSC chain files used by the liftover tools
+"""
+
+import gzip
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+
+class Chain:
+    """A single chain record: header fields plus its alignment blocks"""
+
+    def __init__(self, header):
+        fields = header.split()
+        if len(fields) < 12 or fields[0] != 'chain':
+            raise ValueError(f"Invalid chain header: {header.strip()}")
+
+        self.score = float(fields[1])
+        self.source_name = fields[2]
+        self.source_size = int(fields[3])
+        self.source_strand = fields[4]
+        self.source_start = int(fields[5])
+        self.source_end = int(fields[6])
+        self.target_name = fields[7]
+        self.target_size = int(fields[8])
+        self.target_strand = fields[9]
+        self.target_start = int(fields[10])
+        self.target_end = int(fields[11])
+        self.chain_id = fields[12] if len(fields) > 12 else ''
+        self.blocks = []  # (size, source_gap, target_gap) tuples
+
+    def aligned_blocks(self):
+        """Yield (source_start, source_end, target_start) for each ungapped block"""
+        source_pos = self.source_start
+        target_pos = self.target_start
+        for size, source_gap, target_gap in self.blocks:
+            yield source_pos, source_pos + size, target_pos
+            source_pos += size + source_gap
+            target_pos += size + target_gap
+
+    @classmethod
+    def from_blocks(cls, template, blocks, score=None):
+        """A chain over the given (source_start, source_end, target_start)
+        blocks, with template's contigs, strands and ID"""
+        chain = cls.__new__(cls)
+        chain.__dict__.update(template.__dict__)
+        chain.score = template.score if score is None else score
+        chain.source_start = blocks[0][0]
+        chain.source_end = blocks[-1][1]
+        chain.target_start = blocks[0][2]
+        chain.target_end = blocks[-1][2] + blocks[-1][1] - blocks[-1][0]
+        chain.blocks = []
+        for (source_start, source_end, target_start), following in zip(blocks, blocks[1:] + [None]):
+            size = source_end - source_start
+            if following is None:
+                chain.blocks.append((size, 0, 0))
+            else:
+                chain.blocks.append((size, following[0] - source_end, following[2] - (target_start + size)))
+        return chain
+
+    def to_text(self):
+        """The chain in UCSC chain format, ending with its blank separator line"""
+        score = int(self.score) if self.score == int(self.score) else self.score
+        lines = [f"chain {score} {self.source_name} {self.source_size} {self.source_strand} "
+                 f"{self.source_start} {self.source_end} {self.target_name} {self.target_size} "
+                 f"{self.target_strand} {self.target_start} {self.target_end} {self.chain_id}".rstrip()]
+        for size, source_gap, target_gap in self.blocks[:-1]:
+            lines.append(f"{size}\t{source_gap}\t{target_gap}")
+        if self.blocks:
+            lines.append(str(self.blocks[-1][0]))
+        return '\n'.join(lines) + '\n\n'
+
+
+def open_chain(chain_file, mode='rt'):
+    """Open a plain or gzipped chain file for text reading (or writing)"""
+    if str(chain_file).endswith('.gz'):
+        return gzip.open(chain_file, mode)
+    return open(chain_file, mode.replace('t', ''))
+
+
+def read_chains(chain_file):
+    """Iterate over all chains in a chain file"""
+    chain = None
+    with open_chain(chain_file) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            if line.startswith('chain'):
+                if chain is not None:
+                    yield chain
+                chain = Chain(line)
+                continue
+
+            if chain is None:
+                raise ValueError(f"Alignment data before chain header in {chain_file}")
+
+            parts = line.split()
+            if len(parts) == 3:
+                chain.blocks.append((int(parts[0]), int(parts[1]), int(parts[2])))
+            else:
+                chain.blocks.append((int(parts[0]), 0, 0))
+
+    if chain is not None:
+        yield chain
+
+
+def normalize_contig(name):
+    """Strip a leading 'chr' so '22' and 'chr22' compare equal"""
+    return name[3:] if name.lower().startswith('chr') else name
+
+
+def match_contig_style(template, contig):
+    """Give contig the same 'chr' prefix style as template (CrossMap's as-is style)"""
+    if template.startswith('chr') and not contig.startswith('chr'):
+        return 'chr' + contig
+    if not template.startswith('chr') and contig.startswith('chr'):
+        return contig[3:]
+    return contig
+
+
+class ChainIndex:
+    """Interval index over the aligned blocks of a chain file, by source contig.
+
+    Blocks are kept in flat arrays sorted by source start, with a running
+    maximum of block ends so lookups only scan blocks that can overlap.
+    """
+
+    def __init__(self, chains):
+        self.chains = []
+        blocks = {}
+        for chain in chains:
+            chain_number = len(self.chains)
+            self.chains.append(chain)
+            contig_blocks = blocks.setdefault(normalize_contig(chain.source_name), [])
+            for source_start, source_end, target_start in chain.aligned_blocks():
+                contig_blocks.append((source_start, source_end, target_start, chain_number))
+
+        self._index = {}
+        for contig, contig_blocks in blocks.items():
+            contig_blocks.sort()
+            starts = array('q', (b[0] for b in contig_blocks))
+            ends = array('q', (b[1] for b in contig_blocks))
+            targets = array('q', (b[2] for b in contig_blocks))
+            chain_numbers = array('l', (b[3] for b in contig_blocks))
+            max_ends = array('q', accumulate(ends, max))
+            self._index[contig] = (starts, ends, targets, chain_numbers, max_ends)
+        self._target_index = None
+
+    @classmethod
+    def from_file(cls, chain_file):
+        return cls(read_chains(chain_file))
+
+    def has_contig(self, contig):
+        return normalize_contig(contig) in self._index
+
+    def source_contigs(self):
+        """Source contig names as written in the chain file"""
+        return sorted({chain.source_name for chain in self.chains})
+
+    def target_contigs(self, source_contigs=None):
+        """Target contigs reachable from the given source contigs (default: all)"""
+        wanted = None if source_contigs is None else {normalize_contig(c) for c in source_contigs}
+        return {chain.target_name for chain in self.chains
+                if wanted is None or normalize_contig(chain.source_name) in wanted}
+
+    def block_arrays(self, contig):
+        """(starts, ends, target_starts, chain_numbers, max_ends) arrays of a
+        source contig's blocks sorted by start, or None; for vectorized lookups"""
+        return self._index.get(normalize_contig(contig))
+
+    def overlapping_blocks(self, contig, start, end):
+        """(source_start, source_end, target_start, chain_number) of every block
+        overlapping a 0-based half-open source interval"""
+        index = self._index.get(normalize_contig(contig))
+        if index is None:
+            return []
+        starts, ends, targets, chain_numbers, max_ends = index
+
+        blocks = []
+        i = bisect_left(starts, end) - 1
+        while i >= 0 and max_ends[i] > start:
+            if ends[i] > start:
+                blocks.append((starts[i], ends[i], targets[i], chain_numbers[i]))
+            i -= 1
+        return blocks
+
+    def map_interval(self, contig, start, end):
+        """Map a 0-based half-open source interval.
+
+        Returns a list of (target_name, target_start, target_end, strand) for
+        every block that contains the whole interval; target coordinates are
+        on the forward strand of the target contig.
+        """
+        index = self._index.get(normalize_contig(contig))
+        if index is None:
+            return []
+        starts, ends, targets, chain_numbers, max_ends = index
+
+        hits = []
+        i = bisect_right(starts, start) - 1
+        while i >= 0 and max_ends[i] > start:
+            if ends[i] >= end:
+                chain = self.chains[chain_numbers[i]]
+                offset = targets[i] + (start - starts[i])
+                if chain.target_strand == '-':
+                    hits.append((chain.target_name, chain.target_size - (offset + end - start),
+                                 chain.target_size - offset, '-'))
+                else:
+                    hits.append((chain.target_name, offset, offset + end - start, '+'))
+            i -= 1
+        return hits
+
+    def _build_target_index(self):
+        """The same layout keyed by target contig, in forward target coordinates"""
+        blocks = {}
+        for chain_number, chain in enumerate(self.chains):
+            contig_blocks = blocks.setdefault(normalize_contig(chain.target_name), [])
+            for source_start, source_end, target_start in chain.aligned_blocks():
+                size = source_end - source_start
+                if chain.target_strand == '-':
+                    target_start = chain.target_size - (target_start + size)
+                contig_blocks.append((target_start, target_start + size, source_start, chain_number))
+
+        self._target_index = {}
+        for contig, contig_blocks in blocks.items():
+            contig_blocks.sort()
+            ends = array('q', (b[1] for b in contig_blocks))
+            self._target_index[contig] = (array('q', (b[0] for b in contig_blocks)), ends,
+                                          array('q', (b[2] for b in contig_blocks)),
+                                          array('l', (b[3] for b in contig_blocks)),
+                                          array('q', accumulate(ends, max)))
+
+    def source_intervals(self, contig, start, end):
+        """(source_name, source_start, source_end) of every block part that maps
+        into a 0-based half-open interval on the forward strand of a target contig"""
+        if self._target_index is None:
+            self._build_target_index()
+        index = self._target_index.get(normalize_contig(contig))
+        if index is None:
+            return []
+        starts, ends, sources, chain_numbers, max_ends = index
+
+        intervals = []
+        i = bisect_left(starts, end) - 1
+        while i >= 0 and max_ends[i] > start:
+            if ends[i] > start:
+                chain = self.chains[chain_numbers[i]]
+                low, high = max(start, starts[i]), min(end, ends[i])
+                if chain.target_strand == '-':
+                    # Forward [low, high) is read from the block's other end
+                    low, high = ends[i] - high, ends[i] - low
+                else:
+                    low, high = low - starts[i], high - starts[i]
+                intervals.append((chain.source_name, sources[i] + low, sources[i] + high))
+            i -= 1
+        return intervals
@@ -11,16 +11,13 @@ import sys
 import os
 import gzip
 import re
-import subprocess
+import shutil
 from pathlib import Path
 
-def run_command(cmd):
-    """Run a command and return output"""
-    try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        return result.returncode, result.stdout, result.stderr
-    except Exception as e:
-        return 1, "", str(e)
+from async_probes import DEFAULT_CONCURRENCY, FirstColumnCounts, HeadLines, Probe, run_probes
+from bcf import BcfReader, bcf_stats, is_bcf
+from profiling import profile_main
+from stage_trace import StageTrace
 
 def check_file_format(vcf_file):
     """Check if file is a valid VCF format"""
@@ -37,6 +34,9 @@ def check_file_format(vcf_file):
         errors.append(f"File not found: {vcf_file}")
         return errors, warnings
     
+    if is_bcf(vcf_file):
+        return check_bcf_format(vcf_file, errors, warnings)
+    
     try:
         # Open file (handle compressed files)
         if vcf_file.endswith('.gz'):
@@ -82,55 +82,92 @@ def check_file_format(vcf_file):
     
     return errors, warnings
 
-def check_with_bcftools(vcf_file):
-    """Validate VCF using bcftools"""
+def check_bcf_format(bcf_file, errors, warnings):
+    """check_file_format for BCF: header and first record read with the BCF codec"""
+    try:
+        with BcfReader(bcf_file) as reader:
+            if not any(line.startswith('##fileformat=VCF') for line in reader.header.meta[:1]):
+                errors.append("Missing or invalid VCF header")
+            if not reader.header.column_line:
+                errors.append("Missing VCF column header line (#CHROM...)")
+            first = next(iter(reader), None)
+            if first is None:
+                warnings.append("No data lines found in VCF file")
+            else:
+                first.to_text()
+    except Exception as e:
+        errors.append(f"Error reading file: {e}")
+    
+    return errors, warnings
+
+def bcf_counts(bcf_file):
+    """Variant, chromosome and sample counts of a BCF file, read without bcftools"""
+    counts = bcf_stats(bcf_file)
+    return {
+        'variant_count': counts['variant_count'],
+        'chromosomes': sorted(counts['chromosome_counts']),
+        'chromosome_count': len(counts['chromosome_counts']),
+        'sample_count': counts['sample_count'],
+    }
+
+def check_with_bcftools(vcf_file, concurrency=DEFAULT_CONCURRENCY, timings=None):
+    """Validate VCF using bcftools; the independent probes run concurrently"""
     errors = []
     warnings = []
     stats = {}
     
     # Check if bcftools is available
-    returncode, stdout, stderr = run_command("which bcftools")
-    if returncode != 0:
+    if shutil.which('bcftools') is None:
         warnings.append("bcftools not available for validation")
+        if is_bcf(vcf_file):
+            stats.update(bcf_counts(vcf_file))
         return errors, warnings, stats
     
-    # Validate header
-    returncode, stdout, stderr = run_command(f"bcftools view -h {vcf_file}")
-    if returncode != 0:
-        errors.append(f"bcftools header validation failed: {stderr}")
+    # Header and a full format check; sample list and per-contig record counts
+    # too, unless the file is BCF and they are read directly
+    probes = [
+        Probe('header', ['bcftools', 'view', '-h', vcf_file]),
+        Probe('format', ['bcftools', 'view', vcf_file, '-Ou', '-o', os.devnull]),
+    ]
+    if not is_bcf(vcf_file):
+        probes.append(Probe('samples', ['bcftools', 'query', '-l', vcf_file]))
+        probes.append(Probe('contigs', ['bcftools', 'query', '-f', '%CHROM\n', vcf_file], FirstColumnCounts()))
+    probes = run_probes(probes, concurrency)
+    if timings is not None:
+        timings.extend(probe.summary() for probe in probes.values())
+    
+    if not probes['header'].ok:
+        errors.append(f"bcftools header validation failed: {probes['header'].stderr}")
         return errors, warnings, stats
     
-    # Count variants
-    returncode, stdout, stderr = run_command(f"bcftools view -H {vcf_file} | wc -l")
-    if returncode == 0:
-        try:
-            stats['variant_count'] = int(stdout.strip())
-        except ValueError:
-            warnings.append("Could not count variants")
+    if is_bcf(vcf_file):
+        stats.update(bcf_counts(vcf_file))
+        if not probes['format'].ok:
+            errors.append(f"bcftools format validation failed: {probes['format'].stderr}")
+        return errors, warnings, stats
     
-    # Get sample count
-    returncode, stdout, stderr = run_command(f"bcftools query -l {vcf_file} | wc -l")
-    if returncode == 0:
-        try:
-            stats['sample_count'] = int(stdout.strip())
-        except ValueError:
-            warnings.append("Could not count samples")
-    
-    # Check chromosomes
-    returncode, stdout, stderr = run_command(f"bcftools view -H {vcf_file} | cut -f1 | sort | uniq")
-    if returncode == 0:
-        chromosomes = stdout.strip().split('\n')
-        stats['chromosomes'] = [chr for chr in chromosomes if chr.strip()]
+    # Count variants and list chromosomes from one scan
+    if probes['contigs'].ok:
+        contig_counts = probes['contigs'].output
+        stats['variant_count'] = sum(contig_counts.values())
+        stats['chromosomes'] = sorted(contig_counts)
         stats['chromosome_count'] = len(stats['chromosomes'])
+    else:
+        warnings.append("Could not count variants")
+    
+    # Get sample count
+    if probes['samples'].ok:
+        stats['sample_count'] = len([s for s in probes['samples'].output.split('\n') if s.strip()])
+    else:
+        warnings.append("Could not count samples")
     
     # Validate VCF format more thoroughly
-    returncode, stdout, stderr = run_command(f"bcftools view {vcf_file} -o /dev/null")
-    if returncode != 0:
-        errors.append(f"bcftools format validation failed: {stderr}")
+    if not probes['format'].ok:
+        errors.append(f"bcftools format validation failed: {probes['format'].stderr}")
     
     return errors, warnings, stats
 
-def validate_coordinates(vcf_file, build=None):
+def validate_coordinates(vcf_file, build=None, timings=None):
     """Validate coordinate ranges for specific genome build"""
     errors = []
     warnings = []
@@ -164,14 +201,18 @@ def validate_coordinates(vcf_file, build=None):
     limits = chr_limits[build]
     
     try:
-        # Check coordinates using bcftools
-        returncode, stdout, stderr = run_command(f"bcftools query -f '%CHROM\\t%POS\\n' {vcf_file}")
-        if returncode != 0:
+        # Check coordinates using bcftools; only the first 1000 variants are
+        # read, and bcftools is stopped once they have arrived
+        probe = run_probes([Probe('coordinates', ['bcftools', 'query', '-f', '%CHROM\t%POS\n', vcf_file],
+                                  HeadLines(1000))])['coordinates']
+        if timings is not None:
+            timings.append(probe.summary())
+        if not probe.ok:
             warnings.append("Could not extract coordinates for validation")
             return errors, warnings
         
         invalid_coords = []
-        for line in stdout.strip().split('\n')[:1000]:  # Check first 1000 variants
+        for line in probe.output:
             if not line.strip():
                 continue
             
@@ -199,24 +240,33 @@ def main():
     parser.add_argument('--build', help='Genome build for coordinate validation (hg19, hg38)')
     parser.add_argument('--output', help='Output validation report file')
     parser.add_argument('--strict', action='store_true', help='Strict validation (warnings become errors)')
+    parser.add_argument('--trace', help='Append per-phase timing/RSS trace (JSON lines) to this file')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'bcftools probes run at once (default: {DEFAULT_CONCURRENCY})')
     
     args = parser.parse_args()
     
     print(f"Validating VCF file: {args.vcf_file}")
     
+    trace = StageTrace('check_vcf', args.trace, sample_id=Path(args.vcf_file).name.split('.')[0])
     all_errors = []
     all_warnings = []
     all_stats = {}
+    probe_timings = []
     
     # File format validation
     print("1. Checking file format...")
-    errors, warnings = check_file_format(args.vcf_file)
+    with trace.stage('file_format'):
+        errors, warnings = check_file_format(args.vcf_file)
     all_errors.extend(errors)
     all_warnings.extend(warnings)
     
     # bcftools validation
     print("2. Running bcftools validation...")
-    errors, warnings, stats = check_with_bcftools(args.vcf_file)
+    with trace.stage('bcftools_validation') as phase:
+        errors, warnings, stats = check_with_bcftools(args.vcf_file, args.max_concurrency, probe_timings)
+        phase.records = stats.get('variant_count', 0)
+        phase.extra['probes'] = len(probe_timings)
     all_errors.extend(errors)
     all_warnings.extend(warnings)
     all_stats.update(stats)
@@ -224,7 +274,8 @@ def main():
     # Coordinate validation
     if args.build:
         print(f"3. Validating coordinates for {args.build}...")
-        errors, warnings = validate_coordinates(args.vcf_file, args.build)
+        with trace.stage('coordinates'):
+            errors, warnings = validate_coordinates(args.vcf_file, args.build, probe_timings)
         all_errors.extend(errors)
         all_warnings.extend(warnings)
     
@@ -242,6 +293,12 @@ def main():
                 report_lines.append(f"  {key}: {value}")
         report_lines.append("")
     
+    if probe_timings:
+        report_lines.append("Probe timings:")
+        for timing in probe_timings:
+            report_lines.append(f"  {timing['probe']}: {timing['seconds']:.3f}s ({timing['status']})")
+        report_lines.append("")
+    
     if all_warnings:
         report_lines.append("Warnings:")
         for warning in all_warnings:
@@ -279,4 +336,4 @@ def main():
     sys.exit(0 if validation_passed else 1)
 
 if __name__ == "__main__":
-    main()
+    profile_main('check_vcf', main)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+Lift Checkpoints
+================
+Manifest of the finished shards of a long lift, so a retried task (after a
+preemption or walltime kill) resumes from the last finished shard instead of
+starting over.
+
+A checkpoint directory holds one manifest.json and the shard files it lists.
+Each shard records the input virtual offsets it covers ([start, end)) and
+its lift counts. A shard is listed only after its files are flushed to disk,
+and the manifest is replaced atomically, so whatever a killed task left
+behind is either a complete shard or ignored. The manifest also keeps a
+fingerprint of the input and lift options; a checkpoint made for anything
+else is discarded. Files are fingerprinted by content (size and a hash of
+their first and last MiB), not by path: a retried Nextflow task stages the
+same files into a new work directory.
+
+Usage:
+    checkpoint.py show checkpoints/sample1       # shards, offsets and counts
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+MANIFEST = 'manifest.json'
+# Bytes hashed at each end of a fingerprinted file
+FINGERPRINT_BYTES = 1 << 20
+
+
+def file_fingerprint(path):
+    """Identity of a file for resuming: size and a hash of its first and last
+    MiB, the same wherever (and however) the file is staged"""
+    if not path:
+        return None
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(f.read())
+    return {'name': os.path.basename(os.path.realpath(path)), 'size': size, 'sha': digest.hexdigest()}
+
+
+def _fsync(path):
+    with open(path, 'rb') as handle:
+        os.fsync(handle.fileno())
+
+
+class LiftCheckpoint:
+    """Finished shards of one lift, kept in a directory that outlives the task"""
+
+    def __init__(self, directory, fingerprint):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.header = None
+        self.shards = []
+        os.makedirs(directory, exist_ok=True)
+        manifest = self._load()
+        if manifest and manifest.get('fingerprint') == fingerprint:
+            self.header = manifest.get('header')
+            self.shards = manifest.get('shards', [])
+        elif manifest:
+            # Made for another input or other options: start over
+            self.clear()
+            os.makedirs(directory, exist_ok=True)
+
+    def _load(self):
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except ValueError:
+            return None
+
+    def _save(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'header': self.header, 'shards': self.shards}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    @property
+    def resume_offset(self):
+        """Input virtual offset after the last finished shard, or None"""
+        return self.shards[-1]['end'] if self.shards else None
+
+    def start(self, header):
+        """Record the output header of a fresh lift"""
+        self.header = header
+        self._save()
+
+    def shard_paths(self, number, suffix):
+        """(records, unmapped records) paths of shard number"""
+        stem = os.path.join(self.directory, f"shard{number:05d}")
+        return stem + suffix, stem + '.unmap'
+
+    def commit(self, start, end, paths, counts):
+        """List a finished shard once its files are on disk"""
+        for path in paths:
+            _fsync(path)
+        self.shards.append({'start': start, 'end': end, 'files': [os.path.basename(p) for p in paths],
+                            'counts': counts})
+        self._save()
+
+    def files(self, column):
+        """Paths of every finished shard's file in column (0 records, 1 unmapped)"""
+        return [os.path.join(self.directory, shard['files'][column]) for shard in self.shards]
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect lift checkpoints')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show = subparsers.add_parser('show', help='List the finished shards of a checkpoint directory')
+    show.add_argument('directory')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    print(f"Input: {manifest['fingerprint']['input']['name']}")
+    for number, shard in enumerate(manifest['shards']):
+        counts = shard['counts']
+        print(f"shard {number}: offsets {shard['start']}-{shard['end']}  "
+              f"entries {counts['total']}  written {counts['written']}  failed {counts['failed']}")
+    print(f"{len(manifest['shards'])} finished shards")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+"""
+Lift Collision Detection
+========================
+Different source sites can lift to the same target site, and duplicate
+records at one (contig, pos, ref, alt) make imputation fail much later.
+CollisionDetector watches a sorted VCF record stream and finds them in the
+same pass that writes it: only the records at the current position are held
+(the window), so memory does not grow with the file.
+
+Policies for a colliding site:
+  report  write every record; count them
+  flag    write every record, with LiftCollision added to FILTER
+  first   write the first record of the site, drop the others
+  drop    drop every record of the site
+  fail    stop at the first collision
+
+Usage (the contig header fix that writes the final VCF runs it):
+    bcftools view sorted.bcf | contig_header.py --fasta hg38.fa --collisions flag \\
+        --collision-report sample1.collisions.json -o sample1.hg38.vcf.gz
+"""
+
+import json
+
+COLLISION_POLICIES = ('report', 'flag', 'first', 'drop', 'fail')
+COLLISION_FILTER = 'LiftCollision'
+# Colliding sites listed in the report
+MAX_EXAMPLES = 20
+
+
+class CollisionError(ValueError):
+    """A collision under the 'fail' policy"""
+
+
+class CollisionDetector:
+    """Finds records sharing (contig, pos, ref, alt) in a sorted record stream"""
+
+    def __init__(self, policy='report'):
+        if policy not in COLLISION_POLICIES:
+            raise ValueError(f"collision policy must be one of {COLLISION_POLICIES}")
+        self.policy = policy
+        self.sites = 0
+        self.records = 0
+        self.removed = 0
+        self.examples = []
+        self._position = None
+        self._window = []
+
+    def header_lines(self):
+        """Meta lines the output needs for this policy"""
+        if self.policy == 'flag':
+            return [f'##FILTER=<ID={COLLISION_FILTER},Description="Another record lifted to the same '
+                    f'CHROM, POS, REF and ALT">\n']
+        return []
+
+    def filter_chunks(self, chunks):
+        """Output chunks of complete lines for input chunks of record lines"""
+        carry = b''
+        for chunk in chunks:
+            chunk = carry + chunk
+            cut = chunk.rfind(b'\n') + 1
+            carry = chunk[cut:]
+            out = []
+            for line in chunk[:cut].splitlines(keepends=True):
+                self._feed(line, out)
+            if out:
+                yield b''.join(out)
+        out = []
+        if carry:
+            self._feed(carry + b'\n', out)
+        self._flush(out)
+        if out:
+            yield b''.join(out)
+
+    def _feed(self, line, out):
+        fields = line.split(b'\t', 5)
+        if len(fields) < 5:
+            # Not a full record: written unchanged, in place
+            self._flush(out)
+            self._position = None
+            out.append(line)
+            return
+        position = (fields[0], fields[1])
+        if position != self._position:
+            self._flush(out)
+            self._position = position
+        self._window.append(((fields[3], fields[4]), line))
+
+    def _flush(self, out):
+        window = self._window
+        if len(window) == 1:
+            out.append(window[0][1])
+        elif window:
+            counts = {}
+            for key, _ in window:
+                counts[key] = counts.get(key, 0) + 1
+            if len(counts) == len(window):
+                out.extend(line for _, line in window)
+            else:
+                self._resolve(window, counts, out)
+        self._window = []
+
+    def _resolve(self, window, counts, out):
+        written = set()
+        for key, count in counts.items():
+            if count > 1:
+                self.sites += 1
+                self.records += count
+                if len(self.examples) < MAX_EXAMPLES:
+                    contig, pos = self._position
+                    self.examples.append({'chrom': contig.decode(), 'pos': int(pos), 'ref': key[0].decode(),
+                                          'alt': key[1].decode(), 'records': count})
+                if self.policy == 'fail':
+                    contig, pos = self._position
+                    raise CollisionError(f"{count} records lifted to {contig.decode()}:{pos.decode()} "
+                                         f"{key[0].decode()}>{key[1].decode()}")
+        for key, line in window:
+            if counts[key] == 1 or self.policy == 'report':
+                out.append(line)
+            elif self.policy == 'flag':
+                out.append(_add_filter(line))
+            elif self.policy == 'first' and key not in written:
+                written.add(key)
+                out.append(line)
+            else:
+                self.removed += 1
+
+    def summary(self):
+        return {'policy': self.policy, 'colliding_sites': self.sites, 'colliding_records': self.records,
+                'removed_records': self.removed, 'examples': self.examples}
+
+    def write_report(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def _add_filter(line):
+    """The record line with LiftCollision added to its FILTER column"""
+    fields = line.split(b'\t', 7)
+    if len(fields) < 7:
+        return line
+    value = fields[6].rstrip(b'\r\n')
+    end = fields[6][len(value):]
+    flag = COLLISION_FILTER.encode()
+    fields[6] = (flag if value in (b'PASS', b'.', b'') else value + b';' + flag) + end
+    return b'\t'.join(fields)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+"""
+Contig Header Synthesis
+=======================
+Build ##contig=<ID=..,length=..> header lines from the target FASTA .fai, for
+every reference contig or only the contigs present in the data.
+
+As a tool it reads a VCF stream (e.g. `bcftools view in.bcf |`), replaces the
+##contig lines and writes BGZF output. With --contigs all the header is
+written before any record. With --contigs seen, records are compressed into a
+spool file while their contigs are collected; the header is then written and
+the compressed blocks are appended unchanged, so records are still parsed
+and compressed only once.
+
+With --chr-mapping the contigs are renamed (rename_contigs.py) in the same
+pass, header and records, so a CrossMap lift needs no separate rename step.
+With --collisions the sorted records also pass through a CollisionDetector
+(collisions.py) on their way to the compressor, which reports or resolves
+records lifted to the same site; --collision-report writes its counts.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from bgzf import BgzfWriter
+from chain_utils import match_contig_style, normalize_contig
+from collisions import COLLISION_POLICIES, CollisionDetector
+from fasta import load_fai
+from profiling import profile_main
+from rename_contigs import ContigRenamer
+from stage_trace import StageTrace
+
+CONTIG_MODES = ('all', 'seen')
+COPY_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def contig_id(line):
+    """ID of a ##contig header line"""
+    body = line[len('##contig=<ID='):]
+    for separator in (',', '>'):
+        body = body.split(separator, 1)[0]
+    return body
+
+
+class ContigHeader:
+    """Contig lengths from a .fai, matched to data names with or without 'chr'"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.order = {entry.name: i for i, entry in enumerate(entries)}
+        self.lengths = {entry.name: entry.length for entry in entries}
+        self._aliases = {}
+        for entry in entries:
+            self._aliases.setdefault(normalize_contig(entry.name), entry.name)
+
+    @classmethod
+    def from_fasta(cls, fasta_file, fai_file=None):
+        return cls(load_fai(fasta_file, fai_file))
+
+    def resolve(self, name):
+        """Reference contig for a data contig name, or None"""
+        return name if name in self.lengths else self._aliases.get(normalize_contig(name))
+
+    def lines_all(self, rename=None, include=None, existing=None):
+        """A line for every reference contig (or those in include), in .fai order.
+
+        Existing header lines of contigs the reference lacks are kept, after
+        the reference contigs.
+        """
+        lines = []
+        for entry in self.entries:
+            if include is None or entry.name in include:
+                name = rename(entry.name) if rename else entry.name
+                lines.append(f"##contig=<ID={name},length={entry.length}>\n")
+        for name, line in (existing or {}).items():
+            if self.resolve(name) is None:
+                lines.append(line)
+        return lines
+
+    def lines_for(self, names, existing=None):
+        """Lines for the given data contig names, in .fai order.
+
+        Names without a reference contig keep their existing header line, if
+        any, and otherwise get a line without a length.
+        """
+        existing = existing or {}
+        known, unknown = [], []
+        for name in names:
+            reference = self.resolve(name)
+            if reference is None:
+                unknown.append(existing.get(name) or f"##contig=<ID={name}>\n")
+            else:
+                known.append((self.order[reference], f"##contig=<ID={name},length={self.lengths[reference]}>\n"))
+        return [line for _, line in sorted(known)] + unknown
+
+    def rename_like(self, existing_ids, style=None):
+        """Name reference contigs as the data does: existing IDs, else 'chr' style"""
+        by_normalized = {normalize_contig(name): name for name in existing_ids}
+
+        def rename(name):
+            found = by_normalized.get(normalize_contig(name))
+            if found:
+                return found
+            return match_contig_style(style, name) if style else name
+        return rename
+
+
+def replace_contig_lines(meta_lines, contig_lines):
+    """Swap the ##contig lines of a header for new ones, keeping their position"""
+    result = []
+    inserted = False
+    for line in meta_lines:
+        if line.startswith('##contig='):
+            if not inserted:
+                result.extend(contig_lines)
+                inserted = True
+            continue
+        result.append(line)
+    if not inserted:
+        result.extend(contig_lines)
+    return result
+
+
+def fix_stream(src, output, header, mode='all', threads=1, tmp_dir=None, collisions=None, renamer=None):
+    """Rewrite the ##contig lines of a VCF byte stream into a BGZF file.
+
+    renamer is an optional ContigRenamer applied to the header and records
+    first; collisions is an optional CollisionDetector applied to the
+    (sorted) records. Returns the number of records written.
+    """
+    meta = []
+    column_line = None
+    for line in src:
+        if line.startswith(b'##'):
+            meta.append((renamer.rename_header_line(line) if renamer else line).decode())
+        elif line.startswith(b'#'):
+            column_line = line.decode()
+            break
+    if column_line is None:
+        raise ValueError("input has no #CHROM header line")
+
+    existing = {contig_id(m): m for m in meta if m.startswith('##contig=')}
+    records = 0
+    chunks = iter(lambda: src.read(COPY_BLOCK_SIZE), b'')
+    if renamer is not None:
+        chunks = renamer.rename_chunks(chunks)
+    if collisions is not None:
+        meta += [line for line in collisions.header_lines() if line not in meta]
+        chunks = collisions.filter_chunks(chunks)
+
+    if mode == 'all':
+        rename = header.rename_like(existing.keys())
+        lines = replace_contig_lines(meta, header.lines_all(rename, existing=existing)) + [column_line]
+        with BgzfWriter(output, threads=threads) as out:
+            out.write(''.join(lines))
+            for chunk in chunks:
+                out.write(chunk)
+                records += chunk.count(b'\n')
+        return records
+
+    seen = {}
+    spool_file = tempfile.NamedTemporaryFile(dir=tmp_dir or os.path.dirname(os.path.abspath(output)),
+                                             suffix='.spool.gz', delete=False)
+    try:
+        with BgzfWriter(fileobj=spool_file, threads=threads) as spool:
+            carry = b''
+            for chunk in chunks:
+                spool.write(chunk)
+                records += chunk.count(b'\n')
+                # Sorted data: only contig changes need a look at the lines
+                chunk = carry + chunk
+                cut = chunk.rfind(b'\n') + 1
+                carry = chunk[cut:]
+                _collect_contigs(chunk[:cut], seen)
+            if carry:
+                _collect_contigs(carry + b'\n', seen)
+        spool_file.close()
+
+        names = [name.decode() for name in seen]
+        lines = replace_contig_lines(meta, header.lines_for(names, existing)) + [column_line]
+        with open(output, 'wb') as out:
+            # The spooled blocks (ending in their own EOF marker) follow the header
+            with BgzfWriter(fileobj=out, eof=False) as header_writer:
+                header_writer.write(''.join(lines))
+            with open(spool_file.name, 'rb') as spooled:
+                shutil.copyfileobj(spooled, out, COPY_BLOCK_SIZE)
+    finally:
+        spool_file.close()
+        if os.path.exists(spool_file.name):
+            os.remove(spool_file.name)
+    return records
+
+
+def _collect_contigs(block, seen):
+    """Record the contigs of a block of complete lines, first-seen order"""
+    start = 0
+    end = len(block)
+    while start < end:
+        tab = block.find(b'\t', start)
+        if tab == -1:
+            break
+        name = block[start:tab]
+        if name not in seen:
+            seen[name] = True
+        # Skip the run of lines on this contig in one search when the lines
+        # up to its last occurrence all belong to it (sorted input)
+        last = block.rfind(b'\n' + name + b'\t', start, end)
+        run_end = block.find(b'\n', max(tab, last + 1)) + 1
+        if run_end and block.count(b'\n', start, run_end) != block.count(b'\n' + name + b'\t', start, run_end) + 1:
+            run_end = block.find(b'\n', tab) + 1
+        if run_end == 0:
+            break
+        start = run_end
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite VCF ##contig lines from the target FASTA .fai')
+    parser.add_argument('input', nargs='?', default='-', help='Input VCF text (default: stdin)')
+    parser.add_argument('--fasta', required=True, help='Target FASTA (its .fai is used, or built)')
+    parser.add_argument('--fai', help='Explicit .fai file')
+    parser.add_argument('--contigs', choices=CONTIG_MODES, default='all',
+                        help='Declare all reference contigs, or only those seen in the data')
+    parser.add_argument('-o', '--output', required=True, help='Output VCF (BGZF)')
+    parser.add_argument('--threads', type=int, default=1, help='BGZF compression threads')
+    parser.add_argument('--chr-mapping', help="Rename contigs from this 'old<TAB>new' mapping file")
+    parser.add_argument('--collisions', choices=('off',) + COLLISION_POLICIES, default='off',
+                        help='Detect records lifted to the same CHROM/POS/REF/ALT (input must be sorted) '
+                             'and report, flag, keep the first of, drop them or fail (default: off)')
+    parser.add_argument('--collision-report', help='Write collision counts and examples (JSON) to this file')
+    parser.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+
+    args = parser.parse_args()
+
+    header = ContigHeader.from_fasta(args.fasta, args.fai)
+    collisions = CollisionDetector(args.collisions) if args.collisions != 'off' else None
+    renamer = ContigRenamer.from_file(args.chr_mapping) if args.chr_mapping else None
+    trace = StageTrace('contig_header', args.trace)
+    with trace.stage('fix_contigs') as stage:
+        src = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+        try:
+            stage.records = fix_stream(src, args.output, header, args.contigs, threads=args.threads,
+                                       collisions=collisions, renamer=renamer)
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+        finally:
+            if src is not sys.stdin.buffer:
+                src.close()
+        if collisions is not None:
+            stage.extra['colliding_sites'] = collisions.sites
+            stage.extra['collisions_removed'] = collisions.removed
+        if renamer is not None:
+            stage.extra['renamed'] = renamer.renamed
+
+    print(f"Wrote {stage.records} records with {args.contigs} reference contigs declared: {args.output}")
+    if renamer is not None:
+        print(f"Renamed {renamer.renamed} records from {args.chr_mapping}")
+    if collisions is not None:
+        print(f"Colliding sites: {collisions.sites} ({collisions.records} records, "
+              f"{collisions.removed} removed, policy {collisions.policy})")
+        if args.collision_report:
+            collisions.write_report(args.collision_report)
+
+
+if __name__ == "__main__":
+    profile_main('contig_header', main)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+"""
+FASTA Reference Access
+======================
+Random access to an uncompressed FASTA file through its .fai index and a
+read-only memory map, so sequence lookups never load the reference into
+memory. A missing .fai is built by a single pass over the mapped FASTA:
+each contig's line layout is checked with strided slices rather than by
+iterating over its lines.
+
+Usage (samtools faidx equivalents, without samtools):
+    fasta.py index hg38.fa                                  # write hg38.fa.fai
+    fasta.py extract hg38.fa chr22 chr21:1-10000000 -o test.fa --index
+"""
+
+import argparse
+import mmap
+import os
+import re
+import sys
+
+from chain_utils import normalize_contig
+
+
+class FaiEntry:
+    """One .fai line: contig name, length, byte offset and line layout"""
+
+    __slots__ = ('name', 'length', 'offset', 'line_bases', 'line_width')
+
+    def __init__(self, name, length, offset, line_bases, line_width):
+        self.name = name
+        self.length = length
+        self.offset = offset
+        self.line_bases = line_bases
+        self.line_width = line_width
+
+    def to_line(self):
+        return f"{self.name}\t{self.length}\t{self.offset}\t{self.line_bases}\t{self.line_width}\n"
+
+
+def read_fai(fai_file):
+    """Read a samtools-style .fai index into a list of FaiEntry"""
+    entries = []
+    with open(fai_file) as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 5:
+                entries.append(FaiEntry(parts[0], int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4])))
+    return entries
+
+
+def build_fai(fasta_file):
+    """Index a FASTA in one pass; lines within a contig must share one width"""
+    if os.path.getsize(fasta_file) == 0:
+        return []
+    entries = []
+    with open(fasta_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = 0 if data[:1] == b'>' else data.find(b'\n>') + 1
+        if data[header:header + 1] != b'>':
+            return []
+        while True:
+            line_end = data.find(b'\n', header)
+            offset = len(data) if line_end == -1 else line_end + 1
+            next_header = data.find(b'\n>', offset - 1)
+            end = len(data) if next_header == -1 else next_header + 1
+            name = data[header + 1:offset].split()[0].decode()
+            entries.append(_contig_entry(fasta_file, data, name, offset, end))
+            if next_header == -1:
+                break
+            header = next_header + 1
+    return entries
+
+
+def _contig_entry(fasta_file, data, name, offset, end):
+    """FaiEntry of the sequence lines in data[offset:end]"""
+    # Trailing line breaks and blank lines are not sequence
+    while end > offset and data[end - 1] in b'\r\n':
+        end -= 1
+    if end == offset:
+        return FaiEntry(name, 0, offset, 0, 0)
+    first = data.find(b'\n', offset, end)
+    if first == -1:
+        # One line: its width still counts the line break
+        newline = 2 if data[end:end + 2] == b'\r\n' else len(data[end:end + 1])
+        return FaiEntry(name, end - offset, offset, end - offset, end - offset + newline)
+    line_width = first + 1 - offset
+    line_bases = line_width - (2 if data[first - 1] == 13 else 1)
+    full_lines, rest = divmod(end - offset, line_width)
+    # Every full line ends in a newline at the same column, and the last
+    # (partial) line holds no further line break
+    ends = data[offset + line_width - 1:offset + full_lines * line_width:line_width]
+    if ends.count(b'\n') != full_lines or rest > line_bases or data.find(b'\n', end - rest, end) != -1:
+        raise ValueError(f"{fasta_file}: contig {name} has uneven line lengths")
+    return FaiEntry(name, full_lines * line_bases + rest, offset, line_bases, line_width)
+
+
+def write_fai(entries, fai_file):
+    with open(fai_file, 'w') as f:
+        for entry in entries:
+            f.write(entry.to_line())
+
+
+def load_fai(fasta_file, fai_file=None):
+    """Entries of FASTA.fai (or fai_file); built and saved if missing.
+
+    A staged (symlinked) FASTA also finds the .fai next to its real path.
+    """
+    fai_file = fai_file or f"{fasta_file}.fai"
+    for candidate in (fai_file, f"{os.path.realpath(fasta_file)}.fai"):
+        if os.path.exists(candidate):
+            return read_fai(candidate)
+    entries = build_fai(fasta_file)
+    try:
+        write_fai(entries, fai_file)
+    except OSError:
+        pass
+    return entries
+
+
+class FastaReference:
+    """Memory-mapped FASTA with .fai-based region lookups"""
+
+    def __init__(self, fasta_file, fai_file=None):
+        if str(fasta_file).endswith(('.gz', '.bgz')):
+            raise ValueError(f"Compressed FASTA is not supported for memory mapping: {fasta_file}")
+        self.fasta_file = fasta_file
+        self.entries = load_fai(fasta_file, fai_file)
+
+        self.index = {entry.name: entry for entry in self.entries}
+        self._aliases = {}
+        for entry in self.entries:
+            self._aliases.setdefault(normalize_contig(entry.name), entry.name)
+
+        self._file = open(fasta_file, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def resolve(self, contig):
+        """Reference name for a contig, accepting names with or without 'chr'"""
+        if contig in self.index:
+            return contig
+        return self._aliases.get(normalize_contig(contig))
+
+    def length(self, contig):
+        name = self.resolve(contig)
+        return self.index[name].length if name else None
+
+    def _offset(self, entry, position):
+        return entry.offset + (position // entry.line_bases) * entry.line_width + position % entry.line_bases
+
+    def fetch(self, contig, start, end):
+        """Uppercase sequence of the 0-based half-open region; '' if unknown"""
+        return self.sequence(contig, start, end).upper()
+
+    def sequence(self, contig, start, end):
+        """Sequence of the 0-based half-open region as stored (soft-masked
+        bases stay lowercase); '' if unknown"""
+        name = self.resolve(contig)
+        if name is None:
+            return ''
+        entry = self.index[name]
+        start = max(0, start)
+        end = min(end, entry.length)
+        if start >= end:
+            return ''
+        raw = self._map[self._offset(entry, start):self._offset(entry, end - 1) + 1]
+        return raw.replace(b'\n', b'').replace(b'\r', b'').decode('ascii')
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def parse_region(text):
+    """(contig, 0-based start, end or None) of 'chr1', 'chr1:1000' or
+    'chr1:1,000-2,000' (1-based inclusive, as samtools faidx)"""
+    match = re.fullmatch(r'(.+?)(?::([\d,]+)(?:-([\d,]+))?)?', text.strip())
+    contig, start, end = match.groups()
+    start = int(start.replace(',', '')) - 1 if start else 0
+    end = int(end.replace(',', '')) if end else None
+    return contig, max(0, start), end
+
+
+def write_regions(reference, regions, out, line_width=60):
+    """Write regions ('chr1:1000-2000' or whole contigs) as FASTA records
+    named as given, like samtools faidx; returns the bases written"""
+    written = 0
+    for region in regions:
+        contig, start, end = parse_region(region)
+        if reference.resolve(contig) is None:
+            raise ValueError(f"Contig not in reference: {contig}")
+        sequence = reference.sequence(contig, start, reference.length(contig) if end is None else end)
+        out.write(f">{region}\n")
+        for i in range(0, len(sequence), line_width):
+            out.write(sequence[i:i + line_width] + '\n')
+        written += len(sequence)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index FASTA files and extract regions without samtools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index = subparsers.add_parser('index', help='Write FASTA.fai')
+    index.add_argument('fasta')
+
+    extract = subparsers.add_parser('extract', help='Write regions or whole contigs as FASTA')
+    extract.add_argument('fasta')
+    extract.add_argument('regions', nargs='+', help="Contigs or regions ('chr22', 'chr21:1-10000000')")
+    extract.add_argument('-o', '--output', help='Output FASTA (default: stdout)')
+    extract.add_argument('--line-width', type=int, default=60, help='Bases per line (default: 60)')
+    extract.add_argument('--index', action='store_true', help='Also write OUTPUT.fai')
+
+    args = parser.parse_args()
+    if args.command == 'index':
+        entries = build_fai(args.fasta)
+        write_fai(entries, f"{args.fasta}.fai")
+        print(f"Indexed {len(entries)} contigs: {args.fasta}.fai", file=sys.stderr)
+        return
+
+    with FastaReference(args.fasta) as reference:
+        out = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            bases = write_regions(reference, args.regions, out, args.line_width)
+        finally:
+            if args.output:
+                out.close()
+    print(f"Extracted {len(args.regions)} regions ({bases:,} bp)", file=sys.stderr)
+    if args.index and args.output:
+        write_fai(build_fai(args.output), f"{args.output}.fai")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,16 +12,13 @@ import os
 import re
 import json
 import csv
-import subprocess
 from pathlib import Path
 from datetime import datetime
-# Optional plotting libraries
-try:
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    PLOTTING_AVAILABLE = True
-except ImportError:
-    PLOTTING_AVAILABLE = False
+
+from async_probes import DEFAULT_CONCURRENCY, FirstColumnCounts, Probe, run_probes
+from bcf import bcf_stats, is_bcf
+from profiling import profile_main, read_profile_summaries
+from stage_trace import StageTrace, find_trace_files, read_trace_files, summarize_stages
 
 def parse_crossmap_log(log_file):
     """Parse CrossMap log file for statistics"""
@@ -114,45 +111,157 @@ def parse_crossmap_log(log_file):
 
 def get_vcf_stats(vcf_file):
     """Get statistics from VCF file using bcftools"""
-    stats = {}
+    return get_vcf_stats_all([vcf_file])[0]
+
+def get_vcf_stats_all(vcf_files, concurrency=DEFAULT_CONCURRENCY):
+    """Statistics for several VCF files; their bcftools probes run concurrently
+    (BCF files are read directly)"""
+    probes = []
+    for i, vcf_file in enumerate(vcf_files):
+        if is_bcf(vcf_file):
+            continue
+        probes.append(Probe(f"{i}:samples", ['bcftools', 'query', '-l', vcf_file]))
+        probes.append(Probe(f"{i}:contigs", ['bcftools', 'query', '-f', '%CHROM\n', vcf_file], FirstColumnCounts()))
+    probes = run_probes(probes, concurrency)
     
-    try:
-        # Count variants
-        cmd = f"bcftools view -H {vcf_file} | wc -l"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            stats['variant_count'] = int(result.stdout.strip())
-        
-        # Count samples
-        cmd = f"bcftools query -l {vcf_file} | wc -l"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            stats['sample_count'] = int(result.stdout.strip())
-        
-        # Get chromosomes
-        cmd = f"bcftools view -H {vcf_file} | cut -f1 | sort | uniq -c"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            chr_counts = {}
-            for line in result.stdout.strip().split('\n'):
-                if line.strip():
-                    parts = line.strip().split()
-                    if len(parts) >= 2:
-                        count = int(parts[0])
-                        chrom = parts[1]
-                        chr_counts[chrom] = count
-            stats['chromosome_counts'] = chr_counts
-        
-        # Get file size
-        stats['file_size_bytes'] = os.path.getsize(vcf_file)
-        stats['file_size_mb'] = round(stats['file_size_bytes'] / (1024 * 1024), 2)
-        
-    except Exception as e:
-        print(f"Warning: Could not get VCF stats for {vcf_file}: {e}")
+    all_vcf_stats = []
+    for i, vcf_file in enumerate(vcf_files):
+        stats = {}
+        try:
+            if is_bcf(vcf_file):
+                stats = bcf_stats(vcf_file)
+                stats['chromosome_counts'] = dict(sorted(stats['chromosome_counts'].items()))
+                stats['file_size_bytes'] = os.path.getsize(vcf_file)
+                stats['file_size_mb'] = round(stats['file_size_bytes'] / (1024 * 1024), 2)
+                all_vcf_stats.append(stats)
+                continue
+            
+            # Count variants and records per chromosome from one scan
+            contigs = probes[f"{i}:contigs"]
+            if contigs.ok:
+                stats['variant_count'] = sum(contigs.output.values())
+            
+            # Count samples
+            samples = probes[f"{i}:samples"]
+            if samples.ok:
+                stats['sample_count'] = len([s for s in samples.output.split('\n') if s.strip()])
+            
+            if contigs.ok:
+                stats['chromosome_counts'] = dict(sorted(contigs.output.items()))
+            
+            # Get file size
+            stats['file_size_bytes'] = os.path.getsize(vcf_file)
+            stats['file_size_mb'] = round(stats['file_size_bytes'] / (1024 * 1024), 2)
+            
+        except Exception as e:
+            print(f"Warning: Could not get VCF stats for {vcf_file}: {e}")
+        all_vcf_stats.append(stats)
     
-    return stats
+    return all_vcf_stats
+
+def load_stage_breakdown(trace_dir):
+    """Load *.trace.jsonl files and aggregate them per tool and stage"""
+    entries = read_trace_files(find_trace_files(trace_dir))
+    return entries, summarize_stages(entries)
 
-def generate_summary_report(all_stats, output_dir):
+def apply_trace_timings(all_stats, trace_entries):
+    """Fill processing_time from trace entries when the log did not report it"""
+    wall_by_sample = {}
+    for entry in trace_entries:
+        sample_id = entry.get('sample_id')
+        if sample_id:
+            wall_by_sample[sample_id] = wall_by_sample.get(sample_id, 0.0) + (entry.get('wall_seconds') or 0.0)
+
+    for stats in all_stats:
+        if not stats['processing_time'] and stats['sample_id'] in wall_by_sample:
+            stats['processing_time'] = round(wall_by_sample[stats['sample_id']], 3)
+
+def generate_stage_table(stage_breakdown):
+    """Render the per-stage throughput breakdown as an HTML table"""
+    if not stage_breakdown:
+        return ""
+
+    rows = ""
+    for row in stage_breakdown:
+        rate = f"{row['records_per_sec']:,.1f}" if row['records_per_sec'] else 'N/A'
+        rows += f"""
+                <tr>
+                    <td>{row['tool']}</td>
+                    <td>{row['stage']}</td>
+                    <td>{row['calls']}</td>
+                    <td>{row['wall_seconds']:.2f}</td>
+                    <td>{row['cpu_seconds'] + row['child_cpu_seconds']:.2f}</td>
+                    <td>{row['records']:,}</td>
+                    <td>{rate}</td>
+                    <td>{row['bytes_read'] / (1024 * 1024):.1f}</td>
+                    <td>{row['bytes_written'] / (1024 * 1024):.1f}</td>
+                    <td>{row['peak_rss_mb']:.1f}</td>
+                </tr>
+        """
+
+    return f"""
+        <h2>Per-Stage Throughput</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Tool</th>
+                    <th>Stage</th>
+                    <th>Calls</th>
+                    <th>Wall (s)</th>
+                    <th>CPU (s)</th>
+                    <th>Records</th>
+                    <th>Records/s</th>
+                    <th>Read (MB)</th>
+                    <th>Written (MB)</th>
+                    <th>Peak RSS (MB)</th>
+                </tr>
+            </thead>
+            <tbody>{rows}
+            </tbody>
+        </table>
+    """
+
+def generate_hotspot_table(profiles, top_n):
+    """Render the top-N hot functions of each profiled task as HTML"""
+    if not profiles:
+        return ""
+
+    sections = ""
+    for profile in profiles:
+        rows = ""
+        for func in profile['top_functions'][:top_n]:
+            calls = func['calls'] if func['calls'] is not None else 'N/A'
+            rows += f"""
+                    <tr>
+                        <td>{func['function']}</td>
+                        <td>{func['location']}</td>
+                        <td>{calls}</td>
+                        <td>{func['self_seconds']:.4f}</td>
+                        <td>{func['cumulative_seconds']:.4f}</td>
+                    </tr>
+            """
+        sections += f"""
+        <h3>{profile['tool']} ({profile['mode']}, {profile['wall_seconds']:.2f}s) - {profile['artifact']}</h3>
+        <table>
+            <thead>
+                <tr>
+                    <th>Function</th>
+                    <th>Location</th>
+                    <th>Calls</th>
+                    <th>Self (s)</th>
+                    <th>Cumulative (s)</th>
+                </tr>
+            </thead>
+            <tbody>{rows}
+            </tbody>
+        </table>
+        """
+
+    return f"""
+        <h2>Hot Functions by Task</h2>{sections}
+    """
+
+def generate_summary_report(all_stats, output_dir, stage_breakdown=None, profiles=None, profile_top=10):
     """Generate comprehensive summary report"""
     
     # Calculate overall statistics
@@ -244,6 +353,12 @@ def generate_summary_report(all_stats, output_dir):
     html_content += """
             </tbody>
         </table>
+    """
+    
+    html_content += generate_stage_table(stage_breakdown)
+    html_content += generate_hotspot_table(profiles, profile_top)
+    
+    html_content += """
     </body>
     </html>
     """
@@ -258,7 +373,12 @@ def generate_summary_report(all_stats, output_dir):
 def generate_plots(all_stats, output_dir):
     """Generate visualization plots"""
 
-    if not PLOTTING_AVAILABLE:
+    # Optional plotting libraries, imported only here: they take longer to
+    # load than the rest of the tool
+    try:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+    except ImportError:
         print("Warning: matplotlib/seaborn not available, skipping plots")
         return None
 
@@ -320,8 +440,15 @@ def main():
     parser.add_argument('--vcf-dir', help='Directory containing output VCF files')
     parser.add_argument('--output-dir', default='./stats', help='Output directory for reports')
     parser.add_argument('--format', choices=['html', 'json', 'csv', 'all'], default='all', help='Output format')
+    parser.add_argument('--trace-dir', help='Directory of *.trace.jsonl stage traces to merge into the report')
+    parser.add_argument('--trace', help='Append per-phase timing/RSS trace (JSON lines) to this file')
+    parser.add_argument('--profile-dir', help='Directory of *.profile.json summaries to include in the report')
+    parser.add_argument('--profile-top', type=int, default=10, help='Hot functions to report per task (default: 10)')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'bcftools probes run at once (default: {DEFAULT_CONCURRENCY})')
     
     args = parser.parse_args()
+    trace = StageTrace('generate_stats', args.trace)
     
     # Create output directory
     os.makedirs(args.output_dir, exist_ok=True)
@@ -342,49 +469,87 @@ def main():
     
     # Parse all log files
     all_stats = []
-    for log_file in log_files:
-        print(f"Processing: {log_file}")
-        stats = parse_crossmap_log(log_file)
-        
-        # Add VCF statistics if VCF directory provided
-        if args.vcf_dir:
-            sample_id = stats['sample_id']
-            vcf_pattern = f"{sample_id}*.vcf.gz"
-            
-            import glob
-            vcf_files = glob.glob(os.path.join(args.vcf_dir, vcf_pattern))
-            if vcf_files:
-                vcf_stats = get_vcf_stats(vcf_files[0])
+    with trace.stage('parse_logs') as phase:
+        for log_file in log_files:
+            print(f"Processing: {log_file}")
+            all_stats.append(parse_crossmap_log(log_file))
+        phase.records = len(log_files)
+    
+    # Add VCF statistics if VCF directory provided
+    if args.vcf_dir:
+        import glob
+        with trace.stage('vcf_stats') as phase:
+            matched = []
+            for stats in all_stats:
+                vcf_pattern = f"{stats['sample_id']}*.vcf.gz"
+                vcf_files = glob.glob(os.path.join(args.vcf_dir, vcf_pattern))
+                if vcf_files:
+                    matched.append((stats, vcf_files[0]))
+            # bcftools probes for all samples run concurrently
+            vcf_stats_all = get_vcf_stats_all([vcf for _, vcf in matched], args.max_concurrency)
+            for (stats, _), vcf_stats in zip(matched, vcf_stats_all):
                 stats.update(vcf_stats)
-        
-        all_stats.append(stats)
+                phase.records += vcf_stats.get('variant_count', 0)
     
     print(f"Processed {len(all_stats)} samples")
     
-    # Generate reports
-    if args.format in ['html', 'all']:
-        html_file = generate_summary_report(all_stats, args.output_dir)
-        print(f"HTML report generated: {html_file}")
-    
-    if args.format in ['json', 'all']:
-        json_file = os.path.join(args.output_dir, 'liftover_stats.json')
-        with open(json_file, 'w') as f:
-            json.dump(all_stats, f, indent=2)
-        print(f"JSON report generated: {json_file}")
+    # Merge per-stage traces from the Python tools
+    stage_breakdown = None
+    if args.trace_dir:
+        trace_entries, stage_breakdown = load_stage_breakdown(args.trace_dir)
+        apply_trace_timings(all_stats, trace_entries)
+        print(f"Merged {len(trace_entries)} trace entries into {len(stage_breakdown)} stages")
     
-    if args.format in ['csv', 'all']:
-        csv_file = os.path.join(args.output_dir, 'liftover_stats.csv')
-        with open(csv_file, 'w', newline='') as f:
-            if all_stats:
-                writer = csv.DictWriter(f, fieldnames=all_stats[0].keys())
-                writer.writeheader()
-                writer.writerows(all_stats)
-        print(f"CSV report generated: {csv_file}")
+    # Collect profiling summaries
+    profiles = None
+    if args.profile_dir:
+        profiles = read_profile_summaries(args.profile_dir)
+        print(f"Found {len(profiles)} task profiles")
     
-    # Generate plots
-    plot_file = generate_plots(all_stats, args.output_dir)
-    if plot_file:
-        print(f"Plots generated: {plot_file}")
+    # Generate reports
+    with trace.stage('reports'):
+        if args.format in ['html', 'all']:
+            html_file = generate_summary_report(all_stats, args.output_dir, stage_breakdown,
+                                                profiles, args.profile_top)
+            print(f"HTML report generated: {html_file}")
+        
+        if args.format in ['json', 'all']:
+            json_file = os.path.join(args.output_dir, 'liftover_stats.json')
+            with open(json_file, 'w') as f:
+                json.dump(all_stats, f, indent=2)
+            print(f"JSON report generated: {json_file}")
+            if stage_breakdown is not None:
+                breakdown_file = os.path.join(args.output_dir, 'stage_breakdown.json')
+                with open(breakdown_file, 'w') as f:
+                    json.dump(stage_breakdown, f, indent=2)
+                print(f"Stage breakdown generated: {breakdown_file}")
+            if profiles:
+                hotspot_file = os.path.join(args.output_dir, 'profile_hotspots.json')
+                with open(hotspot_file, 'w') as f:
+                    json.dump([dict(p, top_functions=p['top_functions'][:args.profile_top])
+                               for p in profiles], f, indent=2)
+                print(f"Profile hotspots generated: {hotspot_file}")
+        
+        if args.format in ['csv', 'all']:
+            csv_file = os.path.join(args.output_dir, 'liftover_stats.csv')
+            with open(csv_file, 'w', newline='') as f:
+                if all_stats:
+                    writer = csv.DictWriter(f, fieldnames=all_stats[0].keys())
+                    writer.writeheader()
+                    writer.writerows(all_stats)
+            print(f"CSV report generated: {csv_file}")
+            if stage_breakdown:
+                breakdown_csv = os.path.join(args.output_dir, 'stage_throughput.csv')
+                with open(breakdown_csv, 'w', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=stage_breakdown[0].keys())
+                    writer.writeheader()
+                    writer.writerows(stage_breakdown)
+                print(f"Stage throughput CSV generated: {breakdown_csv}")
+        
+        # Generate plots
+        plot_file = generate_plots(all_stats, args.output_dir)
+        if plot_file:
+            print(f"Plots generated: {plot_file}")
     
     # Print summary
     if all_stats:
@@ -399,4 +564,4 @@ def main():
         print(f"  Average success rate: {avg_success:.2f}%")
 
 if __name__ == "__main__":
-    main()
+    profile_main('generate_stats', main)
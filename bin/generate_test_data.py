@@ -5,10 +5,21 @@ Creates realistic VCF files with various use cases and scenarios
 """
 
 import os
+import sys
 import gzip
 import random
+import argparse
 from datetime import datetime
 
+from bgzf import BgzfWriter
+
+# Optional vectorized generation
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 def create_vcf_header(sample_names, reference="hg19", contig_info=None):
     """Create VCF header with proper format"""
     header = [
@@ -99,13 +110,151 @@ def create_test_vcf(filename, variants_data, sample_names, reference="hg19", com
             for variant in variants:
                 f.write(variant + "\n")
 
+def format_genotype_block(gt, dp, gq):
+    """Format an (n_sites x n_samples) genotype chunk as GT:DP:GQ sample columns.
+
+    Every sample column is exactly 9 bytes ("0/1:dd:qq") because DP and GQ are
+    drawn from two-digit ranges, so the whole chunk is assembled as one uint8
+    array and each row is sliced out with tobytes() instead of per-sample
+    string formatting.
+    """
+    n_sites, n_samples = gt.shape
+    cells = np.empty((n_sites, n_samples, 10), dtype=np.uint8)
+    cells[:, :, 0] = np.where(gt == 2, ord('1'), ord('0'))
+    cells[:, :, 1] = ord('/')
+    cells[:, :, 2] = np.where(gt == 0, ord('0'), ord('1'))
+    cells[:, :, 3] = ord(':')
+    cells[:, :, 4] = dp // 10 + ord('0')
+    cells[:, :, 5] = dp % 10 + ord('0')
+    cells[:, :, 6] = ord(':')
+    cells[:, :, 7] = gq // 10 + ord('0')
+    cells[:, :, 8] = gq % 10 + ord('0')
+    cells[:, :, 9] = ord('\t')
+    cells[:, -1, 9] = ord('\n')
+    return cells.reshape(n_sites, n_samples * 10)
+
+
+def generate_variant_chunk(chrom, positions, n_samples, rng):
+    """Generate the VCF text for one chunk of sites with NumPy"""
+    n_sites = len(positions)
+    bases = np.array(list("ACGT"))
+
+    ref_idx = rng.integers(0, 4, n_sites)
+    alt_idx = (ref_idx + rng.integers(1, 4, n_sites)) % 4
+    af = rng.uniform(0.05, 0.95, n_sites)
+    ids = rng.integers(1000000, 9999999, n_sites)
+    qual = rng.integers(20, 61, n_sites)
+
+    # Hardy-Weinberg-style draws: each allele is ALT with probability af
+    alleles = rng.random((n_sites, n_samples, 2)) < af[:, None, None]
+    gt = alleles.sum(axis=2, dtype=np.uint8)
+    dp = rng.integers(15, 51, (n_sites, n_samples), dtype=np.uint8)
+    gq = rng.integers(20, 61, (n_sites, n_samples), dtype=np.uint8)
+
+    an = n_samples * 2
+    ac = gt.sum(axis=1, dtype=np.int64)
+    site_dp = dp.sum(axis=1, dtype=np.int64)
+    samples = format_genotype_block(gt, dp, gq)
+
+    columns = zip(np.asarray(positions).tolist(), ids.tolist(), bases[ref_idx].tolist(),
+                  bases[alt_idx].tolist(), qual.tolist(), ac.tolist(), site_dp.tolist())
+    rows = []
+    for i, (pos, rs, ref, alt, q, count, depth) in enumerate(columns):
+        prefix = (f"{chrom}\t{pos}\trs{rs}\t{ref}\t{alt}\t{q}\tPASS\t"
+                  f"AC={count};AF={count / an:.3f};AN={an};DP={depth}\tGT:DP:GQ\t")
+        rows.append(prefix.encode('ascii'))
+        rows.append(samples[i].tobytes())
+    return b''.join(rows)
+
+
+def create_large_vcf(filename, sites, sample_names, reference="hg19", contig_info=None,
+                     seed=42, chunk_size=10000, threads=4, level=1):
+    """Create a large BGZF-compressed VCF with vectorized genotype generation.
+
+    ``sites`` is a sequence of (chrom, sorted positions) pairs. Each chunk uses
+    its own generator seeded from (seed, chunk number), so the same seed and
+    chunk size always produce identical output regardless of thread count.
+    Compression defaults to zlib level 1: deflate dominates run time at higher
+    levels and the files are throw-away test inputs.
+    """
+    if not NUMPY_AVAILABLE:
+        sys.exit("ERROR: numpy is required for large dataset generation")
+
+    header = create_vcf_header(sample_names, reference, contig_info)
+    n_samples = len(sample_names)
+    chunk_number = 0
+    total = 0
+
+    with BgzfWriter(filename, level=level, threads=threads) as writer:
+        writer.write("\n".join(header) + "\n")
+        for chrom, positions in sites:
+            positions = np.asarray(positions)
+            for start in range(0, len(positions), chunk_size):
+                rng = np.random.default_rng([seed, chunk_number])
+                chunk = positions[start:start + chunk_size]
+                writer.write(generate_variant_chunk(chrom, chunk, n_samples, rng))
+                chunk_number += 1
+                total += len(chunk)
+
+    return total
+
+
+def create_large_dataset(output, n_sites, n_samples, contigs, seed=42, chunk_size=10000, threads=4, level=1):
+    """Write a large dataset with uniformly spread positions on the given contigs"""
+    rng = np.random.default_rng(seed)
+    lengths = np.array([length for _, length in contigs], dtype=np.int64)
+    per_contig = np.bincount(rng.choice(len(contigs), n_sites, p=lengths / lengths.sum()),
+                             minlength=len(contigs))
+
+    sites = []
+    for (chrom, length), count in zip(contigs, per_contig):
+        # Without replacement, so exactly n_sites distinct positions are written
+        positions = np.sort(rng.choice(length, count, replace=False, shuffle=False)) + 1
+        sites.append((chrom, positions))
+
+    sample_names = [f"SAMPLE{i:05d}" for i in range(1, n_samples + 1)]
+    return create_large_vcf(output, sites, sample_names, contig_info=dict(contigs),
+                            seed=seed, chunk_size=chunk_size, threads=threads, level=level)
+
+
+def parse_contigs(value):
+    """Parse 'name:length,name:length' into a list of (name, length)"""
+    contigs = []
+    for item in value.split(','):
+        name, _, length = item.strip().partition(':')
+        if not length:
+            raise argparse.ArgumentTypeError(f"Contig must be given as name:length, got: {item}")
+        contigs.append((name, int(length)))
+    return contigs
+
+
 def main():
     """Generate comprehensive test datasets"""
 
+    parser = argparse.ArgumentParser(description='Generate test data for chiptimputation-vcf-liftover')
+    parser.add_argument('--large', metavar='OUTPUT',
+                        help='Write one large synthetic BGZF VCF instead of the standard test datasets')
+    parser.add_argument('--sites', type=int, default=1000000, help='Sites for --large (default: 1000000)')
+    parser.add_argument('--samples', type=int, default=1000, help='Samples for --large (default: 1000)')
+    parser.add_argument('--contigs', type=parse_contigs, default='22:51304566',
+                        help='Contigs for --large as name:length,... (default: 22:51304566)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Sites per generation chunk (default: 10000)')
+    parser.add_argument('--threads', type=int, default=4, help='BGZF compression threads (default: 4)')
+    parser.add_argument('--level', type=int, default=1, choices=range(0, 10), metavar='0-9',
+                        help='BGZF compression level (default: 1)')
+    args = parser.parse_args()
+
+    if args.large:
+        print(f"Generating {args.sites:,} sites x {args.samples:,} samples: {args.large}")
+        total = create_large_dataset(args.large, args.sites, args.samples, args.contigs,
+                                     args.seed, args.chunk_size, args.threads, args.level)
+        print(f"Wrote {total:,} variants to {args.large}")
+        return
+
     print("Generating comprehensive test data for chiptimputation-vcf-liftover...")
 
     # Ensure test_data directory exists
-    import os
     os.makedirs("dev_docs/test_data", exist_ok=True)
 
     # Test Case 1: Small dataset with known coordinates (chr22)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+Input Validation
+================
+Validates the sample CSV of the input handler and checks that every VCF
+exists and is readable (the INPUT_CHECK step).
+
+Usage:
+    liftover-tools check-input processed_samples.csv -o validated_samples.csv
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+from profiling import profile_main
+
+VALID_EXTENSIONS = ('.vcf', '.vcf.gz', '.bcf')
+REQUIRED_COLUMNS = ['sample_id', 'vcf_path']
+
+
+def validate_input(input_file, output_file):
+    """Check every row of input_file and write the valid samples to output_file"""
+    validated_samples = []
+
+    with open(input_file, 'r') as f:
+        reader = csv.DictReader(f)
+        # Size estimate columns from the input handler are passed through
+        fieldnames = reader.fieldnames
+
+        # Check required columns
+        if not all(col in reader.fieldnames for col in REQUIRED_COLUMNS):
+            sys.exit(f"ERROR: Input CSV must contain columns: {REQUIRED_COLUMNS}")
+
+        for row in reader:
+            sample_id = row['sample_id']
+            vcf_path = row['vcf_path']
+
+            # Check if sample_id is provided
+            if not sample_id or sample_id.strip() == '':
+                sys.exit(f"ERROR: Empty sample_id found in row: {row}")
+
+            # Check if VCF path is provided
+            if not vcf_path or vcf_path.strip() == '':
+                sys.exit(f"ERROR: Empty vcf_path found for sample: {sample_id}")
+
+            # Check if VCF file exists
+            if not os.path.exists(vcf_path):
+                sys.exit(f"ERROR: VCF file not found: {vcf_path}")
+
+            # Check file extension
+            if not vcf_path.endswith(VALID_EXTENSIONS):
+                sys.exit(f"ERROR: Invalid VCF file format: {vcf_path}. Must end with {VALID_EXTENSIONS}")
+
+            # Check file is readable
+            try:
+                with open(vcf_path, 'rb') as test_file:
+                    test_file.read(1)
+            except IOError as e:
+                sys.exit(f"ERROR: Cannot read VCF file {vcf_path}: {e}")
+
+            validated_samples.append(row)
+
+    # Check for duplicate sample IDs
+    seen = set()
+    duplicates = set()
+    for sample in validated_samples:
+        if sample['sample_id'] in seen:
+            duplicates.add(sample['sample_id'])
+        seen.add(sample['sample_id'])
+    if duplicates:
+        sys.exit(f"ERROR: Duplicate sample IDs found: {duplicates}")
+
+    # Write validated samples
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(validated_samples)
+
+    print(f"Successfully validated {len(validated_samples)} samples")
+
+    # Print summary
+    for sample in validated_samples:
+        print(f"  - {sample['sample_id']}: {sample['vcf_path']}")
+    return validated_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate the sample CSV of the input handler')
+    parser.add_argument('input_csv', help='Sample CSV (sample_id, vcf_path, ...)')
+    parser.add_argument('-o', '--output', default='validated_samples.csv',
+                        help='Validated sample CSV (default: validated_samples.csv)')
+    args = parser.parse_args()
+    validate_input(args.input_csv, args.output)
+
+
+if __name__ == "__main__":
+    profile_main('input_check', main)
@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+
+"""
+Streaming VCF Liftover
+======================
+Lift a VCF through a chain file in one streaming pass, as an alternative to
+CrossMap. Output names, the .unmap file of failed records and the
+"Total entries" / "Failed to map" log lines follow CrossMap, so the rest of
+the pipeline handles either engine the same way.
+
+Normalization runs in the same pass: alleles lifted onto a reverse-strand
+chain are reverse-complemented and re-anchored, indels can be trimmed and
+left-aligned against the memory-mapped target reference (--normalize), and
+multiallelic records can be split or joined (--multiallelics). Contigs can be
+renamed while writing (--chr-mapping), replacing a separate rename pass.
+
+##contig lines come from the target .fai and are written before any record:
+every reference contig, or (--contig-header seen) only those the chain can
+reach from the input's contigs.
+
+Only CHROM, POS, ID, REF and ALT are decoded. QUAL through the last sample
+column stay a raw memoryview of the input line and are copied to the output
+unchanged, so lift cost does not grow with the number of samples. Records are
+fully parsed only when a multiallelic record is split or joined.
+
+BCF input and output (.bcf) are read and written directly with bcf.py: a BCF
+record keeps its INFO and sample bytes, and only its site fields are
+re-encoded on output.
+
+With --regions (target coordinates), the regions are mapped back through the
+chain and only the input's records in those source intervals are read, by
+seeking through its .tbi/.csi index; --jobs lifts groups of intervals in
+parallel.
+
+With --checkpoint-dir, a bgzipped input is lifted in shards (one per
+chromosome, split every --checkpoint-mb of compressed input). Each finished
+shard is listed with its input virtual offsets in the directory's manifest
+(checkpoint.py), and a rerun with the same directory resumes after the last
+finished shard; the shards are concatenated into the output at the end.
+
+--target CHAIN REFERENCE OUTPUT lifts onto further targets in the same read
+of the input: each record is parsed once and lifted by every target.
+
+Site filters (--keep-filters, --whitelist, --min-af/--max-af/--min-maf, see
+site_filter.py) drop records as they are read, before the chain lookup; they
+are counted apart from the lifted and failed records.
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import ExitStack
+
+from bcf import BcfHeader, BcfReader, BcfRecord, encode_record, header_bytes, is_bcf, record_bytes
+from bgzf import BGZF_EOF, BgzfWriter, is_bgzf
+from chain_utils import ChainIndex, match_contig_style
+from checkpoint import LiftCheckpoint, file_fingerprint
+from contig_header import CONTIG_MODES, ContigHeader, contig_id, replace_contig_lines
+from fasta import FastaReference
+from normalize import (HeaderNumbers, MultiallelicJoiner, expand_record, is_symbolic, normalize_alleles,
+                       reverse_complement, split_multiallelic)
+from profiling import profile_main
+from rename_contigs import read_chr_mapping
+from site_filter import add_filter_arguments, site_filter_from_args
+from stage_trace import StageTrace
+from vcf_index import BgzfVcf, IndexedVcf, RegionSet, read_regions, source_regions
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s]  %(message)s'
+MULTIALLELIC_MODES = ('none', 'split', 'join')
+# lift_record reason for records that lift outside the requested regions;
+# they are skipped, not counted as failures
+OUTSIDE_REGIONS = 'OutsideRegions'
+
+# Lifter and files shared with forked scatter workers
+_SCATTER = {}
+
+# Compressed input per checkpoint shard (shards also end at each chromosome)
+DEFAULT_CHECKPOINT_MB = 256
+
+
+def open_vcf(path):
+    if str(path).endswith(('.gz', '.bgz')):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def open_output(path):
+    if str(path).endswith(('.gz', '.bgz')):
+        return BgzfWriter(path)
+    return open(path, 'wb')
+
+
+def read_vcf(path, regions=None):
+    """(meta lines, #CHROM line, records) of a VCF or BCF file. Records are
+    (fields, line) pairs: fields as from split_head() (a BcfRecord tail for
+    BCF input) and the original line for the .unmap file. With regions (a
+    RegionSet), only the overlapping records are read, through the index."""
+    if regions is not None:
+        vcf = IndexedVcf(path)
+        if vcf.bcf:
+            records = ((bcf_fields(record), record) for record in vcf.fetch(regions))
+        else:
+            records = ((split_head(line), line) for line in vcf.fetch(regions))
+        return vcf, vcf.meta, vcf.column_line, records
+
+    if is_bcf(path):
+        reader = BcfReader(path)
+        header = reader.header
+        return reader, header.meta, header.column_line, ((bcf_fields(record), record) for record in reader)
+
+    src = open_vcf(path)
+    meta = []
+    column_line = ''
+    for line in src:
+        if line.startswith(b'##'):
+            meta.append(line.decode())
+        elif line.startswith(b'#'):
+            column_line = line.decode()
+            break
+    return src, meta, column_line, ((split_head(line), line) for line in src if line.strip())
+
+
+def bcf_fields(record):
+    """CHROM..ALT of a BCF record as text, with the record itself as the tail"""
+    return record.site_text() + [record]
+
+
+def split_head(line):
+    """Split a record line (bytes) into its first five fields as text plus a
+    memoryview of the rest (QUAL onwards, without the newline)"""
+    end = len(line)
+    while end and line[end - 1] in (10, 13):
+        end -= 1
+    cut = -1
+    for _ in range(5):
+        cut = line.find(b'\t', cut + 1, end)
+        if cut == -1:
+            return line[:end].decode().split('\t')
+    fields = line[:cut].decode().split('\t')
+    fields.append(memoryview(line)[cut + 1:end])
+    return fields
+
+
+def format_record(fields):
+    """Output line (bytes) for a record from split_head() or a full field list"""
+    if len(fields) == 6 and not isinstance(fields[5], str):
+        tail = fields[5].tail_text().encode() if isinstance(fields[5], BcfRecord) else fields[5]
+        return b''.join(('\t'.join(fields[:5]).encode(), b'\t', tail, b'\n'))
+    return ('\t'.join(fields) + '\n').encode()
+
+
+class BcfOutput:
+    """Writes lifted records to a BCF file; the header is given with
+    write_header() before any record"""
+
+    def __init__(self, path, header=None, stream=None):
+        self.path = path
+        self.header = header
+        self._out = stream
+
+    def write_header(self, text):
+        self.header = BcfHeader(text)
+        self._out = BgzfWriter(self.path)
+        self._out.write(header_bytes(self.header))
+
+    def encode(self, fields):
+        tail = fields[5] if len(fields) == 6 else None
+        if isinstance(tail, BcfRecord):
+            alleles = [fields[3]] + ([] if fields[4] == '.' else fields[4].split(','))
+            record = tail.replace(header=self.header, contig=fields[0], pos=int(fields[1]) - 1,
+                                  id=fields[2], alleles=alleles)
+        else:
+            record = encode_record(self.header, expand_record(fields))
+        return record_bytes(record)
+
+    def write_record(self, fields):
+        self._out.write(self.encode(fields))
+
+    def write_raw(self, data):
+        self._out.write(data)
+
+    def shard(self, path):
+        """An output for one scatter shard: encoded records only, uncompressed"""
+        return BcfOutput(path, self.header, open(path, 'wb'))
+
+    def close(self):
+        if self._out:
+            self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class VcfOutput:
+    """Writes lifted records as VCF text (BGZF for .gz)"""
+
+    def __init__(self, path, stream=None):
+        self._out = stream or open_output(path)
+
+    def write_header(self, text):
+        self._out.write(text.encode())
+
+    def encode(self, fields):
+        return format_record(fields)
+
+    def write_record(self, fields):
+        self._out.write(format_record(fields))
+
+    def write_raw(self, data):
+        self._out.write(data)
+
+    def shard(self, path):
+        """An output for one scatter shard: record lines only, uncompressed"""
+        return VcfOutput(path)
+
+    def close(self):
+        self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def unmap_line(line, reason):
+    if isinstance(line, BcfRecord):
+        return f"{line.to_text()}\tFail({reason})\n".encode()
+    return line.rstrip() + f"\tFail({reason})\n".encode()
+
+
+class LiftResult:
+    """Counts for one lifted file"""
+
+    def __init__(self):
+        self.total = 0
+        self.failed = 0
+        self.written = 0
+        self.normalized = 0
+        self.outside = 0
+        self.filtered = 0
+        self.reasons = {}
+
+    def fail(self, reason):
+        self.failed += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def add(self, other):
+        """Add the counts of another (shard) result"""
+        self.total += other.total
+        self.failed += other.failed
+        self.written += other.written
+        self.normalized += other.normalized
+        self.outside += other.outside
+        self.filtered += other.filtered
+        for reason, count in other.reasons.items():
+            self.reasons[reason] = self.reasons.get(reason, 0) + count
+
+    def counts(self):
+        return dict(vars(self), reasons=dict(self.reasons))
+
+    @classmethod
+    def from_counts(cls, counts):
+        result = cls()
+        vars(result).update(counts)
+        return result
+
+
+class VcfLifter:
+    """Lifts VCF records through a chain index onto a target reference.
+
+    The chain index and reference are loaded once and can be reused for any
+    number of files.
+    """
+
+    def __init__(self, chain_index, reference, normalize=False, multiallelics='none', chr_mapping=None,
+                 contig_header='all', site_filter=None):
+        if multiallelics not in MULTIALLELIC_MODES:
+            raise ValueError(f"multiallelics must be one of {MULTIALLELIC_MODES}")
+        if contig_header not in CONTIG_MODES:
+            raise ValueError(f"contig_header must be one of {CONTIG_MODES}")
+        self.chain_index = chain_index
+        self.reference = reference
+        self.normalize = normalize
+        self.multiallelics = multiallelics
+        self.chr_mapping = chr_mapping or {}
+        self.contig_header = contig_header
+        self.site_filter = site_filter
+        self.target_regions = None
+        self._contig_names = {}
+
+    def output_contig(self, template, target):
+        """Output name for a target contig: input 'chr' style, then renamed"""
+        key = (template, target)
+        name = self._contig_names.get(key)
+        if name is None:
+            name = match_contig_style(template, target)
+            name = self._contig_names[key] = self.chr_mapping.get(name, name)
+        return name
+
+    def lift_record(self, fields):
+        """Lift one record; returns (records, None) or (None, failure reason)"""
+        ref = fields[3]
+        start = int(fields[1]) - 1
+        hits = self.chain_index.map_interval(fields[0], start, start + len(ref))
+        if not hits:
+            return None, 'Unmap'
+        if len(hits) > 1:
+            return None, 'Multiple_hits'
+
+        target, target_start, target_end, strand = hits[0]
+        if self.target_regions is not None and not self.target_regions.overlaps(target, target_start, target_end):
+            return None, OUTSIDE_REGIONS
+        contig = self.reference.resolve(target)
+        if contig is None:
+            return None, 'KeyError'
+        new_ref = self.reference.fetch(contig, target_start, target_end)
+        if not new_ref:
+            return None, 'KeyError'
+
+        alts = fields[4].split(',')
+        if strand == '-':
+            alts = [a if is_symbolic(a) else reverse_complement(a) for a in alts]
+        if ','.join(alts) == new_ref:
+            return None, 'REF==ALT'
+
+        fields[0] = self.output_contig(fields[0], target)
+        fields[1] = str(target_start + 1)
+        fields[3] = new_ref
+        fields[4] = ','.join(alts)
+
+        records = [fields]
+        if self.multiallelics == 'split' and len(alts) > 1:
+            records = split_multiallelic(expand_record(fields), self.numbers)
+
+        # Indels on a reverse-strand chain are anchored on the wrong side until
+        # re-normalized; other records only when normalization is requested
+        reanchor = strand == '-' and any(len(a) != len(new_ref) for a in alts)
+        if self.normalize or reanchor:
+            fetch = lambda s, e: self.reference.fetch(contig, s, e)
+            for record in records:
+                pos, alleles = normalize_alleles(int(record[1]), [record[3]] + record[4].split(','), fetch)
+                if str(pos) != record[1] or alleles[0] != record[3]:
+                    self.result.normalized += 1
+                record[1] = str(pos)
+                record[3] = alleles[0]
+                record[4] = ','.join(alleles[1:])
+        return records, None
+
+    def lift_file(self, infile, outfile, unmap_file=None, chain_file=None, reference_file=None,
+                  regions=None, jobs=1, checkpoint_dir=None, checkpoint_mb=DEFAULT_CHECKPOINT_MB):
+        """Lift every record of infile into outfile; returns a LiftResult.
+
+        With regions (a RegionSet in target coordinates), only the input records
+        in the source intervals that lift into them are read, through the
+        input's index, and jobs > 1 lifts groups of those intervals in parallel.
+        With checkpoint_dir, a bgzipped input is lifted in resumable shards.
+        """
+        self.result = result = LiftResult()
+        self.numbers = HeaderNumbers()
+        self.target_regions = regions
+        unmap_file = unmap_file or f"{outfile}.unmap"
+        if checkpoint_dir and regions is None:
+            if is_bgzf(infile):
+                return self._lift_checkpointed(infile, outfile, unmap_file, chain_file, reference_file,
+                                               checkpoint_dir, checkpoint_mb)
+            logging.warning(f"{infile} is not bgzipped: lifting without checkpoints")
+        source = source_regions(self.chain_index, regions) if regions is not None else None
+
+        src, meta, column_line, records = read_vcf(infile, source)
+        output = BcfOutput(outfile) if is_bcf(outfile) else VcfOutput(outfile)
+        with src, output as out, open(unmap_file, 'wb') as unmap:
+            for line in meta:
+                self.numbers.add(line)
+            if not column_line:
+                raise ValueError(f"{infile}: no #CHROM header line found")
+
+            first = next(records, None)
+            out.write_header(self._header(meta, contig_style(first, meta), infile, chain_file, reference_file)
+                             + column_line)
+            unmap.write((''.join(meta) + column_line).encode())
+
+            if source is not None and jobs > 1 and len(source) > 1:
+                self._lift_scattered(src, infile, source, out, unmap, jobs)
+            else:
+                self._lift_records(_chain([first] if first else [], records), out, unmap)
+        return result
+
+    def _lift_records(self, records, out, unmap):
+        """Lift (fields, line) records into out, failures into unmap"""
+        joiner = MultiallelicJoiner(self.numbers) if self.multiallelics == 'join' else None
+        keep = self.site_filter.keep if self.site_filter else None
+        for fields, line in records:
+            if keep is not None and not keep(fields, line):
+                self.result.filtered += 1
+                continue
+            self._lift_one(fields, line, out, unmap, joiner)
+        self._flush(out, joiner)
+
+    def _lift_one(self, fields, line, out, unmap, joiner):
+        result = self.result
+        lifted, reason = self.lift_record(fields)
+        if reason == OUTSIDE_REGIONS:
+            result.outside += 1
+            return
+        result.total += 1
+        if reason:
+            result.fail(reason)
+            unmap.write(unmap_line(line, reason))
+            return
+        for record in lifted:
+            for done in (joiner.add(record) if joiner else [record]):
+                out.write_record(done)
+                result.written += 1
+
+    def _flush(self, out, joiner):
+        if joiner:
+            for done in joiner.flush():
+                out.write_record(done)
+                self.result.written += 1
+
+    def _lift_scattered(self, vcf, infile, source, out, unmap, jobs):
+        """Lift groups of source intervals in forked workers, then append their
+        outputs in interval order (the output is sorted later, as for one pass)"""
+        groups = scatter_groups(vcf, source, jobs)
+        work_dir = tempfile.mkdtemp(prefix='lift_scatter.', dir=os.path.dirname(os.path.abspath(unmap.name)))
+        _SCATTER.update(lifter=self, infile=infile, output=out, work_dir=work_dir)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=min(jobs, len(groups)), mp_context=context) as pool:
+                shards = list(pool.map(_lift_shard, enumerate(groups)))
+            for shard_result, out_part, unmap_part in shards:
+                self.result.add(shard_result)
+                for part, target in ((out_part, out), (unmap_part, unmap)):
+                    with open(part, 'rb') as f:
+                        while True:
+                            chunk = f.read(1 << 20)
+                            if not chunk:
+                                break
+                            target.write_raw(chunk) if target is out else target.write(chunk)
+        finally:
+            _SCATTER.clear()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _lift_checkpointed(self, infile, outfile, unmap_file, chain_file, reference_file,
+                           checkpoint_dir, checkpoint_mb):
+        """Lift in shards listed in a checkpoint manifest, resuming after the
+        last finished one, then concatenate the shards into the outputs"""
+        result = self.result
+        fingerprint = {
+            'input': file_fingerprint(infile), 'chain': file_fingerprint(chain_file),
+            'reference': file_fingerprint(reference_file), 'output': os.path.basename(outfile),
+            'normalize': self.normalize, 'multiallelics': self.multiallelics,
+            'chr_mapping': self.chr_mapping, 'contig_header': self.contig_header,
+            'site_filter': self.site_filter.describe() if self.site_filter else None,
+            'whitelist': file_fingerprint(self.site_filter.whitelist) if self.site_filter else None,
+        }
+        compressed = is_bcf(outfile) or str(outfile).endswith(('.gz', '.bgz'))
+        limit = int(checkpoint_mb * (1 << 20)) << 16  # compressed bytes, as a virtual offset distance
+
+        with BgzfVcf(infile) as vcf:
+            for line in vcf.meta:
+                self.numbers.add(line)
+            if not vcf.column_line:
+                raise ValueError(f"{infile}: no #CHROM header line found")
+            checkpoint = LiftCheckpoint(checkpoint_dir, fingerprint)
+            for shard in checkpoint.shards:
+                result.add(LiftResult.from_counts(shard['counts']))
+            if checkpoint.shards:
+                logging.info(f"Resuming after {len(checkpoint.shards)} finished shards "
+                             f"({result.total} records) from {checkpoint_dir}")
+            if checkpoint.header is None:
+                first = next(vcf.records_from(vcf.data_offset), None)
+                if first:
+                    first = (bcf_fields(first[0]) if vcf.bcf else split_head(first[0])), first[0]
+                checkpoint.start(self._header(vcf.meta, contig_style(first, vcf.meta), infile, chain_file,
+                                              reference_file) + vcf.column_line)
+            bcf_header = BcfHeader(checkpoint.header) if is_bcf(outfile) else None
+
+            records = vcf.records_from(checkpoint.resume_offset or vcf.data_offset)
+            pending = next(records, None)
+
+            def shard_records(start):
+                # Records up to the next chromosome, or past the size limit
+                # at a new position (so joined multiallelics never straddle shards)
+                nonlocal pending
+                last = None
+                while pending is not None:
+                    record, offset = pending
+                    site = vcf.site(record)
+                    if last is not None and site != last and (site[0] != last[0] or offset - start >= limit):
+                        return
+                    yield (bcf_fields(record), record) if vcf.bcf else (split_head(record), record)
+                    last = site
+                    pending = next(records, None)
+
+            while pending is not None:
+                start = pending[1]
+                number = len(checkpoint.shards)
+                out_path, unmap_path = checkpoint_paths = checkpoint.shard_paths(
+                    number, '.bgzf' if compressed else '.txt')
+                stream = BgzfWriter(out_path, eof=False) if compressed else open(out_path, 'wb')
+                self.result = LiftResult()
+                with (BcfOutput(out_path, bcf_header, stream) if bcf_header else VcfOutput(out_path, stream)) as out, \
+                        open(unmap_path, 'wb') as unmap:
+                    self._lift_records(shard_records(start), out, unmap)
+                end = pending[1] if pending is not None else vcf.tell()
+                checkpoint.commit(start, end, checkpoint_paths, self.result.counts())
+                result.add(self.result)
+            self.result = result
+
+        with open(outfile, 'wb') as out:
+            if compressed:
+                with BgzfWriter(fileobj=out, eof=False) as header:
+                    header.write(header_bytes(bcf_header) if bcf_header else checkpoint.header.encode())
+            else:
+                out.write(checkpoint.header.encode())
+            _append_files(checkpoint.files(0), out)
+            if compressed:
+                out.write(BGZF_EOF)
+        with open(unmap_file, 'wb') as unmap:
+            unmap.write((''.join(vcf.meta) + vcf.column_line).encode())
+            _append_files(checkpoint.files(1), unmap)
+        logging.info(f"Concatenated {len(checkpoint.shards)} shards into {outfile}")
+        checkpoint.clear()
+        return result
+
+    def _header(self, meta, style, infile, chain_file, reference_file):
+        include = None
+        if self.contig_header == 'seen':
+            # Records are not read yet: declare what the chain can reach from
+            # the input's contigs (all chain targets if it declares none)
+            sources = [contig_id(m) for m in meta if m.startswith('##contig=')] or None
+            include = {self.reference.resolve(t) for t in self.chain_index.target_contigs(sources)}
+        contig_lines = ContigHeader(self.reference.entries).lines_all(
+            lambda name: self.output_contig(style, name), include)
+
+        lines = replace_contig_lines(meta, contig_lines)
+        lines.append("##liftOverProgram=lift_vcf.py\n")
+        if chain_file:
+            lines.append(f"##liftOverChainFile={chain_file}\n")
+        lines.append(f"##originalFile={infile}\n")
+        if reference_file:
+            lines.append(f"##targetRefGenome={reference_file}\n")
+        return ''.join(lines)
+
+
+def lift_targets(infile, targets):
+    """Lift infile onto several targets in one read of the input.
+
+    targets are (lifter, outfile, chain_file, reference_file); each gets its
+    own output and .unmap file. Every record is parsed once and lifted by each
+    lifter in turn. Returns the LiftResult of each target.
+    """
+    src, meta, column_line, records = read_vcf(infile)
+    with src, ExitStack() as stack:
+        if not column_line:
+            raise ValueError(f"{infile}: no #CHROM header line found")
+        first = next(records, None)
+        streams = []
+        for lifter, outfile, chain_file, reference_file in targets:
+            lifter.result = LiftResult()
+            lifter.numbers = HeaderNumbers()
+            lifter.target_regions = None
+            for line in meta:
+                lifter.numbers.add(line)
+            out = stack.enter_context(BcfOutput(outfile) if is_bcf(outfile) else VcfOutput(outfile))
+            unmap = stack.enter_context(open(f"{outfile}.unmap", 'wb'))
+            out.write_header(lifter._header(meta, contig_style(first, meta), infile, chain_file, reference_file)
+                             + column_line)
+            unmap.write((''.join(meta) + column_line).encode())
+            joiner = MultiallelicJoiner(lifter.numbers) if lifter.multiallelics == 'join' else None
+            streams.append((lifter, out, unmap, joiner))
+
+        # Every target is built with the same site filter: apply it once
+        site_filter = targets[0][0].site_filter
+        for fields, line in _chain([first] if first else [], records):
+            if site_filter is not None and not site_filter.keep(fields, line):
+                for lifter, _, _, _ in streams:
+                    lifter.result.filtered += 1
+                continue
+            for lifter, out, unmap, joiner in streams:
+                # lift_record rewrites the site fields in place
+                lifter._lift_one(fields[:], line, out, unmap, joiner)
+        for lifter, out, _, joiner in streams:
+            lifter._flush(out, joiner)
+    return [lifter.result for lifter, _, _, _ in streams]
+
+
+def contig_style(first, meta):
+    """Contig naming template for the output: the first record's contig, else
+    the first declared contig"""
+    if first:
+        return first[0][0]
+    return next((m[13:].split(',', 1)[0] for m in meta if m.startswith('##contig=<ID=')), 'chr')
+
+
+def _append_files(paths, out):
+    for path in paths:
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, out, 1 << 20)
+
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
+
+
+def scatter_groups(vcf, regions, jobs):
+    """Split regions into up to jobs RegionSets of consecutive intervals with
+    about the same number of compressed bytes to read"""
+    intervals = list(regions.intervals())
+    weights = [vcf.chunk_bytes(*interval) + 1 for interval in intervals]
+    target = sum(weights) / jobs
+    groups, current, weight = [], [], 0
+    for interval, interval_weight in zip(intervals, weights):
+        current.append(interval)
+        weight += interval_weight
+        if weight >= target * (len(groups) + 1) and len(groups) < jobs - 1:
+            groups.append(RegionSet(current))
+            current = []
+    if current:
+        groups.append(RegionSet(current))
+    return groups
+
+
+def _lift_shard(task):
+    """Scatter worker: lift one group of source intervals into shard files"""
+    number, group = task
+    lifter, output = _SCATTER['lifter'], _SCATTER['output']
+    out_part = os.path.join(_SCATTER['work_dir'], f"shard{number}.out")
+    unmap_part = os.path.join(_SCATTER['work_dir'], f"shard{number}.unmap")
+    lifter.result = LiftResult()
+    src, _, _, records = read_vcf(_SCATTER['infile'], group)
+    with src, output.shard(out_part) as out, open(unmap_part, 'wb') as unmap:
+        lifter._lift_records(records, out, unmap)
+    return lifter.result, out_part, unmap_part
+
+
+def log_result(result, logger=logging):
+    logger.info(f"Total entries: {result.total}")
+    logger.info(f"Failed to map: {result.failed}")
+    for reason, count in sorted(result.reasons.items()):
+        logger.info(f"  Fail({reason}): {count}")
+    logger.info(f"Records written: {result.written}")
+    if result.outside:
+        logger.info(f"Records lifted outside the regions (skipped): {result.outside}")
+    if result.filtered:
+        logger.info(f"Records removed by site filters before lifting: {result.filtered}")
+    if result.normalized:
+        logger.info(f"Records normalized: {result.normalized}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lift a VCF through a chain file in one streaming pass')
+    parser.add_argument('input', help='Input VCF (plain or gzip/BGZF compressed) or BCF')
+    parser.add_argument('-c', '--chain', required=True, help='Chain file (plain or gzipped)')
+    parser.add_argument('-r', '--reference', required=True, help='Target reference FASTA (uncompressed)')
+    parser.add_argument('-o', '--output', required=True, help='Output VCF (.gz for BGZF) or BCF (.bcf)')
+    parser.add_argument('--unmap', help='File for records that failed to lift (default: OUTPUT.unmap)')
+    parser.add_argument('--normalize', action='store_true',
+                        help='Trim and left-align all lifted records against the target reference')
+    parser.add_argument('--multiallelics', choices=MULTIALLELIC_MODES, default='none',
+                        help='Split multiallelic records into biallelic ones, or join them back')
+    parser.add_argument('--chr-mapping', help="Rename output contigs from an 'old<TAB>new' mapping file")
+    parser.add_argument('--contig-header', choices=CONTIG_MODES, default='all',
+                        help='Declare all target contigs from the .fai, or only those reachable from the input')
+    parser.add_argument('--regions',
+                        help="Lift only records landing in these target regions (BED or 'chr1,chr2:1000-2000'); "
+                             "the input must be bgzipped with a .tbi/.csi index")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='With --regions, lift groups of regions in this many parallel processes')
+    parser.add_argument('--checkpoint-dir',
+                        help='Lift a bgzipped input in shards recorded here; a rerun resumes after the last finished one')
+    parser.add_argument('--checkpoint-mb', type=float, default=DEFAULT_CHECKPOINT_MB,
+                        help=f'Compressed input per checkpoint shard (default: {DEFAULT_CHECKPOINT_MB})')
+    parser.add_argument('--target', nargs=3, action='append', metavar=('CHAIN', 'REFERENCE', 'OUTPUT'),
+                        help='Also lift onto this chain and reference into OUTPUT, in the same read of the '
+                             'input (repeatable); each target also gets OUTPUT.log')
+    parser.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+    add_filter_arguments(parser)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, stream=sys.stderr)
+    if args.target and (args.regions or args.checkpoint_dir or args.unmap):
+        parser.error('--target cannot be combined with --regions, --checkpoint-dir or --unmap')
+
+    inputs = [(args.input, 'Input VCF'), (args.chain, 'Chain file'), (args.reference, 'Reference FASTA')]
+    for chain, reference, _ in args.target or []:
+        inputs += [(chain, 'Chain file'), (reference, 'Reference FASTA')]
+    for path, label in inputs:
+        if not os.path.exists(path):
+            logging.error(f"{label} not found: {path}")
+            sys.exit(1)
+
+    trace = StageTrace('lift_vcf', args.trace)
+    try:
+        site_filter = site_filter_from_args(args)
+    except OSError as e:
+        logging.error(f"Cannot read the whitelist: {e}")
+        sys.exit(1)
+    if args.target:
+        lift_all_targets(args, trace, site_filter)
+        return
+    with trace.stage('load_chain') as stage:
+        chain_index = ChainIndex.from_file(args.chain)
+        stage.records = len(chain_index.chains)
+    logging.info(f"Read {len(chain_index.chains)} chains from {args.chain}")
+
+    with FastaReference(args.reference) as reference:
+        chr_mapping = read_chr_mapping(args.chr_mapping) if args.chr_mapping else None
+        lifter = VcfLifter(chain_index, reference, normalize=args.normalize,
+                           multiallelics=args.multiallelics, chr_mapping=chr_mapping,
+                           contig_header=args.contig_header, site_filter=site_filter)
+        regions = read_regions(args.regions) if args.regions else None
+        with trace.stage('lift') as stage:
+            result = lifter.lift_file(args.input, args.output, args.unmap,
+                                      chain_file=args.chain, reference_file=args.reference,
+                                      regions=regions, jobs=args.jobs, checkpoint_dir=args.checkpoint_dir,
+                                      checkpoint_mb=args.checkpoint_mb)
+            stage.records = result.total
+            if site_filter is not None:
+                stage.extra['filtered'] = result.filtered
+            if regions is not None:
+                stage.extra['regions'] = len(regions)
+                stage.extra['outside_regions'] = result.outside
+    log_result(result)
+
+
+def lift_all_targets(args, trace, site_filter=None):
+    """--target: lift the input onto the main and every extra target in one read"""
+    chr_mapping = read_chr_mapping(args.chr_mapping) if args.chr_mapping else None
+    targets = [(args.chain, args.reference, args.output)] + [tuple(target) for target in args.target]
+    with ExitStack() as stack:
+        lifts = []
+        with trace.stage('load_chain') as stage:
+            for chain, reference, output in targets:
+                chain_index = ChainIndex.from_file(chain)
+                logging.info(f"Read {len(chain_index.chains)} chains from {chain}")
+                lifter = VcfLifter(chain_index, stack.enter_context(FastaReference(reference)),
+                                   normalize=args.normalize, multiallelics=args.multiallelics,
+                                   chr_mapping=chr_mapping, contig_header=args.contig_header,
+                                   site_filter=site_filter)
+                lifts.append((lifter, output, chain, reference))
+                stage.records += len(chain_index.chains)
+        with trace.stage('lift') as stage:
+            results = lift_targets(args.input, lifts)
+            stage.records = results[0].total
+            stage.extra['targets'] = len(targets)
+            if site_filter is not None:
+                stage.extra['filtered'] = results[0].filtered
+
+    for (_, _, output), result in zip(targets, results):
+        logging.info(f"Target {output}:")
+        log_result(result)
+        # CrossMap-style log of each target, for the per-sample statistics
+        logger = logging.getLogger(f"lift_vcf.{output}")
+        logger.propagate = False
+        handler = logging.FileHandler(f"{output}.log", mode='w')
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        log_result(result, logger)
+        logger.removeHandler(handler)
+        handler.close()
+
+
+if __name__ == "__main__":
+    profile_main('lift_vcf', main)
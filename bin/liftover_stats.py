@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+
+"""
+Pipeline Liftover Statistics
+============================
+Summary report of a pipeline run (the LIFTOVER_STATS step): reads every
+*.crossmap.log, final <sample>.<build>.vcf.gz and collision report
+(<sample>.<build>.collisions.json) staged in a directory and writes liftover_summary_report.html, liftover_statistics.txt and
+sample_summary.csv. With --trace-dir, the tasks' *.trace.jsonl stage traces
+add a per-stage throughput breakdown; with --profile-dir, the *.profile.json
+summaries of the profiled tasks (--profile_python) add their hot functions.
+
+Usage:
+    liftover-tools stats --source-build hg19 --target-build hg38 \\
+        --chain-file chains/hg19ToHg38.over.chain --target-fasta hg38.fa
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+from generate_stats import generate_hotspot_table, generate_stage_table, load_stage_breakdown
+from profiling import profile_main, read_profile_summaries
+
+HTML_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>chiptimputation-vcf-liftover Summary Report</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 40px; }}
+        .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; }}
+        .summary {{ background-color: #e8f4fd; padding: 15px; margin: 20px 0; border-radius: 5px; }}
+        table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; }}
+        .success {{ color: green; font-weight: bold; }}
+        .warning {{ color: orange; font-weight: bold; }}
+        .error {{ color: red; font-weight: bold; }}
+        .metric {{ display: inline-block; margin: 10px 20px; }}
+        .metric-value {{ font-size: 24px; font-weight: bold; color: #2c3e50; }}
+        .metric-label {{ font-size: 14px; color: #7f8c8d; }}
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>chiptimputation-vcf-liftover Summary Report</h1>
+        <p><strong>Generated:</strong> {timestamp}</p>
+        <p><strong>Source Build:</strong> {source_build}</p>
+        <p><strong>Target Build:</strong> {target_build}</p>
+    </div>
+
+    <div class="summary">
+        <h2>Overall Summary</h2>
+        <div class="metric">
+            <div class="metric-value">{total_samples}</div>
+            <div class="metric-label">Total Samples</div>
+        </div>
+        <div class="metric">
+            <div class="metric-value">{total_input_variants:,}</div>
+            <div class="metric-label">Input Variants</div>
+        </div>
+        <div class="metric">
+            <div class="metric-value">{total_output_variants:,}</div>
+            <div class="metric-label">Output Variants</div>
+        </div>
+        <div class="metric">
+            <div class="metric-value">{avg_success_rate:.1f}%</div>
+            <div class="metric-label">Average Success Rate</div>
+        </div>
+    </div>
+
+    <h2>Sample Details</h2>
+    <table class="stats-table">
+        <thead>
+            <tr>
+                <th>Sample ID</th>
+                <th>Input Variants</th>
+                <th>Output Variants</th>
+                <th>Unmapped</th>
+                <th>Colliding Sites</th>
+                <th>Success Rate</th>
+                <th>File Size (MB)</th>
+                <th>Status</th>
+            </tr>
+        </thead>
+        <tbody>
+            {sample_rows}
+        </tbody>
+    </table>
+
+    <h2>Pipeline Parameters</h2>
+    <table class="stats-table">
+        <tr><td><strong>Source Build</strong></td><td>{source_build}</td></tr>
+        <tr><td><strong>Target Build</strong></td><td>{target_build}</td></tr>
+        <tr><td><strong>Chain File</strong></td><td>{chain_file}</td></tr>
+        <tr><td><strong>Target FASTA</strong></td><td>{target_fasta}</td></tr>
+        <tr><td><strong>Chromosome Mapping</strong></td><td>{chr_mapping}</td></tr>
+        <tr><td><strong>Output Directory</strong></td><td>{outdir}</td></tr>
+    </table>
+{stage_section}
+{profile_section}
+
+</body>
+</html>
+'''
+
+
+def parse_crossmap_log(log_file):
+    """Parse CrossMap log file for statistics"""
+    stats = {
+        'sample_id': '',
+        'input_variants': 0,
+        'output_variants': 0,
+        'unmapped_variants': 0,
+        'success_rate': 0.0,
+        'errors': []
+    }
+
+    try:
+        with open(log_file, 'r') as f:
+            content = f.read()
+
+        # Extract sample ID from filename
+        stats['sample_id'] = Path(log_file).stem.replace('.crossmap', '')
+
+        # Look for variant counts in log
+        input_match = re.search(r'Total entries:\s*(\d+)', content)
+        if input_match:
+            stats['input_variants'] = int(input_match.group(1))
+
+        # Look for failed liftover count (CrossMap format: "Failed to map: 47")
+        failed_match = re.search(r'Failed to map:\s*(\d+)', content)
+        if failed_match:
+            stats['unmapped_variants'] = int(failed_match.group(1))
+
+        # Calculate successful liftover count
+        if stats['input_variants'] > 0 and stats['unmapped_variants'] >= 0:
+            stats['output_variants'] = stats['input_variants'] - stats['unmapped_variants']
+
+        # Calculate success rate
+        if stats['input_variants'] > 0:
+            stats['success_rate'] = (stats['output_variants'] / stats['input_variants']) * 100
+
+        # Look for errors
+        error_patterns = [
+            r'ERROR:.*',
+            r'WARNING:.*',
+            r'Failed.*'
+        ]
+
+        for pattern in error_patterns:
+            errors = re.findall(pattern, content, re.IGNORECASE)
+            stats['errors'].extend(errors)
+
+    except Exception as e:
+        stats['errors'].append(f"Error parsing log file: {e}")
+
+    return stats
+
+
+def count_vcf_variants(vcf_file):
+    """Count variants in VCF file using bcftools"""
+    try:
+        with subprocess.Popen(['bcftools', 'view', '-H', vcf_file], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL) as proc:
+            count = sum(chunk.count(b'\n') for chunk in iter(lambda: proc.stdout.read(1 << 20), b''))
+        if proc.returncode == 0:
+            return count
+    except OSError:
+        pass
+    return 0
+
+
+def read_collision_report(report_file):
+    """Colliding sites and removed records from a collisions.json, or None"""
+    try:
+        with open(report_file) as f:
+            report = json.load(f)
+        return report['colliding_sites'], report['removed_records']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def get_file_size(file_path):
+    """Get file size in MB"""
+    try:
+        size_bytes = os.path.getsize(file_path)
+        return round(size_bytes / (1024 * 1024), 2)
+    except OSError:
+        return 0
+
+
+def generate_html_report(all_stats, summary_stats, params, stage_breakdown=None, profiles=None):
+    """Generate HTML report"""
+
+    # Generate sample rows
+    sample_rows = ""
+    for stats in all_stats:
+        status_class = "success" if stats['success_rate'] > 90 else "warning" if stats['success_rate'] > 70 else "error"
+        status_text = "Good" if stats['success_rate'] > 90 else "Warning" if stats['success_rate'] > 70 else "Poor"
+
+        sample_rows += f'''
+            <tr>
+                <td>{stats['sample_id']}</td>
+                <td>{stats['input_variants']:,}</td>
+                <td>{stats['output_variants']:,}</td>
+                <td>{stats['unmapped_variants']:,}</td>
+                <td>{stats.get('colliding_sites', 'N/A')}</td>
+                <td class="{status_class}">{stats['success_rate']:.1f}%</td>
+                <td>{stats.get('file_size_mb', 'N/A')}</td>
+                <td class="{status_class}">{status_text}</td>
+            </tr>
+        '''
+
+    # Fill template
+    html_content = HTML_TEMPLATE.format(
+        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        source_build=params.source_build,
+        target_build=params.target_build,
+        total_samples=summary_stats['total_samples'],
+        total_input_variants=summary_stats['total_input_variants'],
+        total_output_variants=summary_stats['total_output_variants'],
+        avg_success_rate=summary_stats['avg_success_rate'],
+        sample_rows=sample_rows,
+        chain_file=params.chain_file,
+        target_fasta=params.target_fasta,
+        chr_mapping=params.chr_mapping or "None",
+        outdir=params.outdir,
+        stage_section=generate_stage_table(stage_breakdown),
+        profile_section=generate_hotspot_table(profiles, params.profile_top)
+    )
+
+    with open('liftover_summary_report.html', 'w') as f:
+        f.write(html_content)
+
+
+def collect_stats(directory, target_build):
+    """Statistics of every *.crossmap.log in directory, with its final VCF's count"""
+    all_stats = []
+    names = set(os.listdir(directory))
+    for log_file in sorted(name for name in names if name.endswith('.crossmap.log')):
+        print(f"Processing log file: {log_file}")
+        stats = parse_crossmap_log(os.path.join(directory, log_file))
+
+        # Try to get final VCF file size; multi-target logs are named
+        # <sample>.<build>.crossmap.log, as their VCFs <sample>.<build>.vcf.gz
+        vcf_file = next((name for name in (f"{stats['sample_id']}.{target_build}.vcf.gz",
+                                           f"{stats['sample_id']}.vcf.gz") if name in names), None)
+        if vcf_file:
+            vcf_file = os.path.join(directory, vcf_file)
+            stats['file_size_mb'] = get_file_size(vcf_file)
+            # Double-check variant count from final VCF
+            final_count = count_vcf_variants(vcf_file)
+            if final_count > 0:
+                stats['output_variants'] = final_count
+                if stats['input_variants'] > 0:
+                    stats['success_rate'] = (stats['output_variants'] / stats['input_variants']) * 100
+
+        # Multi-target logs are named <sample>.<build>.crossmap.log already
+        for report_file in (f"{stats['sample_id']}.{target_build}.collisions.json",
+                            f"{stats['sample_id']}.collisions.json"):
+            collisions = read_collision_report(os.path.join(directory, report_file)) if report_file in names else None
+            if collisions:
+                stats['colliding_sites'], stats['collisions_removed'] = collisions
+                break
+
+        all_stats.append(stats)
+    return all_stats
+
+
+def write_text_report(all_stats, summary_stats, params, stage_breakdown=None, profiles=None):
+    with open('liftover_statistics.txt', 'w') as f:
+        f.write("chiptimputation-vcf-liftover Statistics\n")
+        f.write("=" * 50 + "\n")
+        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Source Build: {params.source_build}\n")
+        f.write(f"Target Build: {params.target_build}\n\n")
+
+        f.write("Summary Statistics:\n")
+        f.write(f"  Total Samples: {summary_stats['total_samples']}\n")
+        f.write(f"  Total Input Variants: {summary_stats['total_input_variants']:,}\n")
+        f.write(f"  Total Output Variants: {summary_stats['total_output_variants']:,}\n")
+        f.write(f"  Total Unmapped Variants: {summary_stats['total_unmapped_variants']:,}\n")
+        f.write(f"  Total Colliding Sites: {summary_stats['total_colliding_sites']:,}\n")
+        f.write(f"  Average Success Rate: {summary_stats['avg_success_rate']:.2f}%\n\n")
+
+        f.write("Per-Sample Statistics:\n")
+        for stats in all_stats:
+            f.write(f"  {stats['sample_id']}:\n")
+            f.write(f"    Input Variants: {stats['input_variants']:,}\n")
+            f.write(f"    Output Variants: {stats['output_variants']:,}\n")
+            f.write(f"    Success Rate: {stats['success_rate']:.2f}%\n")
+            if 'colliding_sites' in stats:
+                f.write(f"    Colliding Sites: {stats['colliding_sites']:,} "
+                        f"({stats['collisions_removed']:,} records removed)\n")
+            if stats['errors']:
+                f.write(f"    Errors: {len(stats['errors'])}\n")
+            f.write("\n")
+
+        if stage_breakdown:
+            f.write("Per-Stage Throughput:\n")
+            for row in stage_breakdown:
+                rate = f"{row['records_per_sec']:,.1f} records/s" if row['records_per_sec'] else 'N/A'
+                f.write(f"  {row['tool']}/{row['stage']}: {row['calls']} calls, {row['wall_seconds']:.2f}s wall, "
+                        f"{row['records']:,} records, {rate}, peak RSS {row['peak_rss_mb']:.1f} MB\n")
+            f.write("\n")
+
+        if profiles:
+            f.write("Task Profiles (hottest functions by self time):\n")
+            for profile in profiles:
+                f.write(f"  {profile['tool']} ({profile['mode']}, {profile['wall_seconds']:.2f}s):\n")
+                for func in profile['top_functions'][:params.profile_top]:
+                    f.write(f"    {func['self_seconds']:>10.4f}s  {func['function']} ({func['location']})\n")
+            f.write("\n")
+
+
+def write_csv_summary(all_stats):
+    with open('sample_summary.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['sample_id', 'input_variants', 'output_variants', 'unmapped_variants',
+                        'success_rate', 'file_size_mb', 'colliding_sites', 'collisions_removed', 'errors'])
+
+        for stats in all_stats:
+            writer.writerow([
+                stats['sample_id'],
+                stats['input_variants'],
+                stats['output_variants'],
+                stats['unmapped_variants'],
+                f"{stats['success_rate']:.2f}",
+                stats.get('file_size_mb', ''),
+                stats.get('colliding_sites', ''),
+                stats.get('collisions_removed', ''),
+                len(stats['errors'])
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the liftover logs and final VCFs of a pipeline run')
+    parser.add_argument('--input-dir', default='.',
+                        help='Directory of *.crossmap.log, final VCFs and collision reports (default: .)')
+    parser.add_argument('--source-build', required=True, help='Source genome build')
+    parser.add_argument('--target-build', required=True, help='Target genome build')
+    parser.add_argument('--chain-file', default='', help='Chain file, for the report')
+    parser.add_argument('--target-fasta', default='', help='Target reference, for the report')
+    parser.add_argument('--chr-mapping', default='', help='Chromosome mapping, for the report')
+    parser.add_argument('--outdir', default='', help='Pipeline output directory, for the report')
+    parser.add_argument('--trace-dir', help='Directory of task *.trace.jsonl stage traces to report')
+    parser.add_argument('--profile-dir', help='Directory of task *.profile.json summaries to report')
+    parser.add_argument('--profile-top', type=int, default=10, help='Hot functions to report per task (default: 10)')
+    args = parser.parse_args()
+
+    print("Generating liftover statistics...")
+    all_stats = collect_stats(args.input_dir, args.target_build)
+
+    stage_breakdown = []
+    if args.trace_dir and os.path.isdir(args.trace_dir):
+        trace_entries, stage_breakdown = load_stage_breakdown(args.trace_dir)
+        print(f"Merged {len(trace_entries)} trace entries into {len(stage_breakdown)} stages")
+
+    profiles = []
+    if args.profile_dir and os.path.isdir(args.profile_dir):
+        profiles = read_profile_summaries(args.profile_dir)
+        print(f"Found {len(profiles)} task profiles")
+
+    # Calculate summary statistics
+    summary_stats = {
+        'total_samples': len(all_stats),
+        'total_input_variants': sum(s['input_variants'] for s in all_stats),
+        'total_output_variants': sum(s['output_variants'] for s in all_stats),
+        'total_unmapped_variants': sum(s['unmapped_variants'] for s in all_stats),
+        'total_colliding_sites': sum(s.get('colliding_sites', 0) for s in all_stats),
+        'avg_success_rate': sum(s['success_rate'] for s in all_stats) / len(all_stats) if all_stats else 0
+    }
+
+    generate_html_report(all_stats, summary_stats, args, stage_breakdown, profiles)
+    write_text_report(all_stats, summary_stats, args, stage_breakdown, profiles)
+    write_csv_summary(all_stats)
+
+    print(f"Statistics generated for {len(all_stats)} samples")
+    print(f"Overall success rate: {summary_stats['avg_success_rate']:.2f}%")
+
+
+if __name__ == "__main__":
+    profile_main('liftover_stats', main)
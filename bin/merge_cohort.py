@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+
+"""
+Cohort VCF Merge
+================
+Merge sorted, lifted per-sample VCFs into one multi-sample cohort VCF with a
+streaming heap-based k-way merge keyed by (contig, pos, ref, alt).
+
+Only one record per open input is held in memory, so memory does not grow
+with the number of sites. At most --max-open inputs are read at once: larger
+runs are merged in rounds through temporary BGZF files, each round keeping
+the sample columns in input order.
+
+Contigs are ordered once, before merging: by the target .fai (--fasta) when
+given, else by the inputs' ##contig lines merged into one order, so inputs
+declaring different contig subsets are still read as sorted.
+
+Records present in several inputs take CHROM..FILTER and INFO from the first
+input that has them; samples without the record are written as missing. The
+allele counts AC, AN and AF are the exception: whichever of them the inputs
+carry are recomputed from the merged GT columns (and dropped from records
+without GT), so they describe the cohort rather than one input.
+"""
+
+import argparse
+import gzip
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+
+from bgzf import BgzfWriter
+from chain_utils import normalize_contig
+from fasta import load_fai, read_fai
+from profiling import profile_main
+from stage_trace import StageTrace
+
+MISSING_GT = b'./.'
+MISSING_VALUE = b'.'
+ALLELE_COUNT_KEYS = (b'AC', b'AN', b'AF')
+
+
+class ContigOrder:
+    """Contig ranks shared by all inputs, fixed before any record is read.
+
+    With the target reference contigs, their .fai order ranks first. Other
+    contigs follow the inputs' ##contig lines merged into one order that keeps
+    every header's own order, so inputs declaring different subsets agree.
+    Contigs found only in records rank last, first seen first.
+    """
+
+    def __init__(self, headers=(), reference=()):
+        self.ranks = {}
+        self._reference = {}
+        for name in reference:
+            self._reference.setdefault(_plain(name), len(self._reference))
+        self._next = len(self._reference)
+        declared = [[name for name in names if _plain(name) not in self._reference] for names in headers]
+        for name in merge_contig_lists(declared):
+            self.add(name)
+
+    def add(self, contig):
+        rank = self.ranks.get(contig)
+        if rank is None:
+            rank = self._reference.get(_plain(contig))
+            if rank is None:
+                rank = self._next
+                self._next += 1
+            self.ranks[contig] = rank
+        return rank
+
+
+def _plain(contig):
+    """Contig name as text without 'chr', for matching reference names"""
+    return normalize_contig(contig.decode() if isinstance(contig, bytes) else contig)
+
+
+def merge_contig_lists(lists):
+    """One contig order keeping the order of every list, ties first seen first"""
+    first_seen = {}
+    successors = {}
+    blockers = {}
+    for names in lists:
+        for name in names:
+            if name not in first_seen:
+                first_seen[name] = len(first_seen)
+                blockers[name] = 0
+        for before, after in zip(names, names[1:]):
+            if after not in successors.setdefault(before, set()):
+                successors[before].add(after)
+                blockers[after] += 1
+    ready = [(rank, name) for name, rank in first_seen.items() if blockers[name] == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, name = heapq.heappop(ready)
+        order.append(name)
+        for after in successors.get(name, ()):
+            blockers[after] -= 1
+            if blockers[after] == 0:
+                heapq.heappush(ready, (first_seen[after], after))
+    if len(order) < len(first_seen):
+        raise ValueError("inputs declare their ##contig lines in conflicting orders; "
+                         "give the target reference to order them")
+    return order
+
+
+def header_contigs(path):
+    """IDs of a VCF's ##contig lines, in header order"""
+    opener = gzip.open if path.endswith(('.gz', '.bgz')) else open
+    contigs = []
+    with opener(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'##contig=<ID='):
+                contigs.append(line[13:].split(b',', 1)[0].split(b'>', 1)[0].rstrip(b'\r\n'))
+            elif not line.startswith(b'##'):
+                break
+    return contigs
+
+
+class VcfInput:
+    """Sequential reader over one sorted (optionally BGZF/gzip) VCF"""
+
+    def __init__(self, path, contig_order):
+        self.path = path
+        self.contig_order = contig_order
+        opener = gzip.open if path.endswith(('.gz', '.bgz')) else open
+        self.handle = opener(path, 'rb')
+        self.meta = []
+        self.samples = []
+        self._read_header()
+        self.record = None
+        self.key = None
+
+    def _read_header(self):
+        for line in self.handle:
+            if line.startswith(b'##'):
+                self.meta.append(line.rstrip(b'\r\n'))
+            elif line.startswith(b'#CHROM'):
+                self.samples = line.rstrip(b'\r\n').split(b'\t')[9:]
+                return
+        raise ValueError(f"{self.path}: no #CHROM header line found")
+
+    def advance(self):
+        """Read the next record; returns False at end of file"""
+        previous = self.key
+        for line in self.handle:
+            if not line.strip():
+                continue
+            fields = line.rstrip(b'\r\n').split(b'\t', 9)
+            self.record = fields
+            self.key = (self.contig_order.add(fields[0]), int(fields[1]), fields[3], fields[4])
+            if previous is not None and self.key < previous:
+                raise ValueError(f"{self.path}: records are not sorted at {fields[0].decode()}:{fields[1].decode()}")
+            return True
+        self.record = None
+        self.key = None
+        return False
+
+    def close(self):
+        self.handle.close()
+
+
+def merge_headers(inputs, samples, contig_order):
+    """Union of the inputs' meta lines (first definition wins) plus #CHROM,
+    with the ##contig lines in contig order"""
+    seen = set()
+    lines = []
+    contigs = []
+    for vcf in inputs:
+        for line in vcf.meta:
+            if line.startswith(b'##fileformat=') and lines:
+                continue
+            if line.startswith((b'##INFO=<', b'##FORMAT=<', b'##FILTER=<', b'##contig=<', b'##ALT=<')):
+                key = line.split(b',', 1)[0]
+            else:
+                key = line
+            if key not in seen:
+                seen.add(key)
+                if line.startswith(b'##contig=<'):
+                    if not contigs:
+                        lines.append(None)
+                    contigs.append(line)
+                else:
+                    lines.append(line)
+    if contigs:
+        contigs.sort(key=lambda line: contig_order.add(line[13:].split(b',', 1)[0].split(b'>', 1)[0]))
+        at = lines.index(None)
+        lines[at:at + 1] = contigs
+    if not lines or not lines[0].startswith(b'##fileformat='):
+        lines.insert(0, b'##fileformat=VCFv4.2')
+    columns = [b'#CHROM', b'POS', b'ID', b'REF', b'ALT', b'QUAL', b'FILTER', b'INFO', b'FORMAT']
+    lines.append(b'\t'.join(columns + samples))
+    return b'\n'.join(lines) + b'\n'
+
+
+def missing_cell(format_keys):
+    return MISSING_GT if format_keys and format_keys[0] == b'GT' else MISSING_VALUE
+
+
+def sample_cells(fields, n_samples, format_keys):
+    """Sample columns of a record, reordered to format_keys when they differ"""
+    if n_samples == 0:
+        return []
+    if len(fields) < 10:
+        return [missing_cell(format_keys)] * n_samples
+    cells = fields[9].split(b'\t')
+    own_keys = fields[8].split(b':')
+    if own_keys == format_keys:
+        return cells
+    index = {key: i for i, key in enumerate(own_keys)}
+    reordered = []
+    for cell in cells:
+        values = cell.split(b':')
+        reordered.append(b':'.join(values[index[k]] if k in index and index[k] < len(values)
+                                   else MISSING_VALUE for k in format_keys))
+    return reordered
+
+
+def merge_group(paths, output, level=6, threads=1, contig_order=None):
+    """k-way merge of sorted VCFs into one BGZF VCF; returns records written"""
+    contig_order = contig_order or ContigOrder([header_contigs(path) for path in paths])
+    inputs = [VcfInput(path, contig_order) for path in paths]
+    try:
+        samples = []
+        for vcf in inputs:
+            samples.extend(vcf.samples)
+        duplicates = {s for s, n in _counts(samples).items() if n > 1}
+        if duplicates:
+            names = ', '.join(sorted(d.decode() for d in duplicates)[:5])
+            raise ValueError(f"duplicate sample names across inputs: {names}")
+
+        heap = []
+        for i, vcf in enumerate(inputs):
+            if vcf.advance():
+                heap.append((vcf.key, i))
+        heapq.heapify(heap)
+
+        written = 0
+        with BgzfWriter(output, level=level, threads=threads) as writer:
+            writer.write(merge_headers(inputs, samples, contig_order))
+            while heap:
+                key = heap[0][0]
+                present = []
+                while heap and heap[0][0] == key:
+                    present.append(heapq.heappop(heap)[1])
+                present.sort()
+
+                writer.write(_merge_record(inputs, present))
+                written += 1
+
+                for i in present:
+                    if inputs[i].advance():
+                        heapq.heappush(heap, (inputs[i].key, i))
+        return written
+    finally:
+        for vcf in inputs:
+            vcf.close()
+
+
+def _counts(items):
+    counts = {}
+    for item in items:
+        counts[item] = counts.get(item, 0) + 1
+    return counts
+
+
+def _merge_record(inputs, present):
+    """Build one merged record line from the inputs that carry this site"""
+    base = inputs[present[0]].record
+    site = base[:8]
+    if len(present) > 1 and site[2] == MISSING_VALUE:
+        for i in present[1:]:
+            if inputs[i].record[2] != MISSING_VALUE:
+                site = site[:2] + [inputs[i].record[2]] + site[3:]
+                break
+
+    format_keys = []
+    for i in present:
+        record = inputs[i].record
+        if len(record) > 8:
+            for key in record[8].split(b':'):
+                if key not in format_keys:
+                    format_keys.append(key)
+    if b'GT' in format_keys:
+        format_keys.remove(b'GT')
+        format_keys.insert(0, b'GT')
+
+    columns = []
+    present_set = set(present)
+    for i, vcf in enumerate(inputs):
+        if i in present_set:
+            columns.extend(sample_cells(vcf.record, len(vcf.samples), format_keys))
+        else:
+            columns.extend([missing_cell(format_keys)] * len(vcf.samples))
+
+    counted = {entry.split(b'=', 1)[0] for i in present
+               for entry in inputs[i].record[7].split(b';')} & set(ALLELE_COUNT_KEYS)
+    if counted:
+        site = site[:7] + [_allele_count_info(site[7], counted, site[4],
+                                              columns if format_keys[:1] == [b'GT'] else None)]
+
+    fields = site + [b':'.join(format_keys) if format_keys else MISSING_VALUE] + columns
+    return b'\t'.join(fields) + b'\n'
+
+
+def _allele_count_info(info, keys, alt, columns):
+    """INFO with the given AC/AN/AF keys recomputed from the GT of columns
+    (GT-first sample cells), or dropped when there are no genotypes"""
+    entries = [entry for entry in info.split(b';')
+               if entry.split(b'=', 1)[0] not in ALLELE_COUNT_KEYS and entry != MISSING_VALUE]
+    if columns is not None:
+        n_alt = len(alt.split(b','))
+        ac = [0] * n_alt
+        an = 0
+        for cell in columns:
+            for allele in cell.split(b':', 1)[0].replace(b'|', b'/').split(b'/'):
+                if allele == MISSING_VALUE or not allele.isdigit():
+                    continue
+                an += 1
+                index = int(allele)
+                if 0 < index <= n_alt:
+                    ac[index - 1] += 1
+        if b'AC' in keys:
+            entries.append(b'AC=' + b','.join(b'%d' % n for n in ac))
+        if b'AN' in keys:
+            entries.append(b'AN=%d' % an)
+        if b'AF' in keys and an:
+            entries.append(b'AF=' + b','.join(b'%.6g' % (n / an) for n in ac))
+    return b';'.join(entries) if entries else MISSING_VALUE
+
+
+def merge_files(paths, output, max_open=512, tmp_dir=None, level=6, threads=1, trace=None, reference=()):
+    """Merge any number of inputs with at most max_open files open at once.
+
+    reference is the target's contig names, in .fai order, if known.
+    """
+    if max_open < 2:
+        raise ValueError("max_open must be at least 2")
+    trace = trace or StageTrace('merge_cohort')
+    # One contig order for every round, from all input headers
+    contig_order = ContigOrder([header_contigs(path) for path in paths], reference)
+    work_dir = tempfile.mkdtemp(prefix='merge_cohort_', dir=tmp_dir)
+    try:
+        round_number = 0
+        while len(paths) > max_open:
+            round_number += 1
+            merged = []
+            with trace.stage(f'merge_round_{round_number}') as stage:
+                for start in range(0, len(paths), max_open):
+                    group = paths[start:start + max_open]
+                    if len(group) == 1:
+                        merged.append(group[0])
+                        continue
+                    partial = os.path.join(work_dir, f"round{round_number}_{start // max_open}.vcf.gz")
+                    stage.records += merge_group(group, partial, level=1, threads=threads,
+                                                   contig_order=contig_order)
+                    merged.append(partial)
+            print(f"Merge round {round_number}: {len(paths)} inputs -> {len(merged)} partial files")
+            for path in set(paths) - set(merged):
+                if path.startswith(work_dir):
+                    os.remove(path)
+            paths = merged
+
+        with trace.stage('merge_final') as stage:
+            stage.records = merge_group(paths, output, level=level, threads=threads,
+                                        contig_order=contig_order)
+        return stage.records
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def read_file_list(list_file):
+    with open(list_file) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge sorted per-sample VCFs into one cohort VCF')
+    parser.add_argument('inputs', nargs='*', help='Sorted input VCF files (in output sample order)')
+    parser.add_argument('--file-list', help='File with one input VCF path per line')
+    parser.add_argument('-o', '--output', required=True, help='Output cohort VCF (BGZF compressed)')
+    parser.add_argument('--max-open', type=int, default=512,
+                        help='Maximum inputs read at once; more are merged in rounds (default: 512)')
+    parser.add_argument('--tmp-dir', help='Directory for intermediate merge files')
+    parser.add_argument('--fasta', help='Target FASTA: contigs are ordered as in its .fai (used, or built)')
+    parser.add_argument('--fai', help='Explicit .fai file for the contig order')
+    parser.add_argument('--threads', type=int, default=1, help='BGZF compression threads')
+    parser.add_argument('--level', type=int, default=6, help='BGZF compression level')
+    parser.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+
+    args = parser.parse_args()
+
+    paths = list(args.inputs)
+    if args.file_list:
+        paths.extend(read_file_list(args.file_list))
+    if not paths:
+        parser.error("no input VCF files given")
+
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        sys.exit(f"ERROR: Input VCF not found: {missing[0]}")
+
+    if args.fasta:
+        reference = [entry.name for entry in load_fai(args.fasta, args.fai)]
+    elif args.fai:
+        reference = [entry.name for entry in read_fai(args.fai)]
+    else:
+        reference = []
+
+    print(f"Merging {len(paths)} VCF files into {args.output}")
+    trace = StageTrace('merge_cohort', args.trace)
+    try:
+        records = merge_files(paths, args.output, max_open=args.max_open, tmp_dir=args.tmp_dir,
+                              level=args.level, threads=args.threads, trace=trace, reference=reference)
+    except ValueError as e:
+        sys.exit(f"ERROR: {e}")
+
+    print(f"Cohort VCF written: {args.output} ({records} records)")
+
+
+if __name__ == "__main__":
+    profile_main('merge_cohort', main)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+"""
+Variant Normalization
+=====================
+Allele normalization used by the streaming lift path: reverse-complementing
+alleles lifted onto a reverse-strand chain, trimming and left-aligning indels
+against the target reference, and splitting or joining multiallelic records.
+
+Records are handled as lists of VCF fields (strings), so normalization runs
+in the same pass as the lift without another file round-trip.
+"""
+
+import re
+
+COMPLEMENT = str.maketrans('ACGTNacgtn', 'TGCANtgcan')
+GT_SEPARATOR = re.compile(r'([/|])')
+
+
+def reverse_complement(seq):
+    return seq.translate(COMPLEMENT)[::-1]
+
+
+def is_symbolic(allele):
+    """True for alleles that are not plain sequence (<DEL>, *, ., breakends)"""
+    return (not allele or allele in ('*', '.') or allele.startswith('<')
+            or '[' in allele or ']' in allele)
+
+
+def normalize_alleles(pos, alleles, fetch):
+    """Trim and left-align alleles (REF first) against the reference.
+
+    pos is 1-based; fetch(start, end) returns the 0-based half-open reference
+    sequence. Returns the new (pos, alleles); symbolic records are unchanged.
+    """
+    if any(is_symbolic(a) for a in alleles) or len(set(alleles)) < 2:
+        return pos, alleles
+
+    alleles = list(alleles)
+    while True:
+        if any(not a for a in alleles):
+            if pos <= 1:
+                break
+            pos -= 1
+            base = fetch(pos - 1, pos)
+            if not base:
+                break
+            alleles = [base + a for a in alleles]
+        elif len({a[-1] for a in alleles}) == 1:
+            alleles = [a[:-1] for a in alleles]
+        else:
+            break
+
+    while all(len(a) >= 2 for a in alleles) and len({a[0] for a in alleles}) == 1:
+        alleles = [a[1:] for a in alleles]
+        pos += 1
+
+    return pos, alleles
+
+
+class HeaderNumbers:
+    """INFO/FORMAT Number= declarations, needed to split per-allele values"""
+
+    DEFINITION = re.compile(r'^##(INFO|FORMAT)=<ID=([^,>]+).*?Number=([^,>]+)')
+
+    def __init__(self):
+        self.info = {}
+        self.format = {}
+
+    def add(self, line):
+        match = self.DEFINITION.match(line)
+        if match:
+            target = self.info if match.group(1) == 'INFO' else self.format
+            target[match.group(2)] = match.group(3)
+
+
+def genotype_index(a, b):
+    """Position of the unordered diploid genotype a/b in a Number=G list"""
+    a, b = min(a, b), max(a, b)
+    return b * (b + 1) // 2 + a
+
+
+def _pick_values(values, number, k, ploidy=2):
+    """Values of a per-allele field for the biallelic record REF/ALT k"""
+    if number == 'A':
+        return [values[k - 1]] if k - 1 < len(values) else ['.']
+    if number == 'R':
+        return [values[i] if i < len(values) else '.' for i in (0, k)]
+    if number == 'G':
+        indices = (0, k) if ploidy == 1 else (0, genotype_index(0, k), genotype_index(k, k))
+        return [values[i] if i < len(values) else '.' for i in indices]
+    return values
+
+
+def _split_genotype(gt, k):
+    parts = GT_SEPARATOR.split(gt)
+    for i in range(0, len(parts), 2):
+        allele = parts[i]
+        if allele not in ('.', ''):
+            parts[i] = '1' if int(allele) == k else '0'
+    return ''.join(parts), (len(parts) + 1) // 2
+
+
+def expand_record(fields):
+    """Full text fields of a record whose columns after ALT are still a raw
+    bytes tail (see lift_vcf.split_head) or a BCF record; other records are
+    returned as-is"""
+    if len(fields) == 6 and not isinstance(fields[5], str):
+        tail = fields[5]
+        text = tail.tail_text() if hasattr(tail, 'tail_text') else bytes(tail).decode()
+        return fields[:5] + text.split('\t')
+    return fields
+
+
+def split_multiallelic(fields, numbers):
+    """Split one record into biallelic records (other ALTs become REF)"""
+    alts = fields[4].split(',')
+    if len(alts) < 2:
+        return [fields]
+
+    info_items = [] if fields[7] == '.' else fields[7].split(';')
+    format_keys = fields[8].split(':') if len(fields) > 8 else []
+    samples = [cell.split(':') for cell in fields[9:]]
+
+    records = []
+    for k, alt in enumerate(alts, 1):
+        info = []
+        for item in info_items:
+            key, eq, value = item.partition('=')
+            number = numbers.info.get(key)
+            if eq and number in ('A', 'R', 'G'):
+                value = ','.join(_pick_values(value.split(','), number, k))
+            info.append(f"{key}={value}" if eq else key)
+
+        cells = []
+        for values in samples:
+            ploidy = 2
+            new_values = []
+            for i, key in enumerate(format_keys):
+                value = values[i] if i < len(values) else None
+                if value is None:
+                    break
+                if key == 'GT':
+                    value, ploidy = _split_genotype(value, k)
+                else:
+                    number = numbers.format.get(key)
+                    if number in ('A', 'R', 'G') and value != '.':
+                        value = ','.join(_pick_values(value.split(','), number, k, ploidy))
+                new_values.append(value)
+            cells.append(':'.join(new_values))
+
+        record = fields[:4] + [alt, fields[5], fields[6], ';'.join(info) if info else '.']
+        if format_keys:
+            record += [fields[8]] + cells
+        records.append(record)
+    return records
+
+
+class MultiallelicJoiner:
+    """Join consecutive biallelic records at the same CHROM/POS/REF.
+
+    GT and Number=A/R fields are combined; Number=G fields are set missing
+    and other fields are taken from the first record.
+    """
+
+    def __init__(self, numbers):
+        self.numbers = numbers
+        self._pending = []
+
+    def add(self, fields):
+        """Queue a record; returns records that are now complete"""
+        if self._pending:
+            first = self._pending[0]
+            if fields[0] == first[0] and fields[1] == first[1] and fields[3] == first[3]:
+                self._pending.append(fields)
+                return []
+        done = self.flush()
+        self._pending = [fields]
+        return done
+
+    def flush(self):
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, []
+        if len(pending) == 1:
+            return pending
+        return [self._join([expand_record(record) for record in pending])]
+
+    def _join(self, records):
+        alts = []
+        allele_maps = []
+        for record in records:
+            mapping = {0: 0}
+            for i, alt in enumerate(record[4].split(','), 1):
+                if alt not in alts:
+                    alts.append(alt)
+                mapping[i] = alts.index(alt) + 1
+            allele_maps.append(mapping)
+
+        first = records[0]
+        ids = [r[2] for r in records if r[2] != '.']
+        info = self._join_info(records, allele_maps, len(alts))
+        joined = [first[0], first[1], ';'.join(dict.fromkeys(ids)) if ids else '.',
+                  first[3], ','.join(alts), first[5], first[6], info]
+
+        if len(first) > 8:
+            format_keys = first[8].split(':')
+            joined.append(first[8])
+            per_record = [{k: i for i, k in enumerate(r[8].split(':'))} if len(r) > 8 else {} for r in records]
+            for s in range(9, len(first)):
+                cells = [r[s].split(':') if s < len(r) else [] for r in records]
+                values = []
+                for i, key in enumerate(format_keys):
+                    column = [c[per_record[j][key]] if key in per_record[j] and per_record[j][key] < len(c)
+                              else '.' for j, c in enumerate(cells)]
+                    if key == 'GT':
+                        values.append(self._join_genotypes(column, allele_maps))
+                    else:
+                        values.append(self._join_values(column, self.numbers.format.get(key),
+                                                        allele_maps, len(alts)))
+                joined.append(':'.join(values))
+        return joined
+
+    def _join_info(self, records, allele_maps, n_alts):
+        keys = []
+        values = {}
+        for j, record in enumerate(records):
+            if record[7] == '.':
+                continue
+            for item in record[7].split(';'):
+                key, eq, value = item.partition('=')
+                if key not in values:
+                    keys.append(key)
+                    values[key] = [None] * len(records)
+                values[key][j] = value if eq else True
+
+        items = []
+        for key in keys:
+            column = values[key]
+            if all(v is True for v in column if v is not None):
+                items.append(key)
+                continue
+            column = [v if isinstance(v, str) else '.' for v in column]
+            items.append(f"{key}={self._join_values(column, self.numbers.info.get(key), allele_maps, n_alts)}")
+        return ';'.join(items) if items else '.'
+
+    @staticmethod
+    def _join_values(column, number, allele_maps, n_alts):
+        if number == 'A':
+            joined = ['.'] * n_alts
+            for value, mapping in zip(column, allele_maps):
+                for i, v in enumerate(value.split(','), 1):
+                    if i in mapping and v != '.':
+                        joined[mapping[i] - 1] = v
+            return ','.join(joined)
+        if number == 'R':
+            joined = ['.'] * (n_alts + 1)
+            for value, mapping in zip(column, allele_maps):
+                for i, v in enumerate(value.split(',')):
+                    if i in mapping and v != '.' and joined[mapping[i]] == '.':
+                        joined[mapping[i]] = v
+            return ','.join(joined)
+        if number == 'G':
+            return '.'
+        return next((v for v in column if v != '.'), '.')
+
+    @staticmethod
+    def _join_genotypes(column, allele_maps):
+        slots = None
+        separator = '/'
+        for gt, mapping in zip(column, allele_maps):
+            parts = GT_SEPARATOR.split(gt)
+            alleles = parts[0::2]
+            if len(parts) > 1 and slots is None:
+                separator = parts[1]
+            if slots is None:
+                slots = ['.'] * len(alleles)
+            for i, allele in enumerate(alleles[:len(slots)]):
+                if allele in ('.', ''):
+                    continue
+                value = mapping.get(int(allele), 0)
+                if slots[i] in ('.', '0'):
+                    slots[i] = str(value)
+        return separator.join(slots) if slots else '.'
@@ -7,6 +7,10 @@ import glob
 import argparse
 from pathlib import Path
 
+from profiling import profile_main
+from size_estimate import DEFAULT_SAMPLE_BLOCKS, ESTIMATE_FIELDS, estimate_size
+from stage_trace import StageTrace
+
 def is_vcf_file(filename):
     """Check if file is a VCF file"""
     return filename.lower().endswith(('.vcf', '.vcf.gz', '.bcf'))
@@ -123,16 +127,38 @@ def process_input(input_param):
     
     return processed_samples
 
+def add_size_estimates(samples, blocks=DEFAULT_SAMPLE_BLOCKS):
+    """Add size estimates and resource requests (see size_estimate.py) to each sample"""
+    for sample in samples:
+        try:
+            estimate = estimate_size(sample['vcf_path'], blocks)
+        except (OSError, ValueError, EOFError) as e:
+            # Unreadable as BGZF/BCF: leave the columns empty (fixed resources)
+            print(f"WARNING: Could not estimate size of {sample['vcf_path']}: {e}")
+            continue
+        if estimate is None:
+            print(f"WARNING: {sample['vcf_path']} is not BGZF-compressed, using fixed resources")
+            continue
+        sample.update(estimate)
+    return samples
+
 def write_output_csv(samples, output_file):
     """Write processed samples to CSV"""
+    fieldnames = ['sample_id', 'vcf_path']
+    if any('compressed_bytes' in sample for sample in samples):
+        fieldnames += list(ESTIMATE_FIELDS)
     with open(output_file, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['sample_id', 'vcf_path'])
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(samples)
     
     print(f"Successfully processed {len(samples)} samples:")
     for sample in samples:
-        print(f"  - {sample['sample_id']}: {sample['vcf_path']}")
+        size = ''
+        if 'est_records' in sample:
+            size = (f" (~{sample['est_records']:,} records x {sample['samples']} samples, "
+                    f"{sample['cpus']} cpus, sort buffer {sample['sort_mb']} MB)")
+        print(f"  - {sample['sample_id']}: {sample['vcf_path']}{size}")
 
 def main():
     parser = argparse.ArgumentParser(description='Process various input formats for VCF liftover pipeline')
@@ -141,9 +167,17 @@ def main():
                        help='Output CSV file (default: processed_samples.csv)')
     parser.add_argument('--launch-dir', default=None,
                        help='Launch directory for resolving relative paths')
+    parser.add_argument('--no-estimates', action='store_true',
+                       help='Do not sample inputs for size estimates and resource requests')
+    parser.add_argument('--estimate-blocks', type=int, default=DEFAULT_SAMPLE_BLOCKS,
+                       help=f'BGZF blocks sampled per input for size estimates (default: {DEFAULT_SAMPLE_BLOCKS})')
+    parser.add_argument('--trace', default=None,
+                       help='Append per-phase timing/RSS trace (JSON lines) to this file')
 
     args = parser.parse_args()
 
+    trace = StageTrace('process_input', args.trace)
+
     # Set launch directory for resolving relative paths
     if args.launch_dir:
         os.chdir(args.launch_dir)
@@ -151,12 +185,20 @@ def main():
         os.chdir(os.environ['NXF_LAUNCH_DIR'])
     
     try:
-        samples = process_input(args.input_param)
-        write_output_csv(samples, args.output)
+        with trace.stage('resolve_inputs') as phase:
+            samples = process_input(args.input_param)
+            phase.records = len(samples)
+        if not args.no_estimates:
+            with trace.stage('estimate_sizes') as phase:
+                add_size_estimates(samples, args.estimate_blocks)
+                phase.records = len(samples)
+        with trace.stage('write_csv') as phase:
+            write_output_csv(samples, args.output)
+            phase.records = len(samples)
         print("Input processing completed successfully")
     except Exception as e:
         print(f"ERROR: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    profile_main('process_input', main)
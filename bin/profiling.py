@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""
+Profiling Hooks
+===============
+Optional cProfile/pyinstrument profiling for the bin/ entry points.
+
+Profiling is switched on per run with a --profile[=MODE] flag or the
+LIFTOVER_PROFILE environment variable (cprofile, pyinstrument, or 1/true for
+cprofile). Artifacts are written to LIFTOVER_PROFILE_DIR, or the current
+directory (the task work directory under Nextflow):
+
+  <tool>.<pid>.prof           cProfile stats (cprofile mode)
+  <tool>.<pid>.html           pyinstrument report (pyinstrument mode)
+  <tool>.<pid>.profile.json   top-N hot functions, read by liftover_stats.py and
+                              generate_stats.py
+"""
+
+import json
+import os
+import sys
+import time
+
+PROFILE_ENV = 'LIFTOVER_PROFILE'
+PROFILE_DIR_ENV = 'LIFTOVER_PROFILE_DIR'
+PROFILE_TOP_N = 25
+
+
+def resolve_mode(value):
+    """Map a flag/environment value to 'cprofile', 'pyinstrument' or None"""
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    if value in ('1', 'true', 'yes', 'on', 'cprofile'):
+        return 'cprofile'
+    if value == 'pyinstrument':
+        return 'pyinstrument'
+    print(f"Warning: unknown profiling mode '{value}', using cprofile")
+    return 'cprofile'
+
+
+def pop_profile_flag(argv):
+    """Remove --profile / --profile=MODE from argv and return its value"""
+    for i, arg in enumerate(argv):
+        if arg == '--profile':
+            del argv[i]
+            return 'cprofile'
+        if arg.startswith('--profile='):
+            del argv[i]
+            return arg.split('=', 1)[1]
+    return None
+
+
+def cprofile_top_functions(profiler, top_n):
+    """Top functions by self time from a cProfile.Profile"""
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': name,
+            'location': f"{os.path.basename(filename)}:{line}",
+            'calls': ncalls,
+            'self_seconds': round(tottime, 6),
+            'cumulative_seconds': round(cumtime, 6),
+        })
+    rows.sort(key=lambda r: r['self_seconds'], reverse=True)
+    return rows[:top_n]
+
+
+def pyinstrument_top_functions(session, top_n):
+    """Top functions by self time from a pyinstrument session"""
+    totals = {}
+    stack = [session.root_frame()] if session.root_frame() else []
+    while stack:
+        frame = stack.pop()
+        stack.extend(frame.children)
+        if getattr(frame, 'is_synthetic', False):
+            continue
+        key = (frame.function, f"{getattr(frame, 'file_path_short', '')}:{frame.line_no}")
+        row = totals.setdefault(key, {
+            'function': key[0],
+            'location': key[1],
+            'calls': None,
+            'self_seconds': 0.0,
+            'cumulative_seconds': 0.0,
+        })
+        row['self_seconds'] += getattr(frame, 'total_self_time', 0.0)
+        row['cumulative_seconds'] += frame.time
+
+    rows = sorted(totals.values(), key=lambda r: r['self_seconds'], reverse=True)[:top_n]
+    for row in rows:
+        row['self_seconds'] = round(row['self_seconds'], 6)
+        row['cumulative_seconds'] = round(row['cumulative_seconds'], 6)
+    return rows
+
+
+def profile_main(tool, main, argv=None):
+    """Run an entry point's main(), profiled when requested"""
+    argv = sys.argv if argv is None else argv
+    mode = resolve_mode(pop_profile_flag(argv) or os.environ.get(PROFILE_ENV))
+    if mode is None:
+        return main()
+
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Warning: pyinstrument not available, falling back to cProfile")
+            mode = 'cprofile'
+
+    output_dir = os.path.abspath(os.environ.get(PROFILE_DIR_ENV) or os.getcwd())
+    prefix = os.path.join(output_dir, f"{tool}.{os.getpid()}")
+
+    if mode == 'pyinstrument':
+        profiler = Profiler()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    start = time.perf_counter()
+    if mode == 'cprofile':
+        profiler.enable()
+    else:
+        profiler.start()
+    try:
+        return main()
+    finally:
+        if mode == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        wall = time.perf_counter() - start
+        _write_artifacts(tool, mode, profiler, prefix, wall, argv)
+
+
+def _write_artifacts(tool, mode, profiler, prefix, wall, argv):
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    if mode == 'cprofile':
+        profiler.dump_stats(f"{prefix}.prof")
+        top = cprofile_top_functions(profiler, PROFILE_TOP_N)
+    else:
+        with open(f"{prefix}.html", 'w') as f:
+            f.write(profiler.output_html())
+        top = pyinstrument_top_functions(profiler.last_session, PROFILE_TOP_N)
+
+    summary = {
+        'tool': tool,
+        'mode': mode,
+        'argv': argv[1:],
+        'cwd': os.getcwd(),
+        'wall_seconds': round(wall, 3),
+        'top_functions': top,
+    }
+    with open(f"{prefix}.profile.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"Profile written to: {prefix}.profile.json", file=sys.stderr)
+
+
+def read_profile_summaries(profile_dir):
+    """Load every *.profile.json summary under a directory (Nextflow stages
+    each task's artifacts into a numbered subdirectory)"""
+    summaries = []
+    for root, dirs, files in os.walk(profile_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.profile.json'):
+                continue
+            try:
+                with open(os.path.join(root, name)) as f:
+                    summary = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            summary['artifact'] = name
+            summaries.append(summary)
+    return summaries
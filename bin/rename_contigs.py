@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Contig Renaming
+===============
+Rename VCF contigs (CHROM and ##contig header lines) from a two-column
+mapping file such as assets/chr_mapping.txt, in one streaming pass.
+
+Records are never parsed: CHROM is the bytes before the first tab, so a line
+is renamed by swapping that slice. Sorted input arrives in long runs of one
+contig, and whole blocks from a single contig are renamed with one
+bytes.replace over the block, which keeps throughput close to plain BGZF
+decompression and compression.
+"""
+
+import argparse
+import gzip
+import os
+import sys
+
+from bgzf import BgzfWriter
+from profiling import profile_main
+from stage_trace import StageTrace
+
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def read_chr_mapping(mapping_file):
+    """Read 'old<TAB>new' (or whitespace separated) lines into a dict"""
+    mapping = {}
+    with open(mapping_file) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and not line.startswith('#'):
+                mapping[sys.intern(parts[0])] = sys.intern(parts[1])
+    return mapping
+
+
+class ContigRenamer:
+    """Interned contig table: each source name is looked up once, then reused"""
+
+    def __init__(self, mapping):
+        self.contig_ids = {}
+        self.new_names = []
+        for old, new in mapping.items():
+            self.contig_ids[old.encode()] = len(self.new_names)
+            self.new_names.append(new.encode())
+        self.renamed = 0
+
+    @classmethod
+    def from_file(cls, mapping_file):
+        return cls(read_chr_mapping(mapping_file))
+
+    def rename(self, contig):
+        """New name for a contig (bytes), or the contig itself if unmapped"""
+        contig_id = self.contig_ids.get(contig)
+        return contig if contig_id is None else self.new_names[contig_id]
+
+    def rename_header_line(self, line):
+        """Rename the ID of a ##contig header line (bytes); other lines unchanged"""
+        if not line.startswith(b'##contig=<ID='):
+            return line
+        end = len(line)
+        for separator in (b',', b'>'):
+            found = line.find(separator, 13)
+            if found != -1:
+                end = min(end, found)
+        return b'##contig=<ID=' + self.rename(line[13:end]) + line[end:]
+
+    def rename_line(self, line):
+        tab = line.find(b'\t')
+        contig_id = self.contig_ids.get(line[:tab]) if tab > 0 else None
+        if contig_id is None:
+            return line
+        return self.new_names[contig_id] + line[tab:]
+
+    def rename_block(self, block):
+        """Rename a block of complete data lines (bytes ending in a newline)"""
+        first_tab = block.find(b'\t')
+        first = block[:first_tab]
+        lines = block.count(b'\n')
+        if first_tab > 0 and block.count(b'\n' + first + b'\t') + 1 == lines:
+            # Sorted input: every line in the block belongs to one contig
+            contig_id = self.contig_ids.get(first)
+            if contig_id is None:
+                return block
+            new = self.new_names[contig_id]
+            self.renamed += lines
+            return new + block[first_tab:].replace(b'\n' + first + b'\t', b'\n' + new + b'\t')
+        lines = block.split(b'\n')
+        for i, line in enumerate(lines):
+            if line:
+                renamed = self.rename_line(line)
+                if renamed is not line:
+                    lines[i] = renamed
+                    self.renamed += 1
+        return b'\n'.join(lines)
+
+    def rename_chunks(self, chunks):
+        """Renamed chunks of complete lines for chunks of data lines"""
+        carry = b''
+        for chunk in chunks:
+            chunk = carry + chunk
+            cut = chunk.rfind(b'\n') + 1
+            carry = chunk[cut:]
+            if cut:
+                yield self.rename_block(chunk[:cut])
+        if carry:
+            yield self.rename_block(carry + b'\n')
+
+
+def _open_input(path):
+    return gzip.open(path, 'rb') if str(path).endswith(('.gz', '.bgz')) else open(path, 'rb')
+
+
+def _open_output(path, threads):
+    return BgzfWriter(path, threads=threads) if str(path).endswith(('.gz', '.bgz')) else open(path, 'wb')
+
+
+def rename_vcf(input_file, output_file, renamer, threads=1, block_size=READ_BLOCK_SIZE):
+    """Rename contigs of a VCF file; returns the number of data bytes processed"""
+    processed = 0
+    with _open_input(input_file) as src, _open_output(output_file, threads) as out:
+        line = b''
+        for line in src:
+            if not line.startswith(b'#'):
+                break
+            out.write(renamer.rename_header_line(line))
+            line = b''
+
+        carry = line
+        while True:
+            chunk = src.read(block_size)
+            if not chunk:
+                break
+            chunk = carry + chunk
+            cut = chunk.rfind(b'\n') + 1
+            if cut == 0:
+                carry = chunk
+                continue
+            carry = chunk[cut:]
+            out.write(renamer.rename_block(chunk[:cut]))
+            processed += cut
+        if carry:
+            out.write(renamer.rename_block(carry if carry.endswith(b'\n') else carry + b'\n'))
+            processed += len(carry)
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rename VCF contigs from a chromosome mapping file')
+    parser.add_argument('input', help='Input VCF (plain or gzip/BGZF compressed)')
+    parser.add_argument('mapping', help="Mapping file with 'old<TAB>new' lines")
+    parser.add_argument('-o', '--output', required=True, help='Output VCF (.gz for BGZF)')
+    parser.add_argument('--threads', type=int, default=1, help='BGZF compression threads')
+    parser.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+
+    args = parser.parse_args()
+
+    for path in (args.input, args.mapping):
+        if not os.path.exists(path):
+            sys.exit(f"ERROR: File not found: {path}")
+
+    renamer = ContigRenamer.from_file(args.mapping)
+    print(f"Loaded {len(renamer.new_names)} contig mappings from {args.mapping}")
+
+    trace = StageTrace('rename_contigs', args.trace)
+    with trace.stage('rename') as stage:
+        rename_vcf(args.input, args.output, renamer, threads=args.threads)
+        stage.records = renamer.renamed
+
+    print(f"Renamed {renamer.renamed} records: {args.output}")
+
+
+if __name__ == "__main__":
+    profile_main('rename_contigs', main)
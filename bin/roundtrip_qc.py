@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+"""
+Round-Trip Lift-Back QC
+=======================
+Check that lifted sites lift back to where they started. A reservoir sample
+of the lifted records is mapped back through the reverse chain (for
+hg19ToHg38, hg38ToHg19) and each mapped-back site is looked up in the
+original input:
+
+- concordant:         an input record at the mapped-back position with the
+                      same ALT alleles (REF comes from the target reference
+                      and may differ; indels: at the position, within the
+                      length of their alleles, since they may be re-anchored)
+- allele_mismatch:    input records at the position, none with those ALTs
+- position_mismatch:  no input record at the mapped-back position
+- unmapped:           the reverse chain does not map the site
+- multiple_hits:      the reverse chain maps it to several places
+
+Cost is bounded by the sample size: the lifted file is scanned once, with
+skipped records only counted (reservoir sampling, algorithm L), the sample is
+mapped back with vectorized block lookups (numpy; per record without it), and
+the input is read only around the mapped-back sites when it has a .tbi/.csi.
+
+Usage:
+    roundtrip_qc.py sample1.hg38.vcf.gz sample1.vcf.gz --reverse-chain chains/hg38ToHg19.over.chain.gz \\
+        --sample-size 10000 --output sample1.roundtrip.json
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import sys
+from collections import deque
+from itertools import count, dropwhile, islice
+
+from bcf import BcfReader, is_bcf
+from chain_utils import ChainIndex, normalize_contig
+from lift_vcf import bcf_fields, open_vcf, split_head
+from normalize import is_symbolic, reverse_complement
+from profiling import profile_main
+from stage_trace import StageTrace
+from vcf_index import IndexedVcf, RegionSet, find_index
+
+# Optional vectorized mapping
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_SAMPLE_SIZE = 10000
+STATUSES = ('concordant', 'allele_mismatch', 'position_mismatch', 'unmapped', 'multiple_hits')
+
+
+def reservoir_sample(items, size, rng):
+    """(up to size items chosen uniformly, number of items seen). Algorithm L:
+    after the reservoir fills, only the skip lengths are drawn at random and
+    skipped items are consumed without Python-level work."""
+    numbered = zip(count(1), items)
+    reservoir = list(islice(numbered, size))
+    seen = reservoir[-1][0] if reservoir else 0
+    if len(reservoir) < size:
+        return [item for _, item in reservoir], seen
+
+    uniform = lambda: 1.0 - rng.random()  # (0, 1]
+    weight = math.exp(math.log(uniform()) / size)
+    while True:
+        skip = int(math.log(uniform()) / math.log(1 - weight)) if weight < 1 else 0
+        last = deque(islice(numbered, skip + 1), maxlen=1)
+        if not last or last[0][0] - seen <= skip:
+            # The input ended within the skip
+            seen = last[0][0] if last else seen
+            break
+        seen = last[0][0]
+        reservoir[rng.randrange(size)] = last[0]
+        weight *= math.exp(math.log(uniform()) / size)
+    return [item for _, item in reservoir], seen
+
+
+def lifted_items(path):
+    """(reader, records) of a VCF/BCF, records left undecoded until sampled"""
+    if is_bcf(path):
+        reader = BcfReader(path)
+        return reader, iter(reader)
+    src = open_vcf(path)
+    return src, (line for line in dropwhile(lambda line: line.startswith(b'#'), src) if line.strip())
+
+
+def site_of(item):
+    """CHROM, 0-based start, REF, ALT list of a sampled line or BCF record"""
+    fields = bcf_fields(item) if not isinstance(item, bytes) else split_head(item)
+    return fields[0], int(fields[1]) - 1, fields[3], fields[4].split(',')
+
+
+def map_back(chain_index, sites):
+    """(contig, start, strand) or a status for each (contig, start, end) site,
+    through the reverse chain. Sites of one contig are looked up together with
+    numpy when available; overlapping blocks fall back to map_interval()."""
+    results = [None] * len(sites)
+    by_contig = {}
+    for i, (contig, _, _) in enumerate(sites):
+        by_contig.setdefault(contig, []).append(i)
+
+    chains = chain_index.chains
+    for contig, numbers in by_contig.items():
+        arrays = chain_index.block_arrays(contig)
+        if arrays is None:
+            for i in numbers:
+                results[i] = 'unmapped'
+            continue
+        if not NUMPY_AVAILABLE:
+            for i in numbers:
+                results[i] = _map_one(chain_index, *sites[i])
+            continue
+
+        starts, ends, targets, chain_numbers, max_ends = (np.asarray(a, dtype=np.int64) for a in arrays)
+        site_starts = np.array([sites[i][1] for i in numbers], dtype=np.int64)
+        site_ends = np.array([sites[i][2] for i in numbers], dtype=np.int64)
+        block = np.searchsorted(starts, site_starts, side='right') - 1
+        valid = block >= 0
+        block = np.where(valid, block, 0)
+        hit = valid & (ends[block] >= site_ends)
+        # An earlier block may also reach the site: resolve those one by one
+        ambiguous = valid & (block > 0) & (max_ends[np.maximum(block - 1, 0)] > site_starts)
+        offsets = targets[block] + (site_starts - starts[block])
+
+        for j, i in enumerate(numbers):
+            if ambiguous[j]:
+                results[i] = _map_one(chain_index, *sites[i])
+            elif not hit[j]:
+                results[i] = 'unmapped'
+            else:
+                chain = chains[int(chain_numbers[block[j]])]
+                length = int(site_ends[j] - site_starts[j])
+                offset = int(offsets[j])
+                if chain.target_strand == '-':
+                    results[i] = (chain.target_name, chain.target_size - (offset + length), '-')
+                else:
+                    results[i] = (chain.target_name, offset, '+')
+    return results
+
+
+def _map_one(chain_index, contig, start, end):
+    hits = chain_index.map_interval(contig, start, end)
+    if not hits:
+        return 'unmapped'
+    if len(hits) > 1:
+        return 'multiple_hits'
+    target, target_start, _, strand = hits[0]
+    return target, target_start, strand
+
+
+def read_original(path, windows):
+    """Input records near the mapped-back sites: {contig key: {start: [(ref, alts)]}}.
+    windows are (contig, start, end) intervals; an indexed input is read only
+    there, otherwise it is scanned once."""
+    wanted = {}
+    for contig, start, end in windows:
+        wanted.setdefault(normalize_contig(contig), set()).update(range(start, end))
+    records = {}
+
+    def add(contig, position, ref, alt):
+        key = normalize_contig(contig)
+        if position in wanted.get(key, ()):
+            records.setdefault(key, {}).setdefault(position, []).append((ref, alt.split(',')))
+
+    if find_index(path) and windows:
+        with IndexedVcf(path) as vcf:
+            for record in vcf.fetch(RegionSet(windows)):
+                contig, position, ref, alts = site_of(record)
+                add(contig, position, ref, ','.join(alts))
+        return records
+
+    if is_bcf(path):
+        with BcfReader(path) as reader:
+            for record in reader:
+                contig, position, ref, alts = site_of(record)
+                add(contig, position, ref, ','.join(alts))
+        return records
+
+    contigs = {key.encode() for key in wanted} | {b'chr' + key.encode() for key in wanted}
+    with open_vcf(path) as src:
+        for line in src:
+            if line.startswith(b'#'):
+                continue
+            fields = line.split(b'\t', 5)
+            if len(fields) > 4 and fields[0] in contigs:
+                add(fields[0].decode(), int(fields[1]) - 1, fields[3].decode(), fields[4].decode())
+    return records
+
+
+def alleles_match(alts, strand, original):
+    """True if the lifted ALT alleles, back on the source strand, are those of
+    an input record (a split or joined multiallelic matches a subset)"""
+    if strand == '-':
+        alts = [a if is_symbolic(a) else reverse_complement(a) for a in alts]
+    lifted = {alt.upper() for alt in alts}
+    for _, original_alts in original:
+        source = {alt.upper() for alt in original_alts}
+        if lifted <= source or source <= lifted:
+            return True
+    return False
+
+
+def classify(sample, mapped, original):
+    """Status of each sampled site"""
+    statuses = []
+    for (contig, start, ref, alts), back in zip(sample, mapped):
+        if isinstance(back, str):
+            statuses.append(back)
+            continue
+        back_contig, back_start, strand = back
+        positions = original.get(normalize_contig(back_contig), {})
+        indel = any(len(alt) != len(ref) for alt in alts if not is_symbolic(alt))
+        if indel:
+            width = max(len(ref), *(len(alt) for alt in alts))
+            found = any(back_start + d in positions for d in range(-width, width + 1))
+            statuses.append('concordant' if found else 'position_mismatch')
+        elif back_start not in positions:
+            statuses.append('position_mismatch')
+        elif alleles_match(alts, strand, positions[back_start]):
+            statuses.append('concordant')
+        else:
+            statuses.append('allele_mismatch')
+    return statuses
+
+
+def roundtrip(lifted_vcf, original_vcf, chain_index, sample_size=DEFAULT_SAMPLE_SIZE, seed=1, trace=None):
+    """Per-contig status counts of a sample of lifted_vcf mapped back into original_vcf"""
+    trace = trace or StageTrace('roundtrip_qc', None)
+    with trace.stage('sample') as stage:
+        reader, items = lifted_items(lifted_vcf)
+        with reader:
+            chosen, total = reservoir_sample(items, sample_size, random.Random(seed))
+            sample = [site_of(item) for item in chosen]
+        stage.records = total
+        stage.extra['sampled'] = len(sample)
+
+    with trace.stage('map_back') as stage:
+        mapped = map_back(chain_index, [(contig, start, start + len(ref)) for contig, start, ref, _ in sample])
+        stage.records = len(sample)
+        stage.extra['vectorized'] = NUMPY_AVAILABLE
+
+    with trace.stage('lookup_original') as stage:
+        windows = []
+        for (_, _, ref, alts), back in zip(sample, mapped):
+            if not isinstance(back, str):
+                width = max(len(ref), *(len(alt) for alt in alts))
+                windows.append((back[0], max(0, back[1] - width), back[1] + width + 1))
+        original = read_original(original_vcf, windows)
+        stage.records = sum(len(positions) for positions in original.values())
+
+    statuses = classify(sample, mapped, original)
+    contigs = {}
+    for (contig, _, _, _), status in zip(sample, statuses):
+        counts = contigs.setdefault(contig, dict.fromkeys(('sampled',) + STATUSES, 0))
+        counts['sampled'] += 1
+        counts[status] += 1
+
+    totals = dict.fromkeys(('sampled',) + STATUSES, 0)
+    for counts in contigs.values():
+        for key in totals:
+            totals[key] += counts[key]
+        counts['discordance_rate'] = _rate(counts)
+    totals['discordance_rate'] = _rate(totals)
+    return {'lifted_vcf': lifted_vcf, 'original_vcf': original_vcf, 'lifted_records': total,
+            'sample_size': sample_size, 'seed': seed, 'totals': totals, 'contigs': contigs}
+
+
+def _rate(counts):
+    return round(1 - counts['concordant'] / counts['sampled'], 6) if counts['sampled'] else 0.0
+
+
+def write_report(report, json_file, tsv_file=None):
+    with open(json_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    if tsv_file:
+        with open(tsv_file, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerow(('contig', 'sampled') + STATUSES + ('discordance_rate',))
+            for contig, counts in sorted(report['contigs'].items()):
+                writer.writerow([contig] + [counts[key] for key in ('sampled',) + STATUSES + ('discordance_rate',)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lift a sample of lifted records back and check they return')
+    parser.add_argument('lifted', help='Lifted VCF/BCF')
+    parser.add_argument('original', help='Input VCF/BCF it was lifted from')
+    parser.add_argument('--reverse-chain', required=True, help='Chain from the target back to the source build')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help=f'Lifted records to check (default: {DEFAULT_SAMPLE_SIZE})')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the reservoir sample')
+    parser.add_argument('--output', '-o', default='roundtrip.json', help='JSON report')
+    parser.add_argument('--tsv', help='Per-contig table')
+    parser.add_argument('--max-discordance', type=float,
+                        help='Exit with status 2 if the overall discordance rate is above this')
+    parser.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+    args = parser.parse_args()
+
+    for path in (args.lifted, args.original, args.reverse_chain):
+        if not os.path.exists(path):
+            sys.exit(f"ERROR: File not found: {path}")
+
+    trace = StageTrace('roundtrip_qc', args.trace)
+    with trace.stage('load_chain') as stage:
+        chain_index = ChainIndex.from_file(args.reverse_chain)
+        stage.records = len(chain_index.chains)
+    report = roundtrip(args.lifted, args.original, chain_index, args.sample_size, args.seed, trace)
+    write_report(report, args.output, args.tsv)
+
+    totals = report['totals']
+    print(f"Sampled {totals['sampled']} of {report['lifted_records']} lifted records")
+    for status in STATUSES:
+        print(f"  {status}: {totals[status]}")
+    print(f"Discordance rate: {totals['discordance_rate']:.4%}")
+    for contig, counts in sorted(report['contigs'].items()):
+        print(f"  {contig}: {counts['discordance_rate']:.4%} of {counts['sampled']}")
+    if args.max_discordance is not None and totals['discordance_rate'] > args.max_discordance:
+        print(f"ERROR: discordance rate above {args.max_discordance:.4%}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    profile_main('roundtrip_qc', main)
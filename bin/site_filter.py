@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Site Filters
+============
+Drop records before they are lifted: by FILTER value (--keep-filters PASS),
+against a whitelist of IDs and positions (--whitelist), and by allele
+frequency (--min-af, --max-af, --min-maf). The lift engine applies them as
+each record is read, so dropped records never reach the chain lookup, the
+sort buffer or the compressor.
+
+Filters look only at what they need: the site fields already split for the
+lift, then FILTER, then the AF (or AC/AN) INFO entries. Records without
+allele frequencies pass the frequency thresholds.
+
+A whitelist has one entry per line: an ID (rs123) or a position
+(chr1<TAB>12345, or chr1:12345, 1-based; 'chr' prefix ignored).
+
+For CrossMap, which reads whole files, the filtered records are written to
+a VCF first:
+
+    site_filter.py input.vcf.gz --keep-filters PASS --min-maf 0.01 -o filtered.vcf
+"""
+
+import argparse
+import gzip
+import sys
+
+from bcf import BcfReader, is_bcf
+from chain_utils import normalize_contig
+
+
+class SiteFilter:
+    """Keep/drop decision for one record from its site fields and line"""
+
+    def __init__(self, keep_filters=None, whitelist=None, min_af=None, max_af=None, min_maf=None):
+        self.keep_filters = set(keep_filters) if keep_filters else None
+        self.whitelist = whitelist
+        self.ids = set()
+        self.positions = set()
+        if whitelist:
+            self.ids, self.positions = read_whitelist(whitelist)
+        self.min_af = min_af
+        self.max_af = max_af
+        self.min_maf = min_maf
+        self.frequencies = any(v is not None for v in (min_af, max_af, min_maf))
+
+    def describe(self):
+        """The filter settings, for checkpoint fingerprints and traces"""
+        return {'keep_filters': sorted(self.keep_filters) if self.keep_filters else None,
+                'whitelist': self.whitelist, 'min_af': self.min_af, 'max_af': self.max_af,
+                'min_maf': self.min_maf}
+
+    def keep(self, fields, line):
+        """True to lift the record. fields are its site fields from
+        split_head()/bcf_fields(); line is its bytes line or BcfRecord"""
+        if self.whitelist and not self._listed(fields):
+            return False
+        if self.keep_filters is None and not self.frequencies:
+            return True
+        if isinstance(line, bytes):
+            filter_value, info = _filter_info(line)
+            if self.keep_filters is not None and not self.keep_filters.intersection(filter_value.split(';')):
+                return False
+            return not self.frequencies or self._frequency_ok(_text_frequencies(info))
+        if self.keep_filters is not None and not self.keep_filters.intersection(_bcf_filters(line)):
+            return False
+        return not self.frequencies or self._frequency_ok(_bcf_frequencies(line.info()))
+
+    def keep_record(self, record):
+        """keep() for a record line (bytes) or BcfRecord alone"""
+        if isinstance(record, bytes):
+            return self.keep(record[:_site_end(record)].decode().split('\t'), record)
+        return self.keep(record.site_text(), record)
+
+    def _listed(self, fields):
+        if self.ids and any(i in self.ids for i in fields[2].split(';')):
+            return True
+        return (normalize_contig(fields[0]), int(fields[1])) in self.positions
+
+    def _frequency_ok(self, frequencies):
+        """True if any ALT frequency is within the thresholds, or none is known"""
+        if not frequencies:
+            return True
+        for af in frequencies:
+            if self.min_af is not None and af < self.min_af:
+                continue
+            if self.max_af is not None and af > self.max_af:
+                continue
+            if self.min_maf is not None and min(af, 1 - af) < self.min_maf:
+                continue
+            return True
+        return False
+
+
+def read_whitelist(path):
+    """(IDs, (contig, 1-based position) pairs) of a whitelist file"""
+    ids, positions = set(), set()
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith('#'):
+                continue
+            parts = entry.split()
+            if len(parts) == 1 and ':' in entry:
+                parts = entry.split(':')
+            if len(parts) == 2 and parts[1].isdigit():
+                positions.add((normalize_contig(parts[0]), int(parts[1])))
+            else:
+                # IDs such as 1:12345:A:G too
+                ids.add(entry.split()[0])
+    return ids, positions
+
+
+def _filter_info(line):
+    """FILTER (str) and INFO (bytes) columns of a VCF record line"""
+    filter_start = -1
+    for _ in range(6):
+        filter_start = line.find(b'\t', filter_start + 1)
+        if filter_start == -1:
+            return '.', b''
+    info_start = line.find(b'\t', filter_start + 1)
+    if info_start == -1:
+        return line[filter_start + 1:].rstrip(b'\r\n').decode(), b''
+    info_end = line.find(b'\t', info_start + 1)
+    if info_end == -1:
+        info_end = len(line.rstrip(b'\r\n'))
+    return line[filter_start + 1:info_start].decode(), line[info_start + 1:info_end]
+
+
+def _text_frequencies(info):
+    """ALT allele frequencies from AF, else AC/AN, of a VCF INFO column"""
+    values = {}
+    for entry in info.split(b';'):
+        key, _, value = entry.partition(b'=')
+        if key in (b'AF', b'AC', b'AN'):
+            values[key] = value
+    try:
+        if b'AF' in values:
+            return [float(v) for v in values[b'AF'].split(b',') if v != b'.']
+        if b'AC' in values and b'AN' in values:
+            an = int(values[b'AN'])
+            return [int(v) / an for v in values[b'AC'].split(b',') if v != b'.'] if an else []
+    except ValueError:
+        pass
+    return []
+
+
+def _bcf_filters(record):
+    filters = record.filters
+    if filters:
+        return filters
+    return ['.'] if record.filter_missing() else ['PASS']
+
+
+def _bcf_frequencies(info):
+    """ALT allele frequencies from AF, else AC/AN, of a decoded BCF INFO"""
+    def values(key):
+        value = info.get(key)
+        if value is None or value is True:
+            return []
+        return [v for v in (value if isinstance(value, list) else [value]) if v is not None]
+
+    if values('AF'):
+        return values('AF')
+    an = values('AN')
+    if an and an[0]:
+        return [ac / an[0] for ac in values('AC')]
+    return []
+
+
+def add_filter_arguments(parser):
+    """The site filter options shared by the lift tools"""
+    group = parser.add_argument_group('site filters (applied before lifting)')
+    group.add_argument('--keep-filters', help="Keep records whose FILTER has one of these values, e.g. 'PASS' or 'PASS,.'")
+    group.add_argument('--whitelist', help='Keep only records whose ID or position is listed in this file')
+    group.add_argument('--min-af', type=float, help='Keep records with an ALT frequency (INFO AF, or AC/AN) of at least this')
+    group.add_argument('--max-af', type=float, help='Keep records with an ALT frequency of at most this')
+    group.add_argument('--min-maf', type=float, help='Keep records with a minor allele frequency of at least this')
+
+
+def site_filter_from_args(args):
+    """The SiteFilter of parsed arguments, or None when no filter is set"""
+    if not any(v is not None for v in (args.keep_filters, args.whitelist, args.min_af, args.max_af, args.min_maf)):
+        return None
+    keep_filters = [v.strip() for v in args.keep_filters.split(',')] if args.keep_filters else None
+    return SiteFilter(keep_filters, args.whitelist, args.min_af, args.max_af, args.min_maf)
+
+
+def filter_records(path, site_filter, output):
+    """Write the records of a VCF/BCF that site_filter keeps to a VCF;
+    returns (records read, records written)"""
+    read = written = 0
+    opener = gzip.open if output.endswith('.gz') else open
+    with opener(output, 'wt') as out:
+        if is_bcf(path):
+            reader = BcfReader(path)
+            with reader:
+                out.write(''.join(reader.header.meta) + reader.header.column_line)
+                for record in reader:
+                    read += 1
+                    if site_filter.keep_record(record):
+                        out.write(record.to_text() + '\n')
+                        written += 1
+            return read, written
+
+        with (gzip.open(path, 'rb') if path.endswith(('.gz', '.bgz')) else open(path, 'rb')) as src:
+            for line in src:
+                if line.startswith(b'#'):
+                    out.write(line.decode())
+                    continue
+                if not line.strip():
+                    continue
+                read += 1
+                if site_filter.keep_record(line):
+                    out.write(line.decode())
+                    written += 1
+    return read, written
+
+
+def _site_end(line):
+    """End of the CHROM..ALT fields of a record line"""
+    end = -1
+    for _ in range(5):
+        end = line.find(b'\t', end + 1)
+        if end == -1:
+            return len(line.rstrip(b'\r\n'))
+    return end
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the records of a VCF/BCF that pass site filters')
+    parser.add_argument('input', help='Input VCF (plain or gzip/BGZF compressed) or BCF')
+    parser.add_argument('-o', '--output', required=True, help='Output VCF (.gz for gzip)')
+    add_filter_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        site_filter = site_filter_from_args(args)
+        if site_filter is None:
+            parser.error('no filter given')
+        read, written = filter_records(args.input, site_filter, args.output)
+    except (OSError, ValueError) as e:
+        sys.exit(f"ERROR: {e}")
+    print(f"Kept {written} of {read} records in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Input Size Estimates
+====================
+Estimate how big a VCF/BCF input is without reading all of it: the header
+gives the sample count, and a handful of BGZF blocks sampled evenly across
+the file give the compression ratio and record density. From these come
+per-sample resource requests (cpus, memory, bcftools sort buffer), so small
+chip VCFs get small allocations and large ones enough memory on the first
+attempt.
+
+Usage:
+    size_estimate.py sample1.vcf.gz sample2.bcf     # JSON estimates per file
+"""
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import zlib
+
+from bcf import BcfReader, is_bcf
+
+MB = 1024 * 1024
+
+# BGZF blocks decompressed to estimate ratio and record density
+DEFAULT_SAMPLE_BLOCKS = 16
+# Records read after the header to measure BCF record size
+BCF_SAMPLE_RECORDS = 1000
+# Bytes read from each offset of an uncompressed VCF
+PLAIN_SAMPLE_BYTES = 256 * 1024
+
+# Resource model: the lift holds the chain index, reference index and
+# interpreter plus per-record and per-genotype state, never less than the
+# fixed 8 GB request it replaces; sorting wants the uncompressed records in
+# memory. Both are capped so very large inputs do not need a high-memory node
+LIFT_BASE_MB = 2048
+LIFT_RECORD_BYTES = 256
+LIFT_GENOTYPE_BYTES = 1
+MIN_LIFT_MB = 8192
+MAX_LIFT_MB = 65536
+SORT_OVERHEAD_MB = 512
+MIN_SORT_MB = 256
+MAX_SORT_MB = 16384
+# Uncompressed size at which a task gets 2, then 4 cpus (compression threads)
+CPU_STEPS_MB = (1024, 10240)
+
+ESTIMATE_FIELDS = ('compressed_bytes', 'samples', 'est_uncompressed_bytes', 'est_records', 'est_genotypes',
+                   'cpus', 'lift_memory_mb', 'sort_memory_mb', 'sort_mb')
+
+
+def _block_at(handle, offset):
+    """The first complete BGZF block at or after offset: (offset, compressed size, data)"""
+    handle.seek(offset)
+    window = handle.read(0x20000)
+    position = 0
+    while True:
+        position = window.find(b'\x1f\x8b\x08\x04', position)
+        if position == -1 or position + 18 > len(window):
+            return None
+        # BGZF: XLEN 6 with a 'BC' extra field holding the block size
+        if window[position + 10:position + 16] == b'\x06\x00BC\x02\x00':
+            block_size = struct.unpack_from('<H', window, position + 16)[0] + 1
+            block = window[position:position + block_size]
+            if len(block) == block_size:
+                try:
+                    data = zlib.decompress(block[18:-8], -15)
+                except zlib.error:
+                    data = None
+                if data is not None and len(data) == struct.unpack_from('<I', block, block_size - 4)[0]:
+                    return offset + position, block_size, data
+        position += 1
+
+
+def sample_blocks(path, count=DEFAULT_SAMPLE_BLOCKS):
+    """Up to count distinct BGZF blocks spread evenly over the file; empty
+    when the file is not BGZF (e.g. plain gzip)"""
+    file_size = os.path.getsize(path)
+    blocks = {}
+    with open(path, 'rb') as handle:
+        for i in range(count):
+            offset = file_size * (2 * i + 1) // (2 * count)
+            block = _block_at(handle, offset)
+            if block and block[2]:
+                blocks[block[0]] = block
+        if not blocks:
+            # A file of one data block has no block start past its first byte
+            block = _block_at(handle, 0)
+            if block and block[2]:
+                blocks[block[0]] = block
+    return list(blocks.values())
+
+
+def read_header(path):
+    """(header bytes, number of samples, first records' bytes and count)"""
+    if is_bcf(path):
+        with BcfReader(path) as reader:
+            header_bytes = len(reader.header.text)
+            record_bytes = records = 0
+            for record in reader:
+                record_bytes += 8 + len(record.shared) + len(record.indiv)
+                records += 1
+                if records == BCF_SAMPLE_RECORDS:
+                    break
+            return header_bytes, len(reader.header.samples), record_bytes, records
+
+    opener = gzip.open if path.endswith(('.gz', '.bgz')) else open
+    header_bytes = 0
+    samples = 0
+    with opener(path, 'rb') as handle:
+        for line in handle:
+            header_bytes += len(line)
+            if line.startswith(b'#CHROM'):
+                samples = max(0, len(line.rstrip(b'\r\n').split(b'\t')) - 9)
+                break
+            if not line.startswith(b'#'):
+                break
+    return header_bytes, samples, 0, 0
+
+
+def estimate_size(path, blocks=DEFAULT_SAMPLE_BLOCKS):
+    """Size estimate of one VCF/BCF input: compressed bytes, samples, records,
+    genotypes (records x samples) and the resources to request for it. None
+    for compressed inputs without BGZF blocks to sample (plain gzip), which
+    keep the fixed resource requests"""
+    compressed = os.path.getsize(path)
+    header_bytes, samples, bcf_record_bytes, bcf_records = read_header(path)
+
+    if path.endswith(('.gz', '.bgz')) or is_bcf(path):
+        sampled = sample_blocks(path, blocks)
+        if not sampled:
+            return None
+        sampled_compressed = sum(size for _, size, _ in sampled)
+        sampled_data = sum(len(data) for _, _, data in sampled)
+        ratio = sampled_data / sampled_compressed if sampled_compressed else 1.0
+        uncompressed = max(header_bytes, int(compressed * ratio))
+        if is_bcf(path):
+            record_size = bcf_record_bytes / bcf_records if bcf_records else 0
+        else:
+            # Header lines in sampled blocks (small files) are not records
+            lines = sum(data.count(b'\n') - data.count(b'\n#') for _, _, data in sampled)
+            record_size = sampled_data / lines if lines else 0
+    else:
+        uncompressed = compressed
+        lines = sampled_bytes = 0
+        with open(path, 'rb') as handle:
+            for i in range(blocks):
+                handle.seek(header_bytes + (compressed - header_bytes) * i // blocks)
+                chunk = handle.read(PLAIN_SAMPLE_BYTES)
+                lines += chunk.count(b'\n') - chunk.count(b'\n#')
+                sampled_bytes += len(chunk)
+        record_size = sampled_bytes / lines if lines else 0
+
+    records = int((uncompressed - header_bytes) / record_size) if record_size else 0
+    if bcf_records and bcf_records < BCF_SAMPLE_RECORDS:
+        records = bcf_records
+    estimate = {
+        'compressed_bytes': compressed,
+        'samples': samples,
+        'est_uncompressed_bytes': uncompressed,
+        'est_records': max(0, records),
+        'est_genotypes': max(0, records) * samples,
+    }
+    estimate.update(derive_resources(estimate))
+    return estimate
+
+
+def derive_resources(estimate):
+    """cpus, lift and sort task memory (MB) and bcftools sort buffer (MB) for one input"""
+    uncompressed_mb = estimate['est_uncompressed_bytes'] / MB
+    cpus = (1, 2, 4)[sum(1 for step in CPU_STEPS_MB if uncompressed_mb >= step)]
+    # bcftools sort holds records in binary form; the uncompressed input
+    # size bounds that from above
+    sort_mb = int(min(MAX_SORT_MB, max(MIN_SORT_MB, uncompressed_mb * 1.25)))
+    lift_mb = LIFT_BASE_MB + (estimate['est_records'] * LIFT_RECORD_BYTES
+                              + estimate['est_genotypes'] * LIFT_GENOTYPE_BYTES) / MB
+    lift_mb = int(min(MAX_LIFT_MB, max(MIN_LIFT_MB, lift_mb)))
+    return {'cpus': cpus, 'lift_memory_mb': lift_mb, 'sort_memory_mb': sort_mb + SORT_OVERHEAD_MB,
+            'sort_mb': sort_mb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate VCF/BCF input sizes and resource requests')
+    parser.add_argument('inputs', nargs='+', help='VCF, VCF.gz or BCF files')
+    parser.add_argument('--blocks', type=int, default=DEFAULT_SAMPLE_BLOCKS,
+                        help=f'BGZF blocks to sample per file (default: {DEFAULT_SAMPLE_BLOCKS})')
+    args = parser.parse_args()
+    print(json.dumps({path: estimate_size(path, args.blocks) for path in args.inputs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+"""
+Stage Trace Instrumentation
+===========================
+Per-phase instrumentation for the pipeline's Python tools. Each phase records
+wall time, CPU time (own and child processes), bytes read/written, records
+processed and peak RSS, and is written as one JSON line to a trace file.
+
+Tracing is enabled with a --trace FILE option or the LIFTOVER_TRACE
+environment variable; otherwise phases are not measured or written.
+"""
+
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACE_ENV = 'LIFTOVER_TRACE'
+
+
+def _read_proc_io():
+    """Return (rchar, wchar) from /proc/self/io, or None when unavailable"""
+    try:
+        values = {}
+        with open('/proc/self/io') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                values[key] = int(value)
+        return values['rchar'], values['wchar']
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS counter so each phase gets its own peak.
+
+    Only Linux supports this (writing 5 to clear_refs resets VmHWM); elsewhere
+    the reported peak is the process high-water mark so far.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Current peak RSS of this process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 2)
+    except (OSError, ValueError, IndexError):
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    if sys.platform == 'darwin':
+        return round(usage.ru_maxrss / (1024 * 1024), 2)
+    return round(usage.ru_maxrss / 1024, 2)
+
+
+class StageRecord:
+    """Counters a phase can update while it runs"""
+
+    def __init__(self):
+        self.records = 0
+        self.bytes_read = None
+        self.bytes_written = None
+        self.extra = {}
+
+
+class StageTrace:
+    """Collects per-phase measurements for one tool invocation"""
+
+    def __init__(self, tool, trace_file=None, sample_id=None):
+        self.tool = tool
+        self.sample_id = sample_id
+        self.trace_file = trace_file or os.environ.get(TRACE_ENV)
+        self.enabled = bool(self.trace_file)
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Measure one phase; the yielded StageRecord takes record/byte counts"""
+        record = StageRecord()
+        if not self.enabled:
+            yield record
+            return
+
+        _reset_peak_rss()
+        io_start = _read_proc_io()
+        children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        started = datetime.now().isoformat(timespec='milliseconds')
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            io_end = _read_proc_io()
+
+            bytes_read, bytes_written = record.bytes_read, record.bytes_written
+            if io_start and io_end:
+                if bytes_read is None:
+                    bytes_read = io_end[0] - io_start[0]
+                if bytes_written is None:
+                    bytes_written = io_end[1] - io_start[1]
+
+            entry = {
+                'tool': self.tool,
+                'sample_id': self.sample_id,
+                'stage': name,
+                'start': started,
+                'wall_seconds': round(wall, 6),
+                'cpu_seconds': round(cpu, 6),
+                'child_cpu_seconds': round((children.ru_utime + children.ru_stime)
+                                           - (children_start.ru_utime + children_start.ru_stime), 6),
+                'bytes_read': bytes_read,
+                'bytes_written': bytes_written,
+                'records': record.records,
+                'records_per_sec': round(record.records / wall, 1) if wall > 0 and record.records else None,
+                'peak_rss_mb': _peak_rss_mb(),
+                'pid': os.getpid(),
+                'host': platform.node(),
+            }
+            entry.update(record.extra)
+            self.stages.append(entry)
+            self._write(entry)
+
+    def _write(self, entry):
+        with open(self.trace_file, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+def find_trace_files(trace_dir):
+    """Every *.trace.jsonl file under a directory (Nextflow stages each task's
+    trace into a numbered subdirectory)"""
+    paths = []
+    for root, dirs, files in os.walk(trace_dir):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.trace.jsonl'))
+    return paths
+
+
+def read_trace_files(paths):
+    """Load JSON-lines trace entries from one or more files"""
+    entries = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+    return entries
+
+
+def summarize_stages(entries):
+    """Aggregate trace entries into a per-(tool, stage) throughput breakdown"""
+    summary = {}
+    for entry in entries:
+        key = (entry.get('tool', ''), entry.get('stage', ''))
+        row = summary.setdefault(key, {
+            'tool': key[0],
+            'stage': key[1],
+            'calls': 0,
+            'wall_seconds': 0.0,
+            'cpu_seconds': 0.0,
+            'child_cpu_seconds': 0.0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+            'records': 0,
+            'peak_rss_mb': 0.0,
+        })
+        row['calls'] += 1
+        row['wall_seconds'] += entry.get('wall_seconds') or 0.0
+        row['cpu_seconds'] += entry.get('cpu_seconds') or 0.0
+        row['child_cpu_seconds'] += entry.get('child_cpu_seconds') or 0.0
+        row['bytes_read'] += entry.get('bytes_read') or 0
+        row['bytes_written'] += entry.get('bytes_written') or 0
+        row['records'] += entry.get('records') or 0
+        row['peak_rss_mb'] = max(row['peak_rss_mb'], entry.get('peak_rss_mb') or 0.0)
+
+    breakdown = []
+    for row in summary.values():
+        wall = row['wall_seconds']
+        row['records_per_sec'] = round(row['records'] / wall, 1) if wall > 0 and row['records'] else None
+        row['mb_per_sec'] = round(row['bytes_read'] / wall / (1024 * 1024), 2) if wall > 0 else None
+        for field in ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds'):
+            row[field] = round(row[field], 3)
+        breakdown.append(row)
+
+    breakdown.sort(key=lambda r: r['wall_seconds'], reverse=True)
+    return breakdown
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+"""
+Output VCF Validation
+=====================
+Checks a final VCF and its index for format compliance and data integrity
+(the VALIDATE_VCF step) and writes <sample>.validation_report.txt. Exits
+with status 1 when validation fails.
+
+--validation-mode full (the default) reads every record through bcftools.
+--validation-mode sampled never reads the whole file, so very large outputs
+validate in seconds: records per contig come from the .tbi/.csi metadata,
+--regions randomly chosen index windows are read through the index and
+their records checked, and the BGZF end-of-file marker is confirmed.
+
+Usage:
+    liftover-tools validate sample1 sample1.hg38.vcf.gz sample1.hg38.vcf.gz.tbi --validation-mode sampled
+"""
+
+import argparse
+import gzip
+import os
+import random
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from bgzf import BGZF_EOF
+from profiling import profile_main
+from vcf_index import IndexedVcf, RegionSet
+
+VALIDATION_MODES = ('full', 'sampled')
+DEFAULT_REGIONS = 20
+# REF bases, IUPAC codes included
+_ALLELE = re.compile(rb'^[ACGTNRYKMSWBDHV]+$', re.IGNORECASE)
+
+
+def run_command(cmd):
+    """Run a command (argument list) and return (returncode, stdout, stderr)"""
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return result.returncode, result.stdout, result.stderr
+    except OSError as e:
+        return 1, "", str(e)
+
+
+def contig_counts(vcf_file):
+    """Records per contig from one streamed pass of bcftools view -H, or None"""
+    counts = Counter()
+    try:
+        with subprocess.Popen(['bcftools', 'view', '-H', vcf_file], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL) as proc:
+            for line in proc.stdout:
+                counts[line.split(b'\t', 1)[0].decode()] += 1
+    except OSError:
+        return None
+    return counts if proc.returncode == 0 else None
+
+
+def has_bgzf_eof(vcf_file):
+    """True if the file ends in the BGZF end-of-file marker block"""
+    with open(vcf_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < len(BGZF_EOF):
+            return False
+        f.seek(-len(BGZF_EOF), os.SEEK_END)
+        return f.read() == BGZF_EOF
+
+
+def check_record(fields, n_columns, contig, previous_pos):
+    """Problem with a VCF record's fields, or None"""
+    if len(fields) != n_columns:
+        return f"{len(fields)} columns, header has {n_columns}"
+    if fields[0].decode() != contig:
+        return f"contig {fields[0].decode()} in a {contig} region"
+    if not fields[1].isdigit():
+        return f"invalid POS {fields[1].decode()}"
+    if int(fields[1]) < previous_pos:
+        return "records not sorted"
+    if not _ALLELE.match(fields[3]):
+        return f"invalid REF {fields[3][:20].decode()}"
+    return None
+
+
+def check_regions(indexed, n_regions, rng):
+    """Read n_regions random index windows that hold records through the index;
+    returns ([(region, records)], [problems])"""
+    names = indexed.index.names if indexed.index.names is not None else indexed.header.contigs
+    windows = [(ref, start, end) for ref in range(len(indexed.index.bins))
+               for start, end in indexed.index.leaf_windows(ref)]
+    n_columns = len(indexed.column_line.rstrip('\r\n').split('\t'))
+    checked, problems = [], []
+    for ref, start, end in sorted(rng.sample(windows, min(n_regions, len(windows)))):
+        contig = names[ref]
+        region = f"{contig}:{start + 1}-{end}"
+        records = 0
+        previous_pos = 0
+        for record in indexed.fetch(RegionSet([(contig, start, end)])):
+            records += 1
+            if indexed.bcf:
+                # Checked as the VCF text the record decodes to
+                fields = [field.encode() for field in record.site_text() + record.tail_text().split('\t')]
+            else:
+                fields = record.rstrip(b'\r\n').split(b'\t')
+            problem = check_record(fields, n_columns, contig, previous_pos)
+            if problem:
+                problems.append(f"{region}: record {records}: {problem}")
+                break
+            previous_pos = int(fields[1])
+        if records == 0:
+            problems.append(f"{region}: the index lists records here but none were read")
+        checked.append((region, records))
+    return checked, problems
+
+
+def validate_sampled(vcf_file, index_file, n_regions, seed):
+    """Index metadata and random-region sections of a sampled validation;
+    returns (passed, report lines)"""
+    report_lines = []
+    passed = True
+
+    report_lines.append("3. Index Metadata Check:")
+    try:
+        indexed = IndexedVcf(vcf_file, index_file)
+    except Exception as e:
+        report_lines.append(f"   FAIL: Cannot read the index: {e}")
+        return False, report_lines + [""]
+    with indexed:
+        index = indexed.index
+        names = index.names if index.names is not None else indexed.header.contigs
+        report_lines.append("   PASS: Index can be read")
+        if any(mapped is None for mapped in index.mapped):
+            report_lines.append("   WARNING: Index has no per-contig record counts")
+        else:
+            counts = {names[ref]: mapped for ref, mapped in enumerate(index.mapped) if mapped}
+            report_lines.append(f"   INFO: Variant count: {sum(counts.values())}")
+            report_lines.append("   INFO: Chromosome distribution:")
+            for contig in sorted(counts)[:10]:  # Show first 10 chromosomes
+                report_lines.append(f"     {counts[contig]} {contig}")
+            if not counts:
+                report_lines.append("   WARNING: Index lists no records")
+        report_lines.append("")
+
+        report_lines.append("4. Index Region Checks:")
+        try:
+            checked, problems = check_regions(indexed, n_regions, random.Random(seed))
+        except Exception as e:
+            checked, problems = [], [f"cannot read records through the index: {e}"]
+        for region, records in checked:
+            report_lines.append(f"   INFO: {region}: {records} records")
+        for problem in problems:
+            report_lines.append(f"   FAIL: {problem}")
+        if problems:
+            passed = False
+        elif checked:
+            report_lines.append(f"   PASS: {len(checked)} random index regions read and checked")
+        else:
+            report_lines.append("   WARNING: No indexed regions to check")
+    report_lines.append("")
+    return passed, report_lines
+
+
+def validate_full(vcf_file, report_lines):
+    """bcftools sections of a full validation (reads every record)"""
+    # Check with bcftools if available
+    report_lines.append("3. bcftools Validation:")
+    returncode, stdout, stderr = run_command(['bcftools', 'view', '-h', vcf_file])
+    if returncode == 0:
+        report_lines.append("   PASS: bcftools can read VCF header")
+
+        # Count variants and chromosomes in one pass
+        counts = contig_counts(vcf_file)
+        if counts is not None:
+            report_lines.append(f"   INFO: Variant count: {sum(counts.values())}")
+            report_lines.append("   INFO: Chromosome distribution:")
+            for contig in sorted(counts)[:10]:  # Show first 10 chromosomes
+                report_lines.append(f"     {counts[contig]} {contig}")
+    else:
+        report_lines.append(f"   WARNING: bcftools not available: {stderr}")
+        report_lines.append("   INFO: Skipping bcftools validation (not required for basic validation)")
+
+    report_lines.append("")
+
+    # Test index functionality
+    report_lines.append("4. Index Functionality Test:")
+    if any(run_command(['bcftools', 'view', '-H', vcf_file, region])[0] == 0
+           for region in ('chr1:1-1000', '1:1-1000')):
+        report_lines.append("   PASS: Index allows region queries")
+    else:
+        report_lines.append("   WARNING: Could not test region queries")
+
+    report_lines.append("")
+
+
+def validate_vcf(sample_id, vcf_file, index_file, mode='full', n_regions=DEFAULT_REGIONS, seed=1):
+    """Comprehensive VCF validation"""
+
+    report_lines = []
+    report_lines.append(f"VCF Validation Report for Sample: {sample_id}")
+    report_lines.append("=" * 60)
+    report_lines.append(f"VCF File: {vcf_file}")
+    report_lines.append(f"Index File: {index_file}")
+    report_lines.append(f"Mode: {mode}")
+    report_lines.append("")
+
+    validation_passed = True
+
+    # Check file existence
+    report_lines.append("1. File Existence Check:")
+    if not os.path.exists(vcf_file):
+        report_lines.append(f"   FAIL: VCF file not found: {vcf_file}")
+        validation_passed = False
+    else:
+        report_lines.append(f"   PASS: VCF file exists")
+
+    if not os.path.exists(index_file):
+        report_lines.append(f"   FAIL: Index file not found: {index_file}")
+        validation_passed = False
+    else:
+        report_lines.append(f"   PASS: Index file exists")
+
+    report_lines.append("")
+
+    # Check file format
+    report_lines.append("2. File Format Check:")
+    if vcf_file.endswith('.gz'):
+        try:
+            with gzip.open(vcf_file, 'rt') as f:
+                first_line = f.readline()
+                if first_line.startswith('##fileformat=VCF'):
+                    report_lines.append("   PASS: Valid VCF header format")
+                else:
+                    report_lines.append("   FAIL: Invalid VCF header format")
+                    validation_passed = False
+        except Exception as e:
+            report_lines.append(f"   FAIL: Cannot read VCF file: {e}")
+            validation_passed = False
+    else:
+        report_lines.append("   FAIL: VCF file is not compressed")
+        validation_passed = False
+
+    report_lines.append("")
+
+    if mode == 'sampled':
+        if os.path.exists(vcf_file) and os.path.exists(index_file):
+            passed, lines = validate_sampled(vcf_file, index_file, n_regions, seed)
+            validation_passed = validation_passed and passed
+            report_lines.extend(lines)
+        else:
+            report_lines.extend(["3. Index Metadata Check:", "   FAIL: VCF or index missing", ""])
+    else:
+        validate_full(vcf_file, report_lines)
+
+    # Truncated files lack the final empty block
+    report_lines.append("5. BGZF EOF Check:")
+    try:
+        if has_bgzf_eof(vcf_file):
+            report_lines.append("   PASS: BGZF end-of-file marker present")
+        else:
+            report_lines.append("   FAIL: BGZF end-of-file marker missing (truncated file?)")
+            validation_passed = False
+    except OSError as e:
+        report_lines.append(f"   FAIL: Cannot read VCF file: {e}")
+        validation_passed = False
+
+    report_lines.append("")
+
+    # File size check
+    report_lines.append("6. File Size Check:")
+    try:
+        vcf_size = os.path.getsize(vcf_file)
+        index_size = os.path.getsize(index_file)
+        report_lines.append(f"   INFO: VCF file size: {vcf_size:,} bytes")
+        report_lines.append(f"   INFO: Index file size: {index_size:,} bytes")
+
+        if vcf_size == 0:
+            report_lines.append("   FAIL: VCF file is empty")
+            validation_passed = False
+        elif vcf_size < 100:
+            report_lines.append("   WARNING: VCF file is very small")
+        else:
+            report_lines.append("   PASS: VCF file has reasonable size")
+
+    except Exception as e:
+        report_lines.append(f"   ERROR: Cannot check file sizes: {e}")
+
+    report_lines.append("")
+    report_lines.append("=" * 60)
+
+    if validation_passed:
+        report_lines.append("OVERALL RESULT: VALIDATION PASSED")
+    else:
+        report_lines.append("OVERALL RESULT: VALIDATION FAILED")
+
+    report_lines.append("=" * 60)
+
+    return validation_passed, report_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate a final VCF and its index')
+    parser.add_argument('sample_id', help='Sample ID, names the report')
+    parser.add_argument('vcf_file', help='Final VCF (.vcf.gz)')
+    parser.add_argument('index_file', help='Its .tbi/.csi index')
+    parser.add_argument('--validation-mode', choices=VALIDATION_MODES, default='full',
+                        help='full: read every record with bcftools; sampled: index metadata, '
+                             'random index regions and the EOF marker only (default: full)')
+    parser.add_argument('--regions', type=int, default=DEFAULT_REGIONS,
+                        help=f'Random index regions read in sampled mode (default: {DEFAULT_REGIONS})')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the sampled regions')
+    args = parser.parse_args()
+
+    print(f"Starting validation for sample: {args.sample_id}")
+
+    validation_passed, report_lines = validate_vcf(args.sample_id, args.vcf_file, args.index_file,
+                                                   args.validation_mode, args.regions, args.seed)
+
+    # Write report
+    with open(f"{args.sample_id}.validation_report.txt", "w") as f:
+        f.write("\n".join(report_lines))
+
+    # Print summary
+    for line in report_lines:
+        print(line)
+
+    if not validation_passed:
+        print(f"ERROR: Validation failed for sample {args.sample_id}")
+        sys.exit(1)
+    else:
+        print(f"SUCCESS: Validation passed for sample {args.sample_id}")
+
+
+if __name__ == "__main__":
+    profile_main('validate_vcf', main)
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+"""
+Indexed VCF/BCF Region Access
+=============================
+Read only the records of a bgzipped VCF or BCF that overlap a set of
+regions, using its tabix (.tbi) or CSI (.csi) index to seek straight to the
+BGZF blocks involved; the rest of the file is never decompressed.
+
+Regions come from a BED file or a list such as 'chr1,chr2:1000000-2000000'.
+Given a chain file, regions are taken in target coordinates and mapped back
+to the source intervals that can lift into them, so only those records are
+read (and lifted).
+
+Usage:
+    vcf_index.py extract sample.vcf.gz --regions panels.bed --chain hg19ToHg38.over.chain.gz \\
+        -o sample.regions.vcf
+"""
+
+import argparse
+import gzip
+import os
+import re
+import struct
+import sys
+from bisect import bisect_right
+
+from bcf import BCF_MAGIC, BcfHeader, BcfRecord, is_bcf
+from bgzf import BgzfReader
+from chain_utils import ChainIndex, normalize_contig
+from site_filter import add_filter_arguments, site_filter_from_args
+
+TBI_MAGIC = b'TBI\x01'
+CSI_MAGIC = b'CSI\x01'
+TBI_MIN_SHIFT = 14
+TBI_DEPTH = 5
+
+_REGION = re.compile(r'^([^:]+)(?::(\d+)(?:-(\d+))?)?$')
+
+
+class RegionSet:
+    """Merged, sorted 0-based half-open intervals by contig ('chr' prefix ignored)"""
+
+    def __init__(self, intervals=()):
+        by_contig = {}
+        self.names = {}
+        for contig, start, end in intervals:
+            key = normalize_contig(contig)
+            self.names.setdefault(key, contig)
+            by_contig.setdefault(key, []).append((start, end))
+        self._starts = {}
+        self._ends = {}
+        for key, spans in by_contig.items():
+            merged = []
+            for start, end in sorted(spans):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[key] = [s for s, _ in merged]
+            self._ends[key] = [e for _, e in merged]
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+    def intervals(self):
+        """(contig, start, end) in contig order of first appearance, then position"""
+        for key, starts in self._starts.items():
+            for start, end in zip(starts, self._ends[key]):
+                yield self.names[key], start, end
+
+    def overlaps(self, contig, start, end):
+        key = normalize_contig(contig)
+        starts = self._starts.get(key)
+        if not starts:
+            return False
+        i = bisect_right(starts, max(start, end - 1)) - 1
+        return i >= 0 and self._ends[key][i] > start
+
+    def total_length(self):
+        return sum(e - s for key in self._starts for s, e in zip(self._starts[key], self._ends[key]))
+
+
+def read_regions(spec):
+    """A RegionSet from a BED file (plain or gzipped) or a comma-separated
+    region list ('chr1', 'chr1:1000-2000', 1-based inclusive)"""
+    intervals = []
+    if os.path.exists(spec):
+        opener = gzip.open if spec.endswith('.gz') else open
+        with opener(spec, 'rt') as f:
+            for line in f:
+                if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                    continue
+                fields = line.split('\t') if '\t' in line else line.split()
+                if len(fields) < 3:
+                    raise ValueError(f"{spec}: BED lines need chrom, start and end: {line.strip()}")
+                intervals.append((fields[0], int(fields[1]), int(fields[2])))
+        return RegionSet(intervals)
+
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        match = _REGION.match(item)
+        if not match:
+            raise ValueError(f"Invalid region: {item}")
+        contig, start, end = match.groups()
+        start = int(start) - 1 if start else 0
+        end = int(end) if end else (start + 1 if match.group(2) else 2 ** 31)
+        intervals.append((contig, start, end))
+    return RegionSet(intervals)
+
+
+def source_regions(chain_index, target_regions):
+    """Source intervals of every chain block that lifts into the target regions"""
+    return RegionSet(interval for contig, start, end in target_regions.intervals()
+                     for interval in chain_index.source_intervals(contig, start, end))
+
+
+# ---------------------------------------------------------------------------
+# Index files
+
+def reg2bins(start, end, min_shift, depth):
+    """Bins that may hold records overlapping [start, end)"""
+    end -= 1
+    bins = []
+    shift = min_shift + depth * 3
+    first = 0
+    for level in range(depth + 1):
+        bins.extend(range(first + (start >> shift), first + (end >> shift) + 1))
+        shift -= 3
+        first += 1 << (level * 3)
+    return bins
+
+
+class VcfIndex:
+    """A parsed .tbi or .csi index: per-reference bins of virtual offset chunks,
+    and the record counts of its metadata pseudo-bins (None where absent)"""
+
+    def __init__(self, path):
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+        self.names = None
+        if data[:4] == TBI_MAGIC:
+            self.min_shift, self.depth = TBI_MIN_SHIFT, TBI_DEPTH
+            n_ref = struct.unpack_from('<i', data, 4)[0]
+            offset = self._read_names(data, 8)
+            self._read_refs(data, offset, n_ref, csi=False)
+        elif data[:4] == CSI_MAGIC:
+            self.min_shift, self.depth, l_aux = struct.unpack_from('<iii', data, 4)
+            if l_aux >= 28:
+                self._read_names(data, 16)
+            offset = 16 + l_aux
+            n_ref = struct.unpack_from('<i', data, offset)[0]
+            self._read_refs(data, offset + 4, n_ref, csi=True)
+        else:
+            raise ValueError(f"{path}: not a tabix or CSI index")
+
+    def _read_names(self, data, offset):
+        # format, col_seq, col_beg, col_end, meta, skip, l_nm, then NUL-terminated names
+        l_nm = struct.unpack_from('<i', data, offset + 24)[0]
+        names = data[offset + 28:offset + 28 + l_nm].split(b'\x00')
+        self.names = [name.decode() for name in names if name]
+        return offset + 28 + l_nm
+
+    def _read_refs(self, data, offset, n_ref, csi):
+        pseudo_bin = ((1 << ((self.depth + 1) * 3)) - 1) // 7 + 1
+        self.bins = []
+        self.linear = []
+        # Records placed on each reference, from its pseudo-bin
+        self.mapped = []
+        for _ in range(n_ref):
+            n_bin = struct.unpack_from('<i', data, offset)[0]
+            offset += 4
+            bins = {}
+            mapped = None
+            for _ in range(n_bin):
+                if csi:
+                    bin_number, _, n_chunk = struct.unpack_from('<IQi', data, offset)
+                    offset += 16
+                else:
+                    bin_number, n_chunk = struct.unpack_from('<Ii', data, offset)
+                    offset += 8
+                chunks = struct.unpack_from(f'<{2 * n_chunk}Q', data, offset)
+                offset += 16 * n_chunk
+                if bin_number != pseudo_bin:
+                    bins[bin_number] = list(zip(chunks[0::2], chunks[1::2]))
+                elif n_chunk == 2:
+                    # (start, end) virtual offsets, then (mapped, unmapped) records
+                    mapped = chunks[2]
+            linear = ()
+            if not csi:
+                n_intv = struct.unpack_from('<i', data, offset)[0]
+                linear = struct.unpack_from(f'<{n_intv}Q', data, offset + 4)
+                offset += 4 + 8 * n_intv
+            self.bins.append(bins)
+            self.linear.append(linear)
+            self.mapped.append(mapped)
+        # Records without a position (optional trailing count)
+        self.unplaced = struct.unpack_from('<Q', data, offset)[0] if len(data) >= offset + 8 else None
+
+    def leaf_windows(self, ref):
+        """(start, end) of the smallest-bin windows of ref that hold records"""
+        first_leaf = ((1 << (self.depth * 3)) - 1) // 7
+        size = 1 << self.min_shift
+        return [((b - first_leaf) * size, (b - first_leaf + 1) * size)
+                for b in sorted(self.bins[ref]) if b >= first_leaf]
+
+    def chunks(self, ref, start, end):
+        """Merged (start, end) virtual offset chunks that may hold [start, end) on ref"""
+        bins = self.bins[ref]
+        linear = self.linear[ref]
+        end = min(end, 1 << (self.min_shift + self.depth * 3))
+        min_offset = 0
+        if linear:
+            window = min(start >> TBI_MIN_SHIFT, len(linear) - 1)
+            min_offset = linear[window]
+        chunks = sorted(chunk for b in reg2bins(start, end, self.min_shift, self.depth)
+                        for chunk in bins.get(b, ()) if chunk[1] > min_offset)
+        merged = []
+        for chunk_start, chunk_end in chunks:
+            if merged and chunk_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], chunk_end)
+            else:
+                merged.append([chunk_start, chunk_end])
+        return merged
+
+
+def find_index(path):
+    """The .tbi or .csi next to a VCF/BCF, or None"""
+    for suffix in ('.csi', '.tbi') if is_bcf(path) else ('.tbi', '.csi'):
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return None
+
+
+class BgzfVcf:
+    """Sequential reading of a bgzipped VCF or BCF by virtual offset: the
+    header, then records from any record boundary with the offset each
+    starts at"""
+
+    def __init__(self, path):
+        self.path = path
+        self.bcf = is_bcf(path)
+        self._reader = BgzfReader(path)
+        self._read_header()
+        # Virtual offset of the first record
+        self.data_offset = self._reader.tell()
+
+    def _read_header(self):
+        reader = self._reader
+        reader.seek(0)
+        if self.bcf:
+            if reader.read(5) != BCF_MAGIC:
+                raise ValueError(f"{self.path}: not a BCF 2.2 file")
+            (l_text,) = struct.unpack('<I', reader.read(4))
+            self.header = BcfHeader(reader.read(l_text).decode())
+            self.meta, self.column_line = self.header.meta, self.header.column_line
+            return
+        self.meta = []
+        self.column_line = ''
+        while True:
+            offset = reader.tell()
+            line = reader.readline()
+            if not line.startswith(b'#'):
+                # Leave the reader at the first record
+                reader.seek(offset)
+                break
+            if line.startswith(b'##'):
+                self.meta.append(line.decode())
+            else:
+                self.column_line = line.decode()
+                break
+
+    def records_from(self, offset):
+        """(record, virtual offset it starts at) from offset to the end of the file"""
+        self._reader.seek(offset)
+        return self._records(float('inf'))
+
+    def tell(self):
+        return self._reader.tell()
+
+    def site(self, record):
+        """(contig, position) key of a record, comparable between records of one file"""
+        if self.bcf:
+            return record.chrom, record.pos
+        return tuple(record.split(b'\t', 2)[:2])
+
+    def _records(self, chunk_end):
+        reader = self._reader
+        while True:
+            offset = reader.tell()
+            if offset >= chunk_end:
+                return
+            if self.bcf:
+                lengths = reader.read(8)
+                if len(lengths) < 8:
+                    return
+                l_shared, l_indiv = struct.unpack('<II', lengths)
+                view = memoryview(reader.read(l_shared + l_indiv))
+                yield BcfRecord(self.header, view[:l_shared], view[l_shared:]), offset
+            else:
+                line = reader.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield line, offset
+
+    def close(self):
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class IndexedVcf(BgzfVcf):
+    """Region queries on a bgzipped VCF or BCF through its index"""
+
+    def __init__(self, path, index_path=None):
+        index_path = index_path or find_index(path)
+        if index_path is None:
+            raise ValueError(f"{path}: no .tbi or .csi index found (create one with bcftools index)")
+        self.index = VcfIndex(index_path)
+        super().__init__(path)
+        names = self.index.names if self.index.names is not None else self.header.contigs
+        self._refs = {normalize_contig(name): i for i, name in enumerate(names) if name is not None}
+
+    def has_contig(self, contig):
+        return normalize_contig(contig) in self._refs
+
+    def chunk_bytes(self, contig, start, end):
+        """Compressed bytes a region query would read (for balancing scatter groups)"""
+        ref = self._refs.get(normalize_contig(contig))
+        if ref is None:
+            return 0
+        return sum((e >> 16) - (s >> 16) + 1 for s, e in self.index.chunks(ref, start, end))
+
+    def fetch(self, regions):
+        """Records overlapping the regions, each once, in file order: raw lines
+        (bytes) for VCF, BcfRecord objects for BCF"""
+        queries = sorted((self._refs[normalize_contig(contig)], start, end)
+                         for contig, start, end in regions.intervals() if self.has_contig(contig))
+        done = 0
+        for ref, start, end in queries:
+            for chunk_start, chunk_end in self.index.chunks(ref, start, end):
+                if chunk_end <= done:
+                    continue
+                self._reader.seek(max(chunk_start, done))
+                for record, offset in self._records(chunk_end):
+                    record_ref = self._contig_of(record)
+                    position, record_end = self._span(record)
+                    if record_ref != ref or position >= end:
+                        # Sorted: nothing further in this chunk overlaps the region
+                        done = offset
+                        break
+                    if record_end > start:
+                        yield record
+                else:
+                    done = max(done, chunk_end)
+
+    def _span(self, record):
+        if self.bcf:
+            return record.pos, record.pos + record.rlen
+        fields = record.split(b'\t', 4)
+        position = int(fields[1]) - 1
+        return position, position + len(fields[3])
+
+    def _contig_of(self, record):
+        if self.bcf:
+            return self._refs.get(normalize_contig(self.header.contigs[record.chrom]))
+        return self._refs.get(normalize_contig(record.split(b'\t', 1)[0].decode()))
+
+
+def extract_records(path, regions, output, site_filter=None):
+    """Write the records of an indexed VCF/BCF overlapping regions (and kept
+    by site_filter, if given) to a VCF; returns the count"""
+    records = 0
+    with IndexedVcf(path) as vcf:
+        opener = gzip.open if output.endswith('.gz') else open
+        with opener(output, 'wt') as out:
+            out.write(''.join(vcf.meta) + vcf.column_line)
+            for record in vcf.fetch(regions):
+                if site_filter is not None and not site_filter.keep_record(record):
+                    continue
+                out.write(record.to_text() + '\n' if vcf.bcf else record.decode())
+                records += 1
+    return records
+
+
+def cmd_extract(args):
+    regions = read_regions(args.regions)
+    if args.chain:
+        regions = source_regions(ChainIndex.from_file(args.chain), regions)
+    print(f"Reading {len(regions)} source intervals ({regions.total_length():,} bp) from {args.input}")
+    records = extract_records(args.input, regions, args.output, site_filter_from_args(args))
+    print(f"Extracted {records} records to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read the records of an indexed VCF/BCF that overlap regions')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    extract = subparsers.add_parser('extract', help='Write the records overlapping regions as VCF')
+    extract.add_argument('input', help='bgzipped VCF or BCF with a .tbi/.csi index')
+    extract.add_argument('--regions', required=True, help="BED file or 'chr1,chr2:1000-2000'")
+    extract.add_argument('--chain', help='Regions are target coordinates: map them back through this chain')
+    extract.add_argument('-o', '--output', required=True, help='Output VCF (.gz for gzip)')
+    add_filter_arguments(extract)
+
+    args = parser.parse_args()
+    try:
+        cmd_extract(args)
+    except (OSError, ValueError) as e:
+        sys.exit(f"ERROR: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+"""
+Output Parity Check
+===================
+Compare two sorted VCF/BCF files record by record, e.g. the final VCFs of
+the same input before and after a tooling or chain change. Both files are
+read once, side by side: records are grouped by position and matched within
+a position on normalized keys (contig without 'chr', POS, upper-case REF and
+ALT), so only the records at the current position are held in memory.
+Contigs are ranked once, from both headers (and the target .fai with
+--fasta), as for the cohort merge, so files declaring different contig
+subsets still compare in one order.
+
+Matched records are compared on ID, QUAL, FILTER, INFO and FORMAT (with the
+sample columns), normalized so equivalent text compares equal: QUAL as a
+number, FILTER values and INFO entries in sorted order. --ignore-fields
+leaves fields out; --sites-only compares keys alone.
+
+Per contig, each file gets a digest: the sum of the hashes of its normalized
+records, which does not depend on how ties at one position were ordered.
+The report lists counts, the digests and the first --max-diffs differences;
+the exit status is 1 when the files differ, for CI.
+
+Usage:
+    vcf_parity.py old/sample1.hg38.vcf.gz new/sample1.hg38.vcf.gz --max-diffs 20 -o parity.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+from bcf import BcfReader, is_bcf
+from chain_utils import normalize_contig
+from fasta import load_fai, read_fai
+from merge_cohort import ContigOrder
+from profiling import profile_main
+from stage_trace import StageTrace
+
+# FORMAT stands for the FORMAT column and the sample columns
+COMPARED_FIELDS = ('ID', 'QUAL', 'FILTER', 'INFO', 'FORMAT')
+DEFAULT_MAX_DIFFS = 10
+DIGEST_MODULUS = 1 << 128
+# Longest field value quoted in a difference
+MAX_VALUE_CHARS = 80
+
+
+def _normalize_qual(value):
+    if value == b'.':
+        return value
+    try:
+        return repr(float(value)).encode()
+    except ValueError:
+        return value
+
+
+def _normalize_list(value):
+    return b';'.join(sorted(value.split(b';'))) if b';' in value else value
+
+
+class ParityInput:
+    """One sorted VCF/BCF read as groups of normalized records per position"""
+
+    def __init__(self, path, compared):
+        self.path = path
+        self.compared = compared
+        self.records = 0
+        # contig: [records, digest]
+        self.contigs = {}
+        if is_bcf(path):
+            self._reader = BcfReader(path)
+            header = self._reader.header
+            meta, self.samples = header.meta, header.samples
+            self._lines = (record.to_text().encode() for record in self._reader)
+        else:
+            self._reader = gzip.open(path, 'rb') if path.endswith(('.gz', '.bgz')) else open(path, 'rb')
+            meta, self.samples = self._read_header()
+            self._lines = self._reader
+        # Declared contigs, normalized, in header order
+        self.declared = [normalize_contig(line[13:].split(',', 1)[0].split('>', 1)[0].rstrip('\r\n'))
+                         for line in meta if line.startswith('##contig=<ID=')]
+
+    def _read_header(self):
+        meta = []
+        for line in self._reader:
+            if line.startswith(b'##'):
+                meta.append(line.decode())
+            elif line.startswith(b'#CHROM'):
+                return meta, line.rstrip(b'\r\n').decode().split('\t')[9:]
+        raise ValueError(f"{self.path}: no #CHROM header line found")
+
+    def groups(self, contig_order):
+        """(position key, contig, pos, [(allele key, compared values)]) per position,
+        keyed by contig_order, the ContigOrder shared by both files"""
+        wanted = [COMPARED_FIELDS.index(name) for name in self.compared]
+        blake2b = hashlib.blake2b
+        position, group = None, []
+        contig_bytes = contig = rank = counts = None
+        for line in self._lines:
+            line = line.rstrip(b'\r\n')
+            if not line:
+                continue
+            fields = line.split(b'\t', 8)
+            if len(fields) < 5:
+                raise ValueError(f"{self.path}: malformed record: {line[:80].decode(errors='replace')}")
+            if fields[0] != contig_bytes:
+                contig_bytes, contig = fields[0], fields[0].decode()
+                name = normalize_contig(contig)
+                rank = contig_order.add(name)
+                counts = self.contigs.setdefault(name, [0, 0])
+            key = (rank, int(fields[1]))
+            if key != position:
+                if group:
+                    yield position, position_contig, position[1], group
+                if position is not None and key < position:
+                    raise ValueError(f"{self.path}: records are not sorted at {contig}:{fields[1].decode()}")
+                position, position_contig, group = key, contig, []
+            fields += [b''] * (9 - len(fields))
+            normalized = (fields[2], _normalize_qual(fields[5]), _normalize_list(fields[6]),
+                          _normalize_list(fields[7]), fields[8])
+            alleles = (fields[3].upper(), fields[4].upper())
+            values = tuple(normalized[i] for i in wanted)
+            group.append((alleles, values))
+
+            # Per-contig count and order-independent digest
+            counts[0] += 1
+            digest = blake2b(b'\t'.join((fields[1],) + alleles + values), digest_size=16).digest()
+            counts[1] = (counts[1] + int.from_bytes(digest, 'little')) % DIGEST_MODULUS
+        self.records = sum(counts[0] for counts in self.contigs.values())
+        if group:
+            yield position, position_contig, position[1], group
+
+    def close(self):
+        self._reader.close()
+
+
+class ParityReport:
+    """Counts and the first differences of a comparison"""
+
+    def __init__(self, compared, samples, max_diffs):
+        self.compared = compared
+        self.samples = samples
+        self.max_diffs = max_diffs
+        self.counts = dict.fromkeys(('identical', 'differing', 'only_in_a', 'only_in_b'), 0)
+        self.differences = []
+
+    def add(self, kind, contig, pos, alleles, fields=None):
+        self.counts[kind] += 1
+        if len(self.differences) < self.max_diffs:
+            difference = {'type': kind, 'chrom': contig, 'pos': pos,
+                          'ref': alleles[0].decode(), 'alt': alleles[1].decode()}
+            if fields is not None:
+                difference['fields'] = fields
+            self.differences.append(difference)
+
+    def match(self, contig, pos, group_a, group_b):
+        """Pair the records of one position present in both files"""
+        pending = {}
+        for alleles, values in group_a:
+            pending.setdefault(alleles, []).append(values)
+        for alleles, values in group_b:
+            candidates = pending.get(alleles)
+            if not candidates:
+                self.add('only_in_b', contig, pos, alleles)
+            elif values in candidates:
+                candidates.remove(values)
+                self.counts['identical'] += 1
+            else:
+                self.add('differing', contig, pos, alleles, self._changed(candidates.pop(0), values))
+        for alleles, remaining in pending.items():
+            for _ in remaining:
+                self.add('only_in_a', contig, pos, alleles)
+
+    def _changed(self, values_a, values_b):
+        """{field: [value in A, value in B]} of the fields that differ"""
+        changed = {}
+        for name, a, b in zip(self.compared, values_a, values_b):
+            if a == b:
+                continue
+            if name == 'FORMAT':
+                changed.update(self._changed_samples(a, b))
+            else:
+                changed[name] = [_shorten(a), _shorten(b)]
+        return changed
+
+    def _changed_samples(self, a, b):
+        cells_a, cells_b = a.split(b'\t'), b.split(b'\t')
+        if cells_a[0] != cells_b[0] or len(cells_a) != len(cells_b):
+            return {'FORMAT': [_shorten(a), _shorten(b)]}
+        names = ['FORMAT'] + self.samples
+        return {names[i] if i < len(names) else f"column {i + 9}": [_shorten(x), _shorten(y)]
+                for i, (x, y) in enumerate(zip(cells_a, cells_b)) if x != y}
+
+
+def _shorten(value):
+    text = value.decode(errors='replace')
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS] + '...'
+
+
+def compare_vcfs(path_a, path_b, max_diffs=DEFAULT_MAX_DIFFS, ignore=(), trace=None, reference=()):
+    """Parity report of two sorted VCF/BCF files. reference is the target's
+    contig names, in .fai order, if known."""
+    compared = tuple(name for name in COMPARED_FIELDS if name not in ignore)
+    trace = trace or StageTrace('vcf_parity', None)
+    a = ParityInput(path_a, compared)
+    b = ParityInput(path_b, compared)
+    report = ParityReport(compared, a.samples, max_diffs)
+    try:
+        # One contig order for both files, from both headers, before any record
+        contig_order = ContigOrder([a.declared, b.declared], reference)
+        with trace.stage('compare') as stage:
+            groups_a, groups_b = a.groups(contig_order), b.groups(contig_order)
+            group_a, group_b = next(groups_a, None), next(groups_b, None)
+            while group_a is not None or group_b is not None:
+                if group_b is None or (group_a is not None and group_a[0] < group_b[0]):
+                    _, contig, pos, records = group_a
+                    for alleles, _ in records:
+                        report.add('only_in_a', contig, pos, alleles)
+                    group_a = next(groups_a, None)
+                elif group_a is None or group_b[0] < group_a[0]:
+                    _, contig, pos, records = group_b
+                    for alleles, _ in records:
+                        report.add('only_in_b', contig, pos, alleles)
+                    group_b = next(groups_b, None)
+                else:
+                    report.match(group_a[1], group_a[2], group_a[3], group_b[3])
+                    group_a, group_b = next(groups_a, None), next(groups_b, None)
+            stage.records = a.records + b.records
+    finally:
+        a.close()
+        b.close()
+
+    contigs = []
+    for name in sorted(set(a.contigs) | set(b.contigs), key=contig_order.add):
+        records_a, digest_a = a.contigs.get(name, (0, 0))
+        records_b, digest_b = b.contigs.get(name, (0, 0))
+        contigs.append({'contig': name, 'records_a': records_a, 'records_b': records_b,
+                        'digest_a': f"{digest_a:032x}", 'digest_b': f"{digest_b:032x}",
+                        'match': records_a == records_b and digest_a == digest_b})
+    counts = report.counts
+    return {
+        'a': path_a,
+        'b': path_b,
+        'compared_fields': list(compared),
+        'samples_match': a.samples == b.samples,
+        'records_a': a.records,
+        'records_b': b.records,
+        **counts,
+        'parity': (a.samples == b.samples or 'FORMAT' not in compared)
+                  and counts['differing'] == counts['only_in_a'] == counts['only_in_b'] == 0,
+        'contigs': contigs,
+        'differences': report.differences,
+    }
+
+
+def print_report(report):
+    print(f"Parity: {report['a']} (A) vs {report['b']} (B)")
+    print(f"  Records: A {report['records_a']:,}, B {report['records_b']:,}")
+    print(f"  Identical {report['identical']:,}, differing {report['differing']:,}, "
+          f"only in A {report['only_in_a']:,}, only in B {report['only_in_b']:,}")
+    if not report['samples_match']:
+        print("  Sample columns differ")
+    print("  Per-contig digests:")
+    for contig in report['contigs']:
+        status = 'match' if contig['match'] else 'DIFFER'
+        print(f"    {contig['contig']:<8} {contig['records_a']:>12,} {contig['records_b']:>12,}  {status}")
+    if report['differences']:
+        print(f"  First {len(report['differences'])} differences:")
+        for difference in report['differences']:
+            site = f"{difference['chrom']}:{difference['pos']} {difference['ref']}>{difference['alt']}"
+            detail = ', '.join(difference.get('fields', {}))
+            print(f"    {difference['type']:<10} {site}" + (f"  {detail}" if detail else ''))
+    print(f"RESULT: {'PARITY' if report['parity'] else 'MISMATCH'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two sorted VCF/BCF files record by record')
+    parser.add_argument('a', help='First sorted VCF/BCF (e.g. the previous output)')
+    parser.add_argument('b', help='Second sorted VCF/BCF (e.g. the new output)')
+    parser.add_argument('--max-diffs', type=int, default=DEFAULT_MAX_DIFFS,
+                        help=f'Differences listed in the report (default: {DEFAULT_MAX_DIFFS})')
+    parser.add_argument('--ignore-fields', default='',
+                        help=f"Comma-separated fields not compared, of {','.join(COMPARED_FIELDS)} "
+                             "(FORMAT covers the sample columns)")
+    parser.add_argument('--sites-only', action='store_true', help='Compare CHROM, POS, REF and ALT only')
+    parser.add_argument('--fasta', help='Target FASTA: contigs are ordered as in its .fai (used, or built)')
+    parser.add_argument('--fai', help='Explicit .fai file for the contig order')
+    parser.add_argument('--output', '-o', help='JSON report')
+    parser.add_argument('--trace', help='Append per-stage trace (JSON lines) to this file')
+    args = parser.parse_args()
+
+    ignore = {name.strip().upper() for name in args.ignore_fields.split(',') if name.strip()}
+    unknown = ignore - set(COMPARED_FIELDS)
+    if unknown:
+        parser.error(f"unknown fields: {', '.join(sorted(unknown))}")
+    if args.sites_only:
+        ignore = set(COMPARED_FIELDS)
+    for path in (args.a, args.b):
+        if not os.path.exists(path):
+            sys.exit(f"ERROR: File not found: {path}")
+
+    if args.fasta:
+        reference = [entry.name for entry in load_fai(args.fasta, args.fai)]
+    elif args.fai:
+        reference = [entry.name for entry in read_fai(args.fai)]
+    else:
+        reference = []
+
+    try:
+        report = compare_vcfs(args.a, args.b, args.max_diffs, ignore, StageTrace('vcf_parity', args.trace),
+                              reference)
+    except ValueError as e:
+        sys.exit(f"ERROR: {e}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print_report(report)
+    if not report['parity']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profile_main('vcf_parity', main)
@@ -17,6 +17,9 @@ PROFILE="test,singularity"
 TARGET_FASTA="/cbio/dbs/references/GRCh38_reference_genome/GRCh38_full_analysis_set_plus_decoy_hla.fa"
 VALIDATE_OUTPUT="false"
 BASE_PATH="/users/mamana/chiptimptation-liftover"
+# Baseline final VCFs (PARITY_BASELINE/<test_name>/) compared record by record
+# with each test's output; missing baselines are saved from this run
+PARITY_BASELINE="${PARITY_BASELINE:-}"
 
 # Counters
 TOTAL_TESTS=0
@@ -89,7 +92,12 @@ run_test() {
                 print_status "WARNING" "  - Low success rate: $success_rate%"
             fi
             
-            PASSED_TESTS=$((PASSED_TESTS + 1))
+            if [ -n "$PARITY_BASELINE" ] && ! check_parity "$test_name"; then
+                print_status "ERROR" "Test $TOTAL_TESTS FAILED - Output differs from the baseline"
+                FAILED_TESTS=$((FAILED_TESTS + 1))
+            else
+                PASSED_TESTS=$((PASSED_TESTS + 1))
+            fi
         else
             print_status "ERROR" "Test $TOTAL_TESTS FAILED - No results generated"
             FAILED_TESTS=$((FAILED_TESTS + 1))
@@ -103,6 +111,28 @@ run_test() {
     echo "----------------------------------------"
 }
 
+# Function to compare a test's final VCFs with its baseline
+check_parity() {
+    local test_name=$1
+    local baseline="$PARITY_BASELINE/$test_name"
+
+    if [ ! -d "$baseline" ]; then
+        mkdir -p "$baseline"
+        cp test_results/final/*.vcf.gz "$baseline"/
+        print_status "INFO" "  - Saved parity baseline: $baseline"
+        return 0
+    fi
+    if python3 bin/benchmark_liftover.py parity \
+        --baseline-dir "$baseline" \
+        --current-dir test_results/final \
+        --output "test_${TOTAL_TESTS}_${test_name}.parity.json"; then
+        print_status "SUCCESS" "  - Output matches the baseline"
+        return 0
+    fi
+    print_status "INFO" "  - See test_${TOTAL_TESTS}_${test_name}.parity.json for the first differences"
+    return 1
+}
+
 # Function to verify test data exists
 verify_test_data() {
     print_status "INFO" "Verifying test data exists..."
@@ -82,6 +82,7 @@ required_files=(
     "dev_docs/test_data/samples.csv"
     "bin/check_vcf.py"
     "bin/generate_stats.py"
+    "bin/liftover-tools"
 )
 
 for file in "${required_files[@]}"; do
@@ -171,6 +172,14 @@ else
     print_status "FAIL" "Statistics generation script has issues"
 fi
 
+for subcommand in resolve check-input validate stats lift; do
+    if python3 bin/liftover-tools $subcommand --help >/dev/null 2>&1; then
+        print_status "PASS" "liftover-tools $subcommand is functional"
+    else
+        print_status "FAIL" "liftover-tools $subcommand has issues"
+    fi
+done
+
 # Test 8: Documentation check
 print_status "INFO" "Checking documentation..."
 
@@ -0,0 +1,289 @@
+#!/bin/bash
+
+# chiptimputation-vcf-liftover Python Tool Tests
+# ==============================================
+# Regression checks of the bin/ tools on dev_docs/test_data and small
+# generated files; no Nextflow or containers needed. Run from the repository
+# root: ./dev_docs/test_tools.sh
+
+# Colors for output
+RED='\033[0;31m'
+GREEN='\033[0;32m'
+YELLOW='\033[1;33m'
+NC='\033[0m' # No Color
+
+PROJECT_DIR="$(cd "$(dirname "$0")/.." && pwd)"
+TOOLS="python3 $PROJECT_DIR/bin/liftover-tools"
+TEST_DATA="$PROJECT_DIR/dev_docs/test_data"
+WORK_DIR="$(mktemp -d)"
+trap 'rm -rf "$WORK_DIR"' EXIT
+FAILED=0
+
+# Function to print colored output
+print_status() {
+    local status=$1
+    local message=$2
+    case $status in
+        "PASS")
+            echo -e "${GREEN}[PASS]${NC} $message"
+            ;;
+        "FAIL")
+            echo -e "${RED}[FAIL]${NC} $message"
+            FAILED=$((FAILED + 1))
+            ;;
+        "INFO")
+            echo -e "${YELLOW}[INFO]${NC} $message"
+            ;;
+    esac
+}
+
+# Function to check if command exists
+command_exists() {
+    command -v "$1" >/dev/null 2>&1
+}
+
+# Test 1: A killed checkpointed lift resumes from another work directory
+print_status "INFO" "Testing lift checkpoints across work directories..."
+
+mkdir -p "$WORK_DIR/resume/first" "$WORK_DIR/resume/retry"
+# Checkpoints need BGZF input; the test data is plain gzip
+python3 -c "
+import gzip, sys
+sys.path.insert(0, '$PROJECT_DIR/bin')
+from bgzf import BgzfWriter
+with gzip.open('$TEST_DATA/medium_multi_chr.vcf.gz', 'rb') as src, BgzfWriter('$WORK_DIR/resume/in.vcf.gz') as out:
+    out.write(src.read())
+"
+for dir in first retry; do
+    ln -s "$WORK_DIR/resume/in.vcf.gz" "$TEST_DATA/hg38_chr22.fa" \
+        "$PROJECT_DIR/chains/hg19ToHg38.over.chain.gz" "$WORK_DIR/resume/$dir/"
+done
+lift_args="in.vcf.gz -c hg19ToHg38.over.chain.gz -r hg38_chr22.fa -o out.vcf
+    --checkpoint-dir $WORK_DIR/resume/checkpoint"
+
+# The first attempt dies after its first shard (chromosome 21)
+(cd "$WORK_DIR/resume/first" && python3 - $lift_args >/dev/null 2>&1 <<EOF
+import sys
+sys.path.insert(0, '$PROJECT_DIR/bin')
+import checkpoint, lift_vcf
+commit = checkpoint.LiftCheckpoint.commit
+def commit_then_die(self, *args):
+    commit(self, *args)
+    if len(self.shards) == 1:
+        sys.exit(137)
+checkpoint.LiftCheckpoint.commit = commit_then_die
+sys.argv = ['lift_vcf.py'] + sys.argv[1:]
+lift_vcf.main()
+EOF
+)
+if (cd "$WORK_DIR/resume/retry" && $TOOLS lift $lift_args 2>&1) | grep -q "Resuming after 1 finished shards"; then
+    print_status "PASS" "Retried lift resumed after the first shard from a new work directory"
+else
+    print_status "FAIL" "Retried lift did not resume from the checkpoint"
+fi
+
+# Test 2: The CrossMap API log records CrossMap's mapping counts
+print_status "INFO" "Testing the batch CrossMap log..."
+
+mkdir -p "$WORK_DIR/crossmap_log"
+python3 - <<EOF
+import logging, sys
+sys.path.insert(0, '$PROJECT_DIR/bin')
+from batch_liftover import lift_sample, load_crossmap
+chain = '$PROJECT_DIR/chains/hg19ToHg38.over.chain.gz'
+lifter = load_crossmap(chain)
+if lifter is None:
+    # CrossMap not installed: a stand-in that logs its counts the way mapvcf does
+    def crossmap_vcf_file(**kwargs):
+        logging.info("Total entries: %d", 20)
+        logging.info("Failed to map: %d", 20)
+    lifter = None, crossmap_vcf_file
+lift_sample(lifter, chain, '$TEST_DATA/medium_multi_chr.vcf.gz', '$TEST_DATA/hg38_chr22.fa',
+            '$WORK_DIR/crossmap_log/s1.crossmap.vcf', '$WORK_DIR/crossmap_log/s1.crossmap.log')
+assert logging.getLogger().level == logging.WARNING, 'root logger level not restored'
+EOF
+if grep -q "Total entries" "$WORK_DIR/crossmap_log/s1.crossmap.log" && \
+        grep -q "Failed to map" "$WORK_DIR/crossmap_log/s1.crossmap.log"; then
+    print_status "PASS" "CrossMap log records total and unmapped entries"
+else
+    print_status "FAIL" "CrossMap log is missing its mapping counts"
+fi
+
+# Inputs declaring different contig subsets (as --contig_header seen writes them)
+mkdir -p "$WORK_DIR/contigs"
+write_subset_vcf() {
+    local file=$1 sample=$2
+    shift 2
+    {
+        echo "##fileformat=VCFv4.2"
+        for contig in $CONTIGS; do echo "##contig=<ID=$contig>"; done
+        printf '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t%s\n' "$sample"
+        for site in "$@"; do
+            printf '%s\t%s\t.\tA\tG\t.\tPASS\t.\tGT\t0/1\n' "${site%:*}" "${site#*:}"
+        done
+    } > "$WORK_DIR/contigs/$file"
+}
+CONTIGS="chr1 chr3" write_subset_vcf a.vcf A chr1:5 chr3:5
+CONTIGS="chr2 chr3" write_subset_vcf b.vcf B chr2:5 chr3:7
+CONTIGS="chr1 chr2" write_subset_vcf c.vcf C chr1:9 chr2:9
+
+# Test 3: Cohort merge of inputs declaring different contig subsets
+print_status "INFO" "Testing the cohort merge contig order..."
+
+if $TOOLS merge "$WORK_DIR"/contigs/{a,b,c}.vcf --max-open 2 -o "$WORK_DIR/contigs/cohort.vcf.gz" >/dev/null && \
+        [ "$(gzip -dc "$WORK_DIR/contigs/cohort.vcf.gz" | grep -v '^#' | cut -f1 | uniq | tr '\n' ' ')" = "chr1 chr2 chr3 " ]; then
+    print_status "PASS" "Merged inputs with differing ##contig lines in one contig order"
+else
+    print_status "FAIL" "Cohort merge of inputs with differing ##contig lines failed"
+fi
+
+# Test 4: Parity check of files declaring different contig subsets
+print_status "INFO" "Testing the parity check contig order..."
+
+CONTIGS="chr1 chr3" write_subset_vcf p1.vcf A chr1:5 chr3:5
+CONTIGS="chr2 chr3" write_subset_vcf p2.vcf A chr2:5 chr3:5
+$TOOLS parity "$WORK_DIR/contigs/p1.vcf" "$WORK_DIR/contigs/p2.vcf" -o "$WORK_DIR/contigs/parity.json" >/dev/null
+if python3 -c "
+import json, sys
+report = json.load(open('$WORK_DIR/contigs/parity.json'))
+sys.exit(not (report['identical'], report['only_in_a'], report['only_in_b']) == (1, 1, 1))
+" 2>/dev/null; then
+    print_status "PASS" "Parity check compared files with differing ##contig lines"
+else
+    print_status "FAIL" "Parity check of files with differing ##contig lines failed"
+fi
+
+# Test 5: Declaring all reference contigs keeps declared contigs the .fai lacks
+print_status "INFO" "Testing the contig header fix..."
+
+printf 'chr1\t100\t6\t60\t61\nchr2\t100\t6\t60\t61\n' > "$WORK_DIR/contigs/ref.fa.fai"
+sed 's/^##contig=<ID=chr3>$/##contig=<ID=chr3,length=50>/' "$WORK_DIR/contigs/a.vcf" | \
+    $TOOLS contig-header --fasta "$WORK_DIR/contigs/ref.fa" --fai "$WORK_DIR/contigs/ref.fa.fai" \
+        --contigs all -o "$WORK_DIR/contigs/fixed.vcf.gz" >/dev/null
+if [ "$(gzip -dc "$WORK_DIR/contigs/fixed.vcf.gz" | grep '^##contig' | tr '\n' ' ')" = \
+        "##contig=<ID=chr1,length=100> ##contig=<ID=chr2,length=100> ##contig=<ID=chr3,length=50> " ]; then
+    print_status "PASS" "Contig header fix kept the declared contig missing from the .fai"
+else
+    print_status "FAIL" "Contig header fix dropped a declared contig missing from the .fai"
+fi
+
+# Test 6: The contig header fix renames CrossMap output in the same pass
+print_status "INFO" "Testing contig renaming in the contig header fix..."
+
+printf 'chr1\t1\nchr3\t3\n' > "$WORK_DIR/contigs/mapping.txt"
+printf '1\t100\t6\t60\t61\n2\t100\t6\t60\t61\n3\t100\t6\t60\t61\n' > "$WORK_DIR/contigs/plain.fa.fai"
+$TOOLS contig-header "$WORK_DIR/contigs/a.vcf" --fasta "$WORK_DIR/contigs/plain.fa" \
+    --fai "$WORK_DIR/contigs/plain.fa.fai" --contigs seen --chr-mapping "$WORK_DIR/contigs/mapping.txt" \
+    -o "$WORK_DIR/contigs/renamed.vcf.gz" >/dev/null
+if [ "$(gzip -dc "$WORK_DIR/contigs/renamed.vcf.gz" | grep -v '^#CHROM' | grep -E '^(##contig|[^#])' | cut -f1 | tr '\n' ' ')" = \
+        "##contig=<ID=1,length=100> ##contig=<ID=3,length=100> 1 3 " ]; then
+    print_status "PASS" "Contig header fix renamed header and record contigs"
+else
+    print_status "FAIL" "Contig header fix did not rename contigs"
+fi
+
+# Test 7: Cohort merge recomputes allele counts whatever the input order
+print_status "INFO" "Testing cohort merge allele counts..."
+
+mkdir -p "$WORK_DIR/counts"
+write_count_vcf() {
+    printf '##fileformat=VCFv4.2\n##contig=<ID=chr1>\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t%s\nchr1\t5\t.\tA\tG\t.\tPASS\t%s\tGT\t%s\n' \
+        "$1" "$2" "$3" > "$WORK_DIR/counts/$1.vcf"
+}
+write_count_vcf A "AC=2;AN=2;AF=1" "1/1"
+write_count_vcf B "AC=0;AN=2;AF=0" "0/0"
+$TOOLS merge "$WORK_DIR"/counts/{A,B}.vcf -o "$WORK_DIR/counts/ab.vcf.gz" >/dev/null
+$TOOLS merge "$WORK_DIR"/counts/{B,A}.vcf -o "$WORK_DIR/counts/ba.vcf.gz" >/dev/null
+if [ "$(gzip -dc "$WORK_DIR/counts/ab.vcf.gz" | grep -v '^#' | cut -f8)" = "AC=2;AN=4;AF=0.5" ] && \
+        [ "$(gzip -dc "$WORK_DIR/counts/ba.vcf.gz" | grep -v '^#' | cut -f8)" = "AC=2;AN=4;AF=0.5" ]; then
+    print_status "PASS" "Merged AC/AN/AF describe the cohort in either input order"
+else
+    print_status "FAIL" "Merged AC/AN/AF were copied from one input"
+fi
+
+# Test 8: Size estimates need BGZF blocks; lift memory keeps the fixed floor
+print_status "INFO" "Testing input size estimates..."
+
+if python3 - <<EOF
+import gzip, sys
+sys.path.insert(0, '$PROJECT_DIR/bin')
+from bgzf import BgzfWriter
+from size_estimate import MIN_LIFT_MB, estimate_size
+with gzip.open('$TEST_DATA/medium_multi_chr.vcf.gz', 'rb') as src, BgzfWriter('$WORK_DIR/sized.vcf.gz') as out:
+    out.write(src.read())
+assert estimate_size('$TEST_DATA/medium_multi_chr.vcf.gz') is None, 'plain gzip was estimated'
+estimate = estimate_size('$WORK_DIR/sized.vcf.gz')
+assert estimate['est_records'] > 0 and estimate['lift_memory_mb'] >= MIN_LIFT_MB, estimate
+EOF
+then
+    print_status "PASS" "Plain gzip falls back to fixed requests, BGZF input is estimated"
+else
+    print_status "FAIL" "Input size estimates are wrong"
+fi
+
+# Test 9: Lifting through a reverse-strand chain with --normalize and --multiallelics
+print_status "INFO" "Testing the normalizing lift on a reverse-strand chain..."
+
+# chr22:16299001-16701000 maps reversed onto chrR; the reference has the source
+# alleles of the test records, with repeats after the indels
+mkdir -p "$WORK_DIR/normalize"
+python3 - <<EOF
+length, offset = 402000, 16299000
+source = ['C'] * length
+for pos, seq in ((16300000, 'G'), (16400000, 'C'), (16500000, 'ATTT'), (16600000, 'GAA'), (16700000, 'CATAT')):
+    source[pos - 1 - offset:pos - 1 - offset + len(seq)] = seq
+reference = ''.join(reversed(source)).translate(str.maketrans('ACGT', 'TGCA'))
+with open('$WORK_DIR/normalize/rev.fa', 'w') as f:
+    f.write('>chrR\n' + ''.join(reference[i:i + 60] + '\n' for i in range(0, length, 60)))
+with open('$WORK_DIR/normalize/rev.chain', 'w') as f:
+    f.write(f'chain 1000 22 51304566 + {offset} {offset + length} chrR {length} - 0 {length} 1\n{length}\n\n')
+EOF
+(gzip -dc "$TEST_DATA/multiallelic.vcf.gz" | grep '^#'
+ printf '22\t16300000\trsM\tG\tA,T\t50\tPASS\tAC=1,1;AF=0.25,0.25;AN=4;DP=30\tGT:DP:GQ\t1/2:42:27\t0/1:15:45\n') \
+    > "$WORK_DIR/normalize/multi.vcf"
+lift_records() {
+    $TOOLS lift "$1" -c "$WORK_DIR/normalize/rev.chain" -r "$WORK_DIR/normalize/rev.fa" \
+        -o "$WORK_DIR/normalize/out.vcf" --normalize --multiallelics "$2" >/dev/null 2>&1 && \
+        grep -v '^#' "$WORK_DIR/normalize/out.vcf"
+}
+
+if diff <(lift_records "$TEST_DATA/multiallelic.vcf.gz" join) - >/dev/null <<EOF
+R	401001	rs6266800;rs1180938	C	T,A	59	PASS	AC=3,1;AF=0.813,0.349;AN=4;DP=30	GT:DP:GQ	0/2:42:27	0/1:15:45
+R	301001	rs2111114	G	A	24	PASS	AC=2;AF=0.582;AN=4;DP=30	GT:DP:GQ	1/1:25:27	0/0:37:27
+R	201001	rs9885345	T	C	46	PASS	AC=1;AF=0.245;AN=4;DP=30	GT:DP:GQ	0/0:36:49	0/0:17:50
+EOF
+then
+    print_status "PASS" "Reverse-complemented SNVs at one position were joined"
+else
+    print_status "FAIL" "Joining reverse-strand multiallelics gave different records"
+fi
+
+if diff <(lift_records "$WORK_DIR/normalize/multi.vcf" split) - >/dev/null <<EOF
+R	401001	rsM	C	T	50	PASS	AC=1;AF=0.25;AN=4;DP=30	GT:DP:GQ	1/0:42:27	0/1:15:45
+R	401001	rsM	C	A	50	PASS	AC=1;AF=0.25;AN=4;DP=30	GT:DP:GQ	0/1:42:27	0/0:15:45
+EOF
+then
+    print_status "PASS" "Reverse-complemented multiallelic record was split"
+else
+    print_status "FAIL" "Splitting a reverse-strand multiallelic gave different records"
+fi
+
+if diff <(lift_records "$TEST_DATA/edge_cases.vcf.gz" split) - >/dev/null <<EOF
+R	200997	rs4038350	GA	G	32	PASS	AC=1;AF=0.782;AN=2;DP=30	GT:DP:GQ	0/1:34:50
+R	100998	rs4183638	G	GT	35	PASS	AC=1;AF=0.578;AN=2;DP=30	GT:DP:GQ	0/0:31:40
+R	996	rs2678402	GAT	G	36	PASS	AC=1;AF=0.838;AN=2;DP=30	GT:DP:GQ	0/0:34:53
+EOF
+then
+    print_status "PASS" "Reverse-strand indels were re-anchored and left-aligned"
+else
+    print_status "FAIL" "Reverse-strand indels were not left-aligned"
+fi
+
+# Summary
+echo ""
+if [ $FAILED -eq 0 ]; then
+    print_status "PASS" "All tool tests passed"
+else
+    echo -e "${RED}[FAIL]${NC} $FAILED tool tests failed"
+    exit 1
+fi
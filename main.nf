@@ -32,7 +32,8 @@ def helpMessage() {
                               • Single VCF file: sample.vcf.gz
                               • Multiple VCF files: "*.vcf.gz" or file1.vcf.gz,file2.vcf.gz
                               • CSV file: samples.csv (with sample_id,vcf_path columns)
-      --chain_file           Chain file for liftover (e.g., hg19ToHg38.over.chain.gz)
+      --chain_file           Chain file for liftover (e.g., hg19ToHg38.over.chain.gz); several
+                             comma-separated chains are composed into one direct chain
       --target_fasta         Target reference genome FASTA file
     
     Optional parameters:
@@ -42,11 +43,36 @@ def helpMessage() {
       --outdir               Output directory [default: ./results]
       --split_by_chr         Split processing by chromosome [default: false]
       --validate_output      Validate output VCF files [default: true]
+      --validation_mode      full (read every record) or sampled (index counts, random regions, EOF) [default: full]
+      --validation_regions   Random index regions checked in sampled mode [default: 20]
+      --liftover_engine      Liftover engine: crossmap or python [default: crossmap]
+      --normalize            Left-align and trim lifted variants (python engine) [default: false]
+      --multiallelics        Multiallelic handling: none, split or join (python engine) [default: none]
+      --contig_header        Declare all target contigs or only those seen: all or seen [default: all]
+      --collision_policy     Records lifted to the same site: report, flag, first, drop, fail or off [default: report]
+      --chain_cache_dir      Cache of composed chains [default: chains/composed]
+      --chain_sites          Site list, chip manifest or BED; prune the chain to its blocks [default: none]
+      --chain_flank          Also keep chain blocks within this many bases of a site [default: 0]
+      --regions              Target regions (BED or chr1:1-1000,...); lift only records landing there [default: none]
+      --keep_filters         Lift only records with one of these FILTER values, e.g. PASS [default: any]
+      --site_whitelist       Lift only records whose ID or CHROM<TAB>POS is listed in this file [default: none]
+      --min_af / --max_af    Lift only records with an ALT frequency (INFO AF, or AC/AN) in this range [default: none]
+      --min_maf              Lift only records with a minor allele frequency of at least this [default: none]
+      --checkpoint_dir       Shared directory for resumable lift checkpoints (python engine) [default: none]
+      --extra_targets        CSV (build,chain_file,target_fasta) of further targets lifted in the same pass [default: none]
+      --roundtrip_chain      Reverse chain for round-trip lift-back QC of a sample of each output [default: none]
+      --roundtrip_sample_size  Lifted records checked per sample [default: 10000]
+      --batch_size           Samples lifted per batch task, chain loaded once [default: 0 = off]
+      --merge_output         Also merge all samples into one cohort VCF [default: false]
+      --cohort_name          Name of the merged cohort VCF [default: cohort]
+      --merge_max_open       Maximum VCFs read at once while merging [default: 512]
+      --profile_python       Profile the Python tools: cprofile or pyinstrument [default: false]
     
     Resource parameters:
       --max_memory           Maximum memory [default: 128.GB]
       --max_cpus             Maximum CPUs [default: 16]
       --max_time             Maximum time [default: 240.h]
+      --adaptive_resources   Size lift/sort cpus and memory from input estimates [default: true]
     
     Container parameters:
       --singularity_cache_dir Singularity cache directory [default: ~/.singularity]
@@ -169,7 +195,9 @@ workflow {
     // Input channels are already created above
     
     // Prepare reference files
-    chain_file = file(params.chain_file)
+    // Several comma-separated chain files are composed into one direct chain
+    chain_files = params.chain_file.toString().tokenize(',').collect { file(it.trim()) }
+    chain_file = chain_files.size() > 1 ? chain_files : chain_files[0]
     target_fasta = file(params.target_fasta)
     chr_mapping = params.chr_mapping ? file(params.chr_mapping) : []
     
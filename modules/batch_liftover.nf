@@ -0,0 +1,76 @@
+/*
+========================================================================================
+    Batch Liftover Process
+========================================================================================
+    Lifts, sorts, renames, compresses and indexes a batch of samples in one task,
+    loading the chain index once for the whole batch
+========================================================================================
+*/
+
+process BATCH_LIFTOVER {
+    tag "batch_${batch_id} (${sample_ids.size()} samples)"
+    label 'crossmap'
+
+    publishDir "${params.outdir}/crossmap", mode: 'copy', pattern: '*.crossmap.{log,unmap}'
+    publishDir "${params.outdir}/final", mode: 'copy', pattern: "*.${params.target_build}.{vcf.gz*,collisions.json}"
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
+    input:
+    tuple val(batch_id), val(sample_ids), path(vcfs, stageAs: 'inputs/?/*'), path(vcf_indexes, stageAs: 'inputs/?/*'), val(size)
+    path chain_file
+    path target_fasta
+    path chr_mapping
+    path regions
+    path site_whitelist
+
+    output:
+    path("*.${params.target_build}.vcf.gz"), emit: vcf
+    path("*.${params.target_build}.vcf.gz.tbi"), emit: index
+    path("*.crossmap.log"), emit: log
+    path("*.crossmap.unmap"), emit: unmap, optional: true
+    path("*.collisions.json"), emit: collisions, optional: true
+    path("batch_${batch_id}.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
+
+    script:
+    def manifest = [sample_ids, vcfs instanceof List ? vcfs : [vcfs]].transpose()
+        .collect { sample_id, vcf -> "${sample_id},${vcf}" }
+        .join('\n')
+    def mapping_arg = chr_mapping ? "--chr-mapping ${chr_mapping}" : ''
+    def sort_arg = size ? "--sort-memory ${size.sort_mb}M" : ''
+    def checkpoint_arg = params.checkpoint_dir ? "--checkpoint-dir ${params.checkpoint_dir}" : ''
+    // Indexes are staged next to their VCFs (same inputs/N/ directory)
+    def regions_arg = regions ? "--regions ${regions} --jobs ${task.cpus}" : (params.regions ? "--regions '${params.regions}' --jobs ${task.cpus}" : '')
+    def filter_args = (params.keep_filters ? "--keep-filters '${params.keep_filters}'" : '') + (site_whitelist ? " --whitelist ${site_whitelist}" : '') + (params.min_af != null ? " --min-af ${params.min_af}" : '') + (params.max_af != null ? " --max-af ${params.max_af}" : '') + (params.min_maf != null ? " --min-maf ${params.min_maf}" : '')
+    def engine_args = "--engine ${params.liftover_engine} --multiallelics ${params.multiallelics} --contig-header ${params.contig_header} --collisions ${params.collision_policy}" + (params.normalize ? ' --normalize' : '')
+    """
+    echo "Starting batch liftover for batch ${batch_id}: ${sample_ids.join(', ')}"
+    echo "Chain file: ${chain_file}"
+    echo "Target FASTA: ${target_fasta}"
+
+    cat > batch_${batch_id}.csv <<'EOF'
+sample_id,vcf_path
+${manifest}
+EOF
+
+    liftover-tools batch \\
+        --manifest batch_${batch_id}.csv \\
+        --chain ${chain_file} \\
+        --target-fasta ${target_fasta} \\
+        --target-build ${params.target_build} \\
+        ${mapping_arg} \\
+        ${sort_arg} \\
+        ${regions_arg} \\
+        ${checkpoint_arg} \\
+        ${filter_args} \\
+        ${engine_args} \\
+        --trace batch_${batch_id}.trace.jsonl
+
+    if [ \$? -ne 0 ]; then
+        echo "ERROR: Batch liftover failed for batch ${batch_id}" >&2
+        exit 1
+    fi
+
+    echo "Batch liftover completed successfully for batch ${batch_id}"
+    """
+}
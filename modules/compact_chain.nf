@@ -0,0 +1,43 @@
+/*
+========================================================================================
+    Chain Compaction Process
+========================================================================================
+    Prunes the chain file to the blocks overlapping a chip manifest, site list
+    or BED, so every liftover task loads a much smaller chain index
+========================================================================================
+*/
+
+process COMPACT_CHAIN {
+    tag "${sites.simpleName}"
+    label 'python'
+
+    publishDir "${params.outdir}/chain", mode: 'copy', pattern: '*.chain.gz*'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
+    input:
+    path chain_file
+    path sites
+
+    output:
+    path("${chain_file.simpleName}.compact.chain.gz"), emit: chain
+    path("${chain_file.simpleName}.compact.chain.gz.coverage.json"), emit: report
+    path("chain_tool.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
+
+    script:
+    """
+    echo "Compacting chain file ${chain_file} to the sites in ${sites}"
+
+    liftover-tools chain compact \\
+        ${chain_file} \\
+        ${sites} \\
+        -o ${chain_file.simpleName}.compact.chain.gz \\
+        --flank ${params.chain_flank} \\
+        --trace chain_tool.trace.jsonl
+
+    if [ \$? -ne 0 ]; then
+        echo "ERROR: Chain compaction failed" >&2
+        exit 1
+    fi
+    """
+}
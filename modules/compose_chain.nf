@@ -0,0 +1,40 @@
+/*
+========================================================================================
+    Chain Composition Process
+========================================================================================
+    Composes several chain files (e.g. hg17ToHg18 and hg18ToHg38) into one
+    direct chain so the data is lifted in a single pass
+========================================================================================
+*/
+
+process COMPOSE_CHAIN {
+    tag "${chains.collect { it.simpleName }.join(' + ')}"
+    label 'python'
+
+    publishDir "${params.outdir}/chain", mode: 'copy', pattern: '*.chain.gz*'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
+    input:
+    path chains, stageAs: 'hops/?/*'
+
+    output:
+    path("composed.chain.gz"), emit: chain
+    path("chain_tool.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
+
+    script:
+    """
+    echo "Composing chain files: ${chains.join(' ')}"
+
+    liftover-tools chain compose \\
+        ${chains.join(' ')} \\
+        -o composed.chain.gz \\
+        --cache-dir ${params.chain_cache_dir} \\
+        --trace chain_tool.trace.jsonl
+
+    if [ \$? -ne 0 ]; then
+        echo "ERROR: Chain composition failed" >&2
+        exit 1
+    fi
+    """
+}
@@ -10,29 +10,47 @@ process CROSSMAP_VCF {
     tag "${sample_id}"
     label 'crossmap'
 
-    publishDir "${params.outdir}/crossmap", mode: 'copy'
+    publishDir "${params.outdir}/crossmap", mode: 'copy', pattern: '*.crossmap.{vcf,log,unmap}'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
 
     input:
-    tuple val(sample_id), path(vcf), path(chain_file), path(target_fasta)
+    tuple val(sample_id), path(vcf), path(vcf_index), path(chain_file), path(target_fasta), val(size)
+    path chr_mapping
+    path regions
+    path site_whitelist
 
     output:
     tuple val(sample_id), path("${sample_id}.crossmap.vcf"), emit: vcf
     path("${sample_id}.crossmap.log"), emit: log
     path("${sample_id}.crossmap.unmap"), emit: unmap, optional: true
+    path("${sample_id}.lift.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
 
     script:
+    // --regions is a BED file (staged) or a region list such as chr1:1-1000
+    def regions_arg = regions ? "--regions ${regions}" : (params.regions ? "--regions '${params.regions}'" : '')
+    // Site filters, applied as records are read (before CrossMap, or inside the python lift)
+    def filter_args = (params.keep_filters ? " --keep-filters '${params.keep_filters}'" : '') + (site_whitelist ? " --whitelist ${site_whitelist}" : '') + (params.min_af != null ? " --min-af ${params.min_af}" : '') + (params.max_af != null ? " --max-af ${params.max_af}" : '') + (params.min_maf != null ? " --min-maf ${params.min_maf}" : '')
+    // CrossMap reads whole files: extract the records of the source intervals
+    // (or those passing the site filters) first
+    def crossmap_input = regions_arg ? "${sample_id}.regions.vcf" : (filter_args ? "${sample_id}.filtered.vcf" : vcf)
+    def extract_command = params.liftover_engine == 'python' ? ''
+        : regions_arg ? "liftover-tools index extract ${vcf} ${regions_arg} --chain ${chain_file} -o ${sample_id}.regions.vcf${filter_args}"
+        : filter_args ? "liftover-tools filter ${vcf} -o ${sample_id}.filtered.vcf${filter_args}"
+        : ''
+    def lift_command = params.liftover_engine == 'python'
+        ? "liftover-tools lift ${vcf} --chain ${chain_file} --reference ${target_fasta} -o ${sample_id}.crossmap.vcf --multiallelics ${params.multiallelics} --contig-header ${params.contig_header}" + (params.normalize ? ' --normalize' : '') + (chr_mapping ? " --chr-mapping ${chr_mapping}" : '') + (regions_arg ? " ${regions_arg} --jobs ${task.cpus}" : '') + (params.checkpoint_dir ? " --checkpoint-dir ${params.checkpoint_dir}/${sample_id}" : '') + filter_args + " --trace ${sample_id}.lift.trace.jsonl"
+        : "CrossMap vcf ${chain_file} ${crossmap_input} ${target_fasta} ${sample_id}.crossmap.vcf"
     """
     echo "Starting CrossMap liftover for sample: ${sample_id}"
     echo "Input VCF: ${vcf}"
     echo "Chain file: ${chain_file}"
     echo "Target FASTA: ${target_fasta}"
+    echo "Liftover engine: ${params.liftover_engine}"
+    ${extract_command}
     
-    # Run CrossMap
-    CrossMap vcf \\
-        ${chain_file} \\
-        ${vcf} \\
-        ${target_fasta} \\
-        ${sample_id}.crossmap.vcf \\
+    # Run the liftover (CrossMap, or the streaming Python engine)
+    ${lift_command} \\
         2> ${sample_id}.crossmap.log
 
     # Check if CrossMap completed successfully
@@ -10,21 +10,28 @@ process FIX_CONTIG_HEADER {
     tag "${sample_id}"
     label 'vcf_processing'
 
-    publishDir "${params.outdir}/final", mode: 'copy'
+    publishDir "${params.outdir}/final", mode: 'copy', pattern: '*.{vcf.gz,collisions.json}'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
 
     input:
-    tuple val(sample_id), path(vcf)
-    path target_fasta
+    tuple val(sample_id), path(vcf), val(build), path(target_fasta)
+    path chr_mapping
 
     output:
-    tuple val(sample_id), path("${sample_id}.${params.target_build}.vcf.gz"), emit: vcf
+    tuple val(sample_id), path("${sample_id}.${build}.vcf.gz"), emit: vcf
+    path("${sample_id}.${build}.collisions.json"), emit: collisions, optional: true
+    path("${sample_id}.${build}.fix.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
 
     script:
+    // CrossMap output is renamed here, in the same pass (the python engine renames while lifting)
+    def mapping_arg = chr_mapping ? "--chr-mapping ${chr_mapping}" : ''
+    def collision_args = params.collision_policy != 'off' ? "--collisions ${params.collision_policy} --collision-report ${sample_id}.${build}.collisions.json" : ''
     """
     echo "Starting contig header fix for sample: ${sample_id}"
     echo "Input VCF: ${vcf}"
     echo "Target FASTA: ${target_fasta}"
-    echo "Target build: ${params.target_build}"
+    echo "Target build: ${build}"
     
     # Check if input file exists
     if [ ! -f "${vcf}" ]; then
@@ -38,9 +45,21 @@ process FIX_CONTIG_HEADER {
         exit 1
     fi
     
-    # Convert BCF to VCF and compress directly
-    echo "Converting BCF to compressed VCF..."
-    bcftools view ${vcf} -Oz -o ${sample_id}.${params.target_build}.vcf.gz
+    # Convert BCF to VCF; ##contig lines are rebuilt from the target .fai
+    # (all reference contigs, or only those seen) while compressing, and
+    # contigs are renamed and records lifted to the same site are found in
+    # the same pass
+    echo "Converting BCF to compressed VCF with ${params.contig_header} target contigs declared..."
+    set -o pipefail
+    bcftools view ${vcf} | \\
+        liftover-tools contig-header \\
+            --fasta ${target_fasta} \\
+            --contigs ${params.contig_header} \\
+            --threads ${task.cpus} \\
+            ${mapping_arg} \\
+            ${collision_args} \\
+            --trace ${sample_id}.${build}.fix.trace.jsonl \\
+            -o ${sample_id}.${build}.vcf.gz
     
     if [ \$? -ne 0 ]; then
         echo "ERROR: Failed to compress final VCF for sample ${sample_id}" >&2
@@ -48,7 +67,7 @@ process FIX_CONTIG_HEADER {
     fi
     
     # Verify output file was created
-    if [ ! -f "${sample_id}.${params.target_build}.vcf.gz" ]; then
+    if [ ! -f "${sample_id}.${build}.vcf.gz" ]; then
         echo "ERROR: Final VCF file not created for sample ${sample_id}" >&2
         exit 1
     fi
@@ -57,15 +76,15 @@ process FIX_CONTIG_HEADER {
     rm -f temp.vcf reheadered.vcf
     
     echo "Contig header fix completed successfully for sample: ${sample_id}"
-    echo "Output VCF: ${sample_id}.${params.target_build}.vcf.gz"
+    echo "Output VCF: ${sample_id}.${build}.vcf.gz"
     
     # Show final statistics
     if command -v bcftools &> /dev/null; then
-        variant_count=\$(bcftools view -H ${sample_id}.${params.target_build}.vcf.gz | wc -l)
+        variant_count=\$(bcftools view -H ${sample_id}.${build}.vcf.gz | wc -l)
         echo "Final variant count: \$variant_count"
         
         echo "Final VCF header contigs:"
-        bcftools view -h ${sample_id}.${params.target_build}.vcf.gz | grep "^##contig" | head -5
+        bcftools view -h ${sample_id}.${build}.vcf.gz | grep "^##contig" | head -5
     fi
     """
 }
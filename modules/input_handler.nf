@@ -3,7 +3,7 @@
     Input Handler Process
 ========================================================================================
     Handles multiple input types: single VCF, multiple VCFs, or CSV file
-    Uses external Python script for processing
+    Resolved by `liftover-tools resolve` (bin/process_input.py)
 ========================================================================================
 */
 
@@ -11,15 +11,18 @@ process INPUT_HANDLER {
     tag "input_processing"
     label 'python'
 
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
     input:
     val input_param
-    path script_file
 
     output:
     path "processed_samples.csv", emit: csv
+    path "input_handler.trace.jsonl", emit: trace, optional: true
+    path "*.profile.json", emit: profile, optional: true
 
     script:
     """
-    python3 ${script_file} "${input_param}" -o processed_samples.csv
+    liftover-tools resolve "${input_param}" -o processed_samples.csv --trace input_handler.trace.jsonl
     """
 }
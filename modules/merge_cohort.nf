@@ -0,0 +1,53 @@
+/*
+========================================================================================
+    Cohort Merge Process
+========================================================================================
+    Merges the sorted, lifted per-sample VCFs into one cohort VCF
+========================================================================================
+*/
+
+process MERGE_COHORT {
+    tag "${params.cohort_name}"
+    label 'vcf_processing'
+
+    publishDir "${params.outdir}/final", mode: 'copy', pattern: "${params.cohort_name}.${params.target_build}.vcf.gz*"
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
+    input:
+    path vcfs, stageAs: 'inputs/?/*'
+    path target_fasta
+
+    output:
+    tuple val(params.cohort_name), path("${params.cohort_name}.${params.target_build}.vcf.gz"), path("${params.cohort_name}.${params.target_build}.vcf.gz.tbi"), emit: vcf_with_index
+    path("merge_cohort.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
+
+    script:
+    def inputs = (vcfs instanceof List ? vcfs : [vcfs]).join('\n')
+    """
+    echo "Starting cohort merge: ${params.cohort_name}"
+
+    cat > merge_inputs.txt <<'END_INPUTS'
+${inputs}
+END_INPUTS
+    echo "Input VCFs: \$(wc -l < merge_inputs.txt)"
+
+    liftover-tools merge \\
+        --file-list merge_inputs.txt \\
+        --fasta ${target_fasta} \\
+        -o ${params.cohort_name}.${params.target_build}.vcf.gz \\
+        --max-open ${params.merge_max_open} \\
+        --threads ${task.cpus} \\
+        --tmp-dir . \\
+        --trace merge_cohort.trace.jsonl
+
+    if [ \$? -ne 0 ]; then
+        echo "ERROR: Cohort merge failed" >&2
+        exit 1
+    fi
+
+    tabix -f -p vcf ${params.cohort_name}.${params.target_build}.vcf.gz
+
+    echo "Cohort merge completed: ${params.cohort_name}.${params.target_build}.vcf.gz"
+    """
+}
@@ -0,0 +1,78 @@
+/*
+========================================================================================
+    Multi-Target Liftover Process
+========================================================================================
+    Lifts each input onto several target builds in one read of the input
+    (python engine), writing one lifted stream per target
+========================================================================================
+*/
+
+process MULTI_TARGET_LIFT {
+    tag "${sample_id} (${builds.size() + 1} targets)"
+    label 'crossmap'
+
+    publishDir "${params.outdir}/crossmap", mode: 'copy', pattern: '*.crossmap.{log,unmap}'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
+    input:
+    tuple val(sample_id), path(vcf), val(size)
+    path chain_file
+    path target_fasta
+    val builds
+    path chains, stageAs: 'targets/chain?/*'
+    path fastas, stageAs: 'targets/fasta?/*'
+    path chr_mapping
+    path site_whitelist
+
+    output:
+    tuple val(sample_id), path("${sample_id}.*.crossmap.vcf"), emit: vcf
+    path("*.crossmap.log"), emit: log
+    path("*.crossmap.unmap"), emit: unmap, optional: true
+    path("${sample_id}.lift.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
+
+    script:
+    // The main target, then every extra target, each into ${sample_id}.BUILD.crossmap.vcf
+    def extra_chains = chains instanceof List ? chains : [chains]
+    def extra_fastas = fastas instanceof List ? fastas : [fastas]
+    def target_args = [builds, extra_chains, extra_fastas].transpose()
+        .collect { build, chain, fasta -> "--target ${chain} ${fasta} ${sample_id}.${build}.crossmap.vcf" }
+        .join(' ')
+    def all_builds = [params.target_build] + builds
+    def mapping_arg = chr_mapping ? "--chr-mapping ${chr_mapping}" : ''
+    def filter_args = (params.keep_filters ? "--keep-filters '${params.keep_filters}'" : '') + (site_whitelist ? " --whitelist ${site_whitelist}" : '') + (params.min_af != null ? " --min-af ${params.min_af}" : '') + (params.max_af != null ? " --max-af ${params.max_af}" : '') + (params.min_maf != null ? " --min-maf ${params.min_maf}" : '')
+    """
+    echo "Starting multi-target liftover for sample: ${sample_id}"
+    echo "Input VCF: ${vcf}"
+    echo "Targets: ${all_builds.join(', ')}"
+
+    liftover-tools lift ${vcf} \\
+        --chain ${chain_file} \\
+        --reference ${target_fasta} \\
+        -o ${sample_id}.${params.target_build}.crossmap.vcf \\
+        ${target_args} \\
+        --multiallelics ${params.multiallelics} \\
+        --contig-header ${params.contig_header} \\
+        ${params.normalize ? '--normalize' : ''} \\
+        ${mapping_arg} \\
+        ${filter_args} \\
+        --trace ${sample_id}.lift.trace.jsonl \\
+        2> ${sample_id}.lift.log
+
+    if [ \$? -ne 0 ]; then
+        echo "ERROR: Multi-target liftover failed for sample ${sample_id}" >&2
+        cat ${sample_id}.lift.log >&2
+        exit 1
+    fi
+
+    # Per-target CrossMap-style logs and unmapped records
+    for build in ${all_builds.join(' ')}; do
+        mv ${sample_id}.\${build}.crossmap.vcf.log ${sample_id}.\${build}.crossmap.log
+        if [ -f ${sample_id}.\${build}.crossmap.vcf.unmap ]; then
+            mv ${sample_id}.\${build}.crossmap.vcf.unmap ${sample_id}.\${build}.crossmap.unmap
+        fi
+    done
+
+    echo "Multi-target liftover completed successfully for sample: ${sample_id}"
+    """
+}
@@ -0,0 +1,41 @@
+/*
+========================================================================================
+    Round-Trip QC Process
+========================================================================================
+    Maps a reservoir sample of lifted records back through the reverse chain
+    and reports per-chromosome discordance with the original input
+========================================================================================
+*/
+
+process ROUNDTRIP_QC {
+    tag "${sample_id}"
+    label 'python'
+
+    publishDir "${params.outdir}/qc", mode: 'copy', pattern: '*.roundtrip.{json,tsv}'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
+    input:
+    tuple val(sample_id), path(lifted_vcf), path(lifted_index), path(original_vcf), path(original_index)
+    path reverse_chain
+
+    output:
+    path("${sample_id}.roundtrip.json"), emit: report
+    path("${sample_id}.roundtrip.tsv"), emit: tsv
+    path("*.profile.json"), emit: profile, optional: true
+
+    script:
+    def threshold_arg = params.roundtrip_max_discordance != null ? "--max-discordance ${params.roundtrip_max_discordance}" : ''
+    """
+    echo "Round-trip QC for sample: ${sample_id}"
+    echo "Lifted VCF: ${lifted_vcf}"
+    echo "Original VCF: ${original_vcf}"
+    echo "Reverse chain: ${reverse_chain}"
+
+    liftover-tools roundtrip ${lifted_vcf} ${original_vcf} \\
+        --reverse-chain ${reverse_chain} \\
+        --sample-size ${params.roundtrip_sample_size} \\
+        --output ${sample_id}.roundtrip.json \\
+        --tsv ${sample_id}.roundtrip.tsv \\
+        ${threshold_arg}
+    """
+}
@@ -10,13 +10,19 @@ process SORT_VCF {
     tag "${sample_id}"
     label 'vcf_processing'
 
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: '*.{trace.jsonl,prof,html,profile.json}'
+
     input:
-    tuple val(sample_id), path(vcf)
+    tuple val(sample_id), path(vcf), val(size)
 
     output:
     tuple val(sample_id), path("${sample_id}.sorted.bcf"), emit: vcf
+    path("${sample_id}.sort.trace.jsonl"), emit: trace, optional: true
+    path("*.profile.json"), emit: profile, optional: true
 
     script:
+    // Sort buffer sized from the input estimate; bcftools' default otherwise
+    def sort_memory = size ? "-m ${size.sort_mb}M" : ''
     """
     echo "Starting VCF sorting for sample: ${sample_id}"
     echo "Input VCF: ${vcf}"
@@ -30,17 +36,9 @@ process SORT_VCF {
     # Create temporary directory for sorting
     mkdir -p tmp_sort
     
-    # Convert to BCF and sort
-    echo "Converting VCF to BCF format..."
-    bcftools view ${vcf} -Ob -o temp.bcf
-    
-    if [ \$? -ne 0 ]; then
-        echo "ERROR: Failed to convert VCF to BCF for sample ${sample_id}" >&2
-        exit 1
-    fi
-    
-    echo "Sorting BCF file..."
-    bcftools sort temp.bcf -T tmp_sort -Ob -o ${sample_id}.sorted.bcf
+    # Sort straight to BCF (bcftools sort reads VCF or BCF)
+    echo "Sorting to BCF..."
+    bcftools sort ${vcf} ${sort_memory} -T tmp_sort -Ob -o ${sample_id}.sorted.bcf
     
     if [ \$? -ne 0 ]; then
         echo "ERROR: Failed to sort BCF for sample ${sample_id}" >&2
@@ -54,16 +52,13 @@ process SORT_VCF {
     fi
     
     # Clean up temporary files
-    rm -f temp.bcf
     rm -rf tmp_sort
     
     echo "VCF sorting completed successfully for sample: ${sample_id}"
     echo "Output BCF: ${sample_id}.sorted.bcf"
     
-    # Count variants
-    if command -v bcftools &> /dev/null; then
-        variant_count=\$(bcftools view -H ${sample_id}.sorted.bcf | wc -l)
-        echo "Sorted variants: \$variant_count"
-    fi
+    # Count variants from the typed BCF records, without decoding to text
+    echo "Sorted variants:"
+    liftover-tools bcf stats ${sample_id}.sorted.bcf --trace ${sample_id}.sort.trace.jsonl
     """
 }
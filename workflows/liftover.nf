@@ -9,28 +9,73 @@
 // Import all required modules
 include { INPUT_HANDLER } from '../modules/input_handler'
 include { INPUT_CHECK } from '../modules/input_check'
+include { COMPOSE_CHAIN } from '../modules/compose_chain'
+include { COMPACT_CHAIN } from '../modules/compact_chain'
 include { CROSSMAP_VCF } from '../modules/crossmap'
+include { BATCH_LIFTOVER } from '../modules/batch_liftover'
+include { MULTI_TARGET_LIFT } from '../modules/multi_target_lift'
 include { SORT_VCF } from '../modules/sort_vcf'
-include { RENAME_CHROMOSOMES } from '../modules/rename_chromosomes'
 include { FIX_CONTIG_HEADER } from '../modules/fix_contig'
 include { INDEX_VCF } from '../modules/index_vcf'
 include { VALIDATE_VCF } from '../modules/validate_vcf'
 include { LIFTOVER_STATS } from '../modules/liftover_stats'
+include { MERGE_COHORT } from '../modules/merge_cohort'
+include { ROUNDTRIP_QC } from '../modules/roundtrip_qc'
+
+// Resource requests of one sample (see bin/size_estimate.py), or [:] when
+// adaptive sizing is off or the input could not be sampled
+def sampleSize(row) {
+    if (!params.adaptive_resources || !row.sort_mb) {
+        return [:]
+    }
+    return [
+        cpus          : row.cpus as int,
+        lift_memory_mb: row.lift_memory_mb as long,
+        sort_memory_mb: row.sort_memory_mb as long,
+        sort_mb       : row.sort_mb as long
+    ]
+}
+
+// The .tbi/.csi next to an input VCF/BCF, or null
+def findInputIndex(vcf) {
+    return ['tbi', 'csi'].collect { file("${vcf}.${it}") }.find { it.exists() }
+}
+
+// The input index, needed to seek to --regions
+def inputIndex(vcf) {
+    def index = findInputIndex(vcf)
+    if (!index) {
+        error "--regions needs an index next to ${vcf} (.tbi or .csi; create one with tabix or bcftools index)"
+    }
+    return index
+}
+
+// A batch runs its samples one after another: it needs the largest request
+def batchSize(sizes) {
+    if (sizes.any { !it }) {
+        return [:]
+    }
+    return sizes[0].keySet().collectEntries { key -> [key, sizes.collect { it[key] }.max()] }
+}
 
 workflow LIFTOVER_WORKFLOW {
     take:
     input_param   // String: input parameter (VCF file(s) or CSV)
-    chain_file    // Path: chain file
+    chain_file    // Path: chain file, or a list of chains to compose
     target_fasta  // Path: target reference
     chr_mapping   // Path: chromosome mapping (optional)
 
     main:
     // Process input to get standardized CSV
-    script_file = file("${projectDir}/bin/process_input.py")
-    INPUT_HANDLER(input_param, script_file)
+    INPUT_HANDLER(input_param)
 
     // Parse CSV to get VCF files
-    validated_csv = INPUT_CHECK(INPUT_HANDLER.out.csv)
+    INPUT_CHECK(INPUT_HANDLER.out.csv)
+    validated_csv = INPUT_CHECK.out.csv
+
+    // Stage traces and profiles (--profile_python) of the Python tasks, merged into the report
+    task_profiles = INPUT_HANDLER.out.profile.mix(INPUT_CHECK.out.profile)
+    task_traces = INPUT_HANDLER.out.trace
 
     log.info """
     ========================================
@@ -47,61 +92,230 @@ workflow LIFTOVER_WORKFLOW {
         .splitCsv(header: true)
         .map { row -> [row.sample_id, file(row.vcf_path)] }
 
-    // Combine inputs for CrossMap
-    crossmap_input = vcf_files.map { sample_id, vcf ->
-        [sample_id, vcf, chain_file, target_fasta]
-    }
+    // Per-sample resource requests from the input handler's size estimates
+    // (an empty map falls back to the fixed per-process resources)
+    sample_sizes = validated_csv
+        .splitCsv(header: true)
+        .map { row -> [row.sample_id, sampleSize(row)] }
 
-    // Step 1: Run CrossMap liftover
-    log.info "Step 1: Running CrossMap liftover..."
-    CROSSMAP_VCF(crossmap_input)
+    // Compose multi-hop chains (hg17 -> hg18 -> hg38) into one direct chain
+    if (chain_file instanceof List) {
+        log.info "Composing ${chain_file.size()} chain files into one direct chain..."
+        COMPOSE_CHAIN(chain_file)
+        lift_chain = COMPOSE_CHAIN.out.chain
+        task_profiles = task_profiles.mix(COMPOSE_CHAIN.out.profile)
+        task_traces = task_traces.mix(COMPOSE_CHAIN.out.trace)
+    } else {
+        lift_chain = Channel.value(chain_file)
+    }
 
-    // Step 2: Sort VCF files
-    log.info "Step 2: Sorting VCF files..."
-    SORT_VCF(CROSSMAP_VCF.out.vcf)
+    // Optionally prune the chain to the blocks the chip's sites can reach
+    if (params.chain_sites) {
+        log.info "Compacting chain file to the sites in ${params.chain_sites}..."
+        COMPACT_CHAIN(lift_chain, file(params.chain_sites))
+        lift_chain = COMPACT_CHAIN.out.chain
+        task_profiles = task_profiles.mix(COMPACT_CHAIN.out.profile)
+        task_traces = task_traces.mix(COMPACT_CHAIN.out.trace)
+    }
 
-    // Step 3: Rename chromosomes if mapping provided
-    if (chr_mapping && !chr_mapping.isEmpty()) {
-        log.info "Step 3: Renaming chromosomes..."
-        RENAME_CHROMOSOMES(SORT_VCF.out.vcf, chr_mapping)
-        sorted_vcf = RENAME_CHROMOSOMES.out.vcf
+    // Lift only the records landing in target regions: each input's index is
+    // staged so the lift can seek to the source intervals they map back to
+    if (params.regions) {
+        log.info "Lifting only records in target regions: ${params.regions}"
+        vcf_indexes = vcf_files.map { sample_id, vcf -> [sample_id, inputIndex(vcf)] }
+        regions_file = file(params.regions).exists() ? file(params.regions) : []
     } else {
-        log.info "Step 3: Skipping chromosome renaming (no mapping file provided)"
-        sorted_vcf = SORT_VCF.out.vcf
+        vcf_indexes = vcf_files.map { sample_id, _vcf -> [sample_id, []] }
+        regions_file = []
+    }
+
+    // Site filters drop records as they are read, before the lift
+    site_whitelist = params.site_whitelist ? file(params.site_whitelist, checkIfExists: true) : []
+    if (params.keep_filters || params.site_whitelist || params.min_af != null || params.max_af != null || params.min_maf != null) {
+        log.info "Filtering sites before lifting (FILTER: ${params.keep_filters ?: 'any'}, whitelist: ${params.site_whitelist ?: 'none'}, " +
+            "AF: ${params.min_af ?: 0}-${params.max_af ?: 1}, MAF >= ${params.min_maf ?: 0})"
     }
 
-    // Step 4: Fix contig headers
-    log.info "Step 4: Fixing contig headers..."
-    FIX_CONTIG_HEADER(sorted_vcf, target_fasta)
+    if (params.checkpoint_dir && params.liftover_engine != 'python') {
+        log.warn "--checkpoint_dir applies to the python engine only; CrossMap lifts restart from the beginning"
+    }
+
+    if (params.batch_size > 0) {
+        // Steps 1-5 in one task per batch: the chain index is loaded once and
+        // each sample's outputs match the per-sample steps below
+        log.info "Steps 1-5: Running batch liftover (${params.batch_size} samples per task)..."
+        batches = vcf_files
+            .join(vcf_indexes)
+            .join(sample_sizes)
+            .collate(params.batch_size)
+            .map { batch -> [batch[0][0], batch.collect { it[0] }, batch.collect { it[1] }, batch.collect { it[2] }.flatten(), batchSize(batch.collect { it[3] })] }
+        BATCH_LIFTOVER(batches, lift_chain, target_fasta, chr_mapping ?: [], regions_file, site_whitelist)
+
+        final_vcfs = BATCH_LIFTOVER.out.vcf.flatten()
+            .map { vcf -> [vcf.name - ".${params.target_build}.vcf.gz", vcf] }
+        final_indexes = BATCH_LIFTOVER.out.index.flatten()
+            .map { tbi -> [tbi.name - ".${params.target_build}.vcf.gz.tbi", tbi] }
+        vcf_with_index = final_vcfs.join(final_indexes)
+        validation_input = vcf_with_index
+        crossmap_logs = BATCH_LIFTOVER.out.log.flatten()
+        crossmap_unmap = BATCH_LIFTOVER.out.unmap.flatten()
+        collision_reports = BATCH_LIFTOVER.out.collisions.flatten()
+        task_profiles = task_profiles.mix(BATCH_LIFTOVER.out.profile)
+        task_traces = task_traces.mix(BATCH_LIFTOVER.out.trace)
+    } else if (params.extra_targets) {
+        // Steps 1-5 for several targets: each input is read once and lifted
+        // into one stream per target, then every stream is sorted, gets its
+        // target's contig header and is indexed on its own
+        if (params.liftover_engine != 'python' || params.regions || params.checkpoint_dir) {
+            error "--extra_targets needs --liftover_engine python, without --regions or --checkpoint_dir"
+        }
+        extra_targets = file(params.extra_targets, checkIfExists: true).splitCsv(header: true)
+        target_fastas = [(params.target_build): target_fasta] +
+            extra_targets.collectEntries { target -> [target.build, file(target.target_fasta)] }
+        log.info "Steps 1-5: Lifting onto ${target_fastas.keySet().join(', ')} in one read per input..."
+
+        MULTI_TARGET_LIFT(
+            vcf_files.join(sample_sizes),
+            lift_chain,
+            target_fasta,
+            extra_targets.collect { it.build },
+            extra_targets.collect { file(it.chain_file) },
+            extra_targets.collect { file(it.target_fasta) },
+            chr_mapping ?: [],
+            site_whitelist
+        )
+
+        // One stream per (sample, target), keyed SAMPLE.BUILD until the final VCF is named
+        lifted = MULTI_TARGET_LIFT.out.vcf
+            .transpose()
+            .map { sample_id, vcf -> [sample_id, vcf.name - "${sample_id}." - '.crossmap.vcf', vcf] }
+            .combine(sample_sizes, by: 0)
+        SORT_VCF(lifted.map { sample_id, build, vcf, size -> ["${sample_id}.${build}".toString(), vcf, size] })
+        streams = lifted.map { sample_id, build, _vcf, _size -> ["${sample_id}.${build}".toString(), sample_id, build] }
+        FIX_CONTIG_HEADER(
+            SORT_VCF.out.vcf.join(streams)
+                .map { _stream, vcf, sample_id, build -> [sample_id, vcf, build, target_fastas[build]] },
+            []
+        )
+        INDEX_VCF(FIX_CONTIG_HEADER.out.vcf)
+
+        vcf_with_index = INDEX_VCF.out.vcf_with_index
+        // One final VCF per build of each sample: validate them as SAMPLE.BUILD
+        // so every build's report keeps its own name
+        validation_input = vcf_with_index.map { _sample_id, vcf, index -> [vcf.name - '.vcf.gz', vcf, index] }
+        crossmap_logs = MULTI_TARGET_LIFT.out.log.flatten()
+        crossmap_unmap = MULTI_TARGET_LIFT.out.unmap.flatten()
+        collision_reports = FIX_CONTIG_HEADER.out.collisions
+        task_profiles = task_profiles.mix(MULTI_TARGET_LIFT.out.profile, SORT_VCF.out.profile, FIX_CONTIG_HEADER.out.profile)
+        task_traces = task_traces.mix(MULTI_TARGET_LIFT.out.trace, SORT_VCF.out.trace, FIX_CONTIG_HEADER.out.trace)
+    } else {
+        // Combine inputs for CrossMap
+        crossmap_input = vcf_files.join(vcf_indexes).join(sample_sizes).combine(lift_chain).map { sample_id, vcf, index, size, chain ->
+            [sample_id, vcf, index, chain, target_fasta, size]
+        }
+
+        // Step 1: Run CrossMap liftover
+        log.info "Step 1: Running CrossMap liftover..."
+        CROSSMAP_VCF(crossmap_input, chr_mapping ?: [], regions_file, site_whitelist)
+
+        // Step 2: Sort VCF files
+        log.info "Step 2: Sorting VCF files..."
+        SORT_VCF(CROSSMAP_VCF.out.vcf.join(sample_sizes))
+
+        // Step 3: Rename chromosomes if mapping provided: the python engine
+        // renamed them while lifting, CrossMap output is renamed by the
+        // contig header fix in the same pass as compression
+        if (chr_mapping && !chr_mapping.isEmpty() && params.liftover_engine == 'python') {
+            log.info "Step 3: Chromosomes renamed during liftover (python engine)"
+            fix_mapping = []
+        } else if (chr_mapping && !chr_mapping.isEmpty()) {
+            log.info "Step 3: Chromosomes renamed while fixing contig headers"
+            fix_mapping = chr_mapping
+        } else {
+            log.info "Step 3: Skipping chromosome renaming (no mapping file provided)"
+            fix_mapping = []
+        }
 
-    // Step 5: Index final VCF files
-    log.info "Step 5: Indexing VCF files..."
-    INDEX_VCF(FIX_CONTIG_HEADER.out.vcf)
+        // Step 4: Fix contig headers
+        log.info "Step 4: Fixing contig headers..."
+        FIX_CONTIG_HEADER(SORT_VCF.out.vcf.map { sample_id, vcf -> [sample_id, vcf, params.target_build, target_fasta] }, fix_mapping)
+
+        // Step 5: Index final VCF files
+        log.info "Step 5: Indexing VCF files..."
+        INDEX_VCF(FIX_CONTIG_HEADER.out.vcf)
+
+        vcf_with_index = INDEX_VCF.out.vcf_with_index
+        validation_input = vcf_with_index
+        crossmap_logs = CROSSMAP_VCF.out.log
+        crossmap_unmap = CROSSMAP_VCF.out.unmap
+        collision_reports = FIX_CONTIG_HEADER.out.collisions
+        task_profiles = task_profiles.mix(CROSSMAP_VCF.out.profile, SORT_VCF.out.profile, FIX_CONTIG_HEADER.out.profile)
+        task_traces = task_traces.mix(CROSSMAP_VCF.out.trace, SORT_VCF.out.trace, FIX_CONTIG_HEADER.out.trace)
+    }
 
     // Step 6: Validate output if requested
     if (params.validate_output) {
-        log.info "Step 6: Validating output VCF files..."
-        VALIDATE_VCF(INDEX_VCF.out.vcf_with_index)
+        log.info "Step 6: Validating output VCF files (${params.validation_mode} mode)..."
+        VALIDATE_VCF(validation_input)
         validation_reports = VALIDATE_VCF.out.report
+        task_profiles = task_profiles.mix(VALIDATE_VCF.out.profile)
     } else {
         log.info "Step 6: Skipping validation (validate_output = false)"
         validation_reports = Channel.empty()
     }
 
-    // Step 7: Generate comprehensive statistics
-    log.info "Step 7: Generating liftover statistics..."
+    // Step 6b: Lift a sample of each output back to its input (main target build)
+    if (params.roundtrip_chain) {
+        log.info "Step 6b: Round-trip QC through ${params.roundtrip_chain}..."
+        ROUNDTRIP_QC(
+            vcf_with_index
+                .filter { _sample_id, vcf, _index -> vcf.name.endsWith(".${params.target_build}.vcf.gz") }
+                .join(vcf_files.map { sample_id, vcf -> [sample_id, vcf, findInputIndex(vcf) ?: []] }),
+            file(params.roundtrip_chain, checkIfExists: true)
+        )
+        roundtrip_reports = ROUNDTRIP_QC.out.report
+        task_profiles = task_profiles.mix(ROUNDTRIP_QC.out.profile)
+    } else {
+        roundtrip_reports = Channel.empty()
+    }
+
+    // Step 7: Merge all samples into one cohort VCF if requested
+    if (params.merge_output) {
+        log.info "Step 7: Merging samples into cohort VCF..."
+        // The cohort VCF is of the main target build
+        MERGE_COHORT(
+            vcf_with_index
+                .filter { _sample_id, vcf, _index -> vcf.name.endsWith(".${params.target_build}.vcf.gz") }
+                .toSortedList { a, b -> a[0] <=> b[0] }
+                .map { samples -> samples.collect { _sample_id, vcf, _index -> vcf } },
+            target_fasta
+        )
+        cohort_vcf = MERGE_COHORT.out.vcf_with_index
+        task_profiles = task_profiles.mix(MERGE_COHORT.out.profile)
+        task_traces = task_traces.mix(MERGE_COHORT.out.trace)
+    } else {
+        cohort_vcf = Channel.empty()
+    }
+
+    // Step 8: Generate comprehensive statistics, with the task traces and profiles
+    log.info "Step 8: Generating liftover statistics..."
     LIFTOVER_STATS(
-        CROSSMAP_VCF.out.log.collect(),
-        INDEX_VCF.out.vcf_with_index.map { _sample_id, vcf, _index -> vcf }.collect()
+        crossmap_logs.collect(),
+        vcf_with_index.map { _sample_id, vcf, _index -> vcf }.collect(),
+        collision_reports.collect().ifEmpty([]),
+        task_traces.collect().ifEmpty([]),
+        task_profiles.collect().ifEmpty([])
     )
 
     emit:
     // Final outputs
-    vcf = INDEX_VCF.out.vcf_with_index
+    vcf = vcf_with_index
     stats = LIFTOVER_STATS.out.report
-    logs = CROSSMAP_VCF.out.log
-    unmap = CROSSMAP_VCF.out.unmap
+    logs = crossmap_logs
+    unmap = crossmap_unmap
     validation = validation_reports
+    roundtrip = roundtrip_reports
     summary_csv = LIFTOVER_STATS.out.csv
     summary_stats = LIFTOVER_STATS.out.stats
+    cohort = cohort_vcf
 }